@@ -0,0 +1,48 @@
+"""
+Configuração do gunicorn para produção:
+
+    gunicorn -c nexus_app/gunicorn.conf.py
+
+A aplicação é carregada uma vez no master (preload_app) e aquecida antes do
+fork; cada worker só confere o acesso ao banco. Ver produtos/aquecimento.py
+e o endpoint /ready.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+# Sem chdir: o caminho do SQLite em settings é relativo ao diretório de
+# trabalho (/app no Docker); só o pacote do projeto entra no sys.path
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "nexus_app.wsgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', 8002)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Workers com threads: várias requisições por processo, para que o
+# coalescedor de escritas (produtos/coalescedor.py) junte as gravações num lote
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = True
+accesslog = "-"
+
+# Snapshots das métricas de cada worker, somados pelo /metrics
+# (produtos/instrumentacao.py); lido pelo settings ao carregar a aplicação
+os.environ.setdefault("METRICAS_DIR", os.path.join(tempfile.gettempdir(), "nexus_metricas"))
+
+
+def when_ready(server):
+    # Master com a aplicação já carregada: aquece o que é herdado no fork
+    from django.db import connections
+
+    from produtos import aquecimento
+
+    aquecimento.aquecer(etapas=("urls", "templates", "referencia"))
+    # Conexões SQLite não podem ser compartilhadas entre processos
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from produtos import aquecimento
+
+    aquecimento.aquecer()
@@ -4,6 +4,7 @@ Django settings for nexus_app project.
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "produtos.middleware.InstrumentacaoMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -116,6 +118,122 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# === MÉTRICAS (PROMETHEUS) ===
+# Diretório compartilhado entre os workers do gunicorn para agregar as métricas.
+# Sem ele, /metrics expõe apenas o processo que atendeu a requisição.
+METRICAS_DIR = os.environ.get("METRICAS_DIR")
+METRICAS_INTERVALO = float(os.environ.get("METRICAS_INTERVALO", 1.0))
+
+# === CONSULTAS LENTAS ===
+# Queries acima do limiar (ms) vão para logs/consultas_lentas.log e para o
+# ranking em /admin/consultas-lentas/. Vazio desativa o monitoramento.
+_limiar_consultas_lentas = os.environ.get("CONSULTAS_LENTAS_LIMIAR_MS", "200")
+CONSULTAS_LENTAS_LIMIAR_MS = (
+    float(_limiar_consultas_lentas) if _limiar_consultas_lentas else None
+)
+CONSULTAS_LENTAS_TOP_N = int(os.environ.get("CONSULTAS_LENTAS_TOP_N", 50))
+CONSULTAS_LENTAS_EXPLAIN = True
+
+LOG_DIR = BASE_DIR / "logs"
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "consultas_lentas": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_DIR / "consultas_lentas.log",
+            "maxBytes": 5 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "produtos.consultas_lentas": {
+            "handlers": ["consultas_lentas"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# === ARQUIVAMENTO ===
+# Projetos concluídos/rejeitados sem alteração há mais dias que isso são
+# movidos para as tabelas de arquivo pelo comando arquivar_projetos.
+ARQUIVAMENTO_IDADE_DIAS = int(os.environ.get("ARQUIVAMENTO_IDADE_DIAS", 180))
+
+# === PURGA DE PROJETOS EXCLUÍDOS ===
+# Janela (hora inicial, hora final) em que purgar_projetos pode rodar, fora do pico.
+PURGA_HORARIO = (
+    int(os.environ.get("PURGA_HORA_INICIO", 22)),
+    int(os.environ.get("PURGA_HORA_FIM", 6)),
+)
+
+# === ORDEM DOS CARDS ===
+# Chaves de posição (índice fracionário) maiores que isso disparam o
+# rebalanceamento da coluna em segundo plano.
+POSICAO_TAMANHO_MAX = 16
+
+# === COALESCEDOR DE ESCRITAS ===
+# Movimentações e transições do quadro são agrupadas por processo numa única
+# transação: espera até JANELA_MS por mais operações, no máximo LOTE_MAX por
+# lote. Com a fila (FILA_MAX) cheia por ESPERA_S segundos a view responde 503.
+COALESCEDOR_ATIVO = os.environ.get("COALESCEDOR_ATIVO", "1") == "1"
+COALESCEDOR_JANELA_MS = float(os.environ.get("COALESCEDOR_JANELA_MS", 5))
+COALESCEDOR_LOTE_MAX = 200
+COALESCEDOR_FILA_MAX = int(os.environ.get("COALESCEDOR_FILA_MAX", 1000))
+COALESCEDOR_ESPERA_S = 2.0
+
+# === MÉTRICAS DO DASHBOARD ===
+# Segundos que o resultado de api_metricas_filtradas fica no cache (0 desliga);
+# dentro do processo, cálculos idênticos simultâneos são sempre compartilhados.
+METRICAS_CACHE_TTL = int(os.environ.get("METRICAS_CACHE_TTL", 5))
+
+# === ANALYTICS (PIVOT DUCKDB) ===
+# Intervalo mínimo, em segundos, entre verificações da versão dos dados do
+# snapshot analítico por processo; resultados de pivot ficam ANALITICO_CACHE_TTL
+# segundos no cache (a chave já inclui a versão do snapshot).
+ANALITICO_SNAPSHOT_INTERVALO = int(os.environ.get("ANALITICO_SNAPSHOT_INTERVALO", 30))
+ANALITICO_CACHE_TTL = int(os.environ.get("ANALITICO_CACHE_TTL", 300))
+
+# === AQUECIMENTO / PRONTIDÃO ===
+# Conexões persistentes por thread: reabrir a cada requisição repetiria a
+# conexão e os PRAGMAs de SQLITE_PRAGMAS.
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 600))
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Aplicados a cada conexão SQLite nova (produtos.aquecimento.ajustar_sqlite).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -20000,  # ~20 MB por conexão
+    "mmap_size": 134217728,
+}
+
+# === INICIALIZAÇÃO ===
+# Orçamento (ms) do boot de um worker; perfil_inicializacao falha acima disso.
+INICIALIZACAO_ORCAMENTO_MS = float(os.environ.get("INICIALIZACAO_ORCAMENTO_MS", 1500))
+
+# === CACHE ===
+# Compartilhado entre os workers (carimbos de versão dos dados de referência).
+# Baseado em arquivos para não depender de um serviço externo.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("CACHE_DIR", str(BASE_DIR / "cache")),
+    }
+}
+
+# === TESTES ===
+# `manage.py test` não toca no cache nem nos logs do desenvolvedor: cache em
+# memória (os testes o limpam no setUp) e log de consultas lentas descartado.
+if sys.argv[1:2] == ["test"]:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    LOGGING["handlers"]["consultas_lentas"] = {"class": "logging.NullHandler"}
+
 # === CONFIGURAÇÕES ESPECÍFICAS PARA BACK4APP ===
 # Porta dinâmica
 PORT = int(os.environ.get('PORT', 8000))
\ No newline at end of file
@@ -1,7 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from produtos import views as produtos_views
+
 urlpatterns = [
+    path(
+        "admin/consultas-lentas/",
+        admin.site.admin_view(produtos_views.consultas_lentas_admin),
+        name="consultas_lentas_admin",
+    ),
     path("admin/", admin.site.urls),
     path("", include("produtos.urls")),
 ]
@@ -1,5 +1,185 @@
-from django.contrib import admin
-from .models import Categoria, Produto, StatusProjeto, Projeto, MaterialProjeto
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import clientes, contadores, posicoes
+from .models import (
+    Categoria,
+    Cliente,
+    Produto,
+    StatusProjeto,
+    Projeto,
+    MaterialProjeto,
+    EventoProjeto,
+    ProjetoArquivado,
+    MaterialProjetoArquivado,
+    Tarefa,
+)
+
+
+# Acima disso a changelist não conta as linhas exatamente
+LIMITE_CONTAGEM = 10000
+
+# Páginas contadas além da pedida, para os links seguintes continuarem válidos
+PAGINAS_ADIANTE = 10
+
+
+def estimar_linhas(modelo, using="default"):
+    """Linhas estimadas pelas estatísticas do banco (None se indisponível)"""
+    connection = connections[using]
+    tabela = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabela])
+        elif connection.vendor == "sqlite":
+            # sqlite_stat1 só existe depois de um ANALYZE
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [tabela])
+        else:
+            return None
+        linha = cursor.fetchone()
+    if not linha or linha[0] is None:
+        return None
+    estimativa = int(str(linha[0]).split()[0])
+    return estimativa if estimativa >= 0 else None
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator sem COUNT(*) completo: conta só até algumas páginas além da
+    pedida (no mínimo LIMITE_CONTAGEM linhas). Sem filtros, usa a estimativa
+    das estatísticas do banco quando ela vai além disso.
+    """
+
+    def __init__(self, *args, pagina=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limite = max(LIMITE_CONTAGEM, (pagina + PAGINAS_ADIANTE) * self.per_page)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimativa = None
+        if not queryset.query.where:
+            estimativa = estimar_linhas(queryset.model, queryset.db)
+            if estimativa is not None and estimativa > self.limite:
+                return estimativa
+        contagem = queryset.order_by()[: self.limite + 1].count()
+        if contagem <= self.limite:
+            return contagem
+        # Truncada: há pelo menos mais uma página depois das contadas
+        return max(contagem, estimativa or 0)
+
+
+class FiltroAutocomplete(admin.SimpleListFilter):
+    """
+    Filtro por chave estrangeira com busca pelo autocomplete do admin: a
+    barra lateral não lista todas as linhas da tabela relacionada, só a
+    selecionada. O admin do modelo relacionado precisa de search_fields.
+    """
+
+    template = "admin/produtos/filtro_autocomplete.html"
+    campo = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f"{self.campo}__id__exact"
+        self.app_label = model._meta.app_label
+        self.model_name = model._meta.model_name
+        self.relacionado = model._meta.get_field(self.campo).related_model
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        valor = self.value()
+        if not valor:
+            return []
+        objeto = self.relacionado._base_manager.filter(pk=valor).first()
+        return [(valor, str(objeto))] if objeto else []
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f"{self.campo}_id": self.value()})
+        return queryset
+
+    @property
+    def rotulo(self):
+        return self.lookup_choices[0][1] if self.lookup_choices else ""
+
+
+def filtro_autocomplete(campo, titulo):
+    return type(
+        f"Filtro{campo.title()}", (FiltroAutocomplete,), {"campo": campo, "title": titulo}
+    )
+
+
+class AdminEscalavel(admin.ModelAdmin):
+    """Changelist para tabelas grandes: sem COUNT completo e com filtros por autocomplete"""
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            pagina = max(int(request.GET.get(PAGE_VAR, 1)), 1)
+        except ValueError:
+            pagina = 1
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, pagina=pagina
+        )
+
+    class Media:
+        css = {
+            "all": ("admin/css/vendor/select2/select2.css", "admin/css/autocomplete.css")
+        }
+        js = (
+            "admin/js/vendor/jquery/jquery.js",
+            "admin/js/vendor/select2/select2.full.js",
+            "admin/js/jquery.init.js",
+            "admin/js/autocomplete.js",
+            "admin/produtos/filtro_autocomplete.js",
+        )
+
+
+class FiltroPrazoEntrega(admin.SimpleListFilter):
+    """Faixas fixas de prazo: a barra lateral não faz DISTINCT nas datas"""
+
+    title = "prazo de entrega"
+    parameter_name = "prazo"
+
+    def lookups(self, request, model_admin):
+        return [
+            ("atrasado", "Atrasados"),
+            ("7", "Próximos 7 dias"),
+            ("30", "Próximos 30 dias"),
+            ("depois", "Depois de 30 dias"),
+        ]
+
+    def queryset(self, request, queryset):
+        hoje = timezone.localdate()
+        if self.value() == "atrasado":
+            return queryset.filter(data_prazo_entrega__lt=hoje)
+        if self.value() in ("7", "30"):
+            return queryset.filter(
+                data_prazo_entrega__gte=hoje,
+                data_prazo_entrega__lte=hoje + timedelta(days=int(self.value())),
+            )
+        if self.value() == "depois":
+            return queryset.filter(data_prazo_entrega__gt=hoje + timedelta(days=30))
+        return queryset
 
 
 @admin.register(Categoria)
@@ -11,7 +191,7 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 
 @admin.register(Produto)
-class ProdutoAdmin(admin.ModelAdmin):
+class ProdutoAdmin(AdminEscalavel):
     list_display = [
         "nome",
         "codigo",
@@ -22,6 +202,7 @@ class ProdutoAdmin(admin.ModelAdmin):
         "data_criacao",
     ]  # Removido 'preco'
     list_filter = ["categoria", "ativo", "data_criacao"]
+    list_select_related = ["categoria"]
     search_fields = ["nome", "codigo", "descricao"]
     list_editable = ["estoque", "ativo"]  # Removido 'preco'
     readonly_fields = ["data_criacao", "data_atualizacao"]
@@ -29,31 +210,243 @@ class ProdutoAdmin(admin.ModelAdmin):
 
 @admin.register(StatusProjeto)
 class StatusProjetoAdmin(admin.ModelAdmin):
-    list_display = ["nome", "cor", "ordem", "ativo", "data_criacao"]
+    list_display = ["nome", "cor", "ordem", "ativo", "total_ativos", "total_pendentes", "total_aprovados", "data_criacao"]
     list_filter = ["ativo", "data_criacao"]
     search_fields = ["nome"]
     list_editable = ["ordem", "ativo"]
     ordering = ["ordem"]
 
 
+@admin.register(Cliente)
+class ClienteAdmin(AdminEscalavel):
+    list_display = ["nome", "chave", "data_criacao"]
+    search_fields = ["nome", "chave"]
+    readonly_fields = ["chave", "data_criacao"]
+    ordering = ["chave"]
+    actions = ["mesclar"]
+
+    @admin.action(description="Mesclar clientes selecionados (erros de digitação)")
+    def mesclar(self, request, queryset):
+        destino = clientes.mesclar(list(queryset))
+        if destino is not None:
+            self.message_user(
+                request, f"Clientes mesclados em “{destino.nome}”.", messages.SUCCESS
+            )
+
+
+class MotivoRejeicaoForm(forms.Form):
+    motivo = forms.CharField(label="Motivo da rejeição", widget=forms.Textarea)
+
+
+class MoverStatusForm(forms.Form):
+    status = forms.ModelChoiceField(
+        label="Novo status",
+        queryset=StatusProjeto.objects.filter(ativo=True).order_by("ordem"),
+    )
+
+
 @admin.register(Projeto)
-class ProjetoAdmin(admin.ModelAdmin):
+class ProjetoAdmin(AdminEscalavel):
     list_display = [
         "nome",
         "cliente",
         "status",
+        "aprovacao",
+        "concluido",
         "data_prazo_entrega",
         "usuario",
         "data_criacao",
     ]  # Removido 'valor_orcamento'
-    list_filter = ["status", "usuario", "data_criacao"]
+    list_filter = [
+        "status",
+        filtro_autocomplete("cliente_cadastro", "cliente"),
+        filtro_autocomplete("usuario", "usuário"),
+        FiltroPrazoEntrega,
+        "data_criacao",
+    ]
+    list_select_related = ["status", "usuario"]
     search_fields = ["nome", "cliente"]
-    readonly_fields = ["data_criacao", "data_atualizacao"]
-    date_hierarchy = "data_prazo_entrega"
+    autocomplete_fields = ["cliente_cadastro", "usuario"]
+    readonly_fields = ["versao", "data_criacao", "data_atualizacao"]
+    actions = ["aprovar", "rejeitar", "concluir", "reabrir", "mover_para_status"]
+
+    # Ações em massa: um UPDATE por lote (queryset.transicionar), sem passar
+    # pelo save() de cada projeto; só entram os projetos que mudam de estado
+    def _transicionar(self, request, queryset, evento, **campos):
+        alterados = queryset.transicionar(evento, request.user, **campos)
+        self.message_user(request, f"{alterados} projeto(s) atualizado(s).", messages.SUCCESS)
+
+    def _formulario(self, request, queryset, form, titulo):
+        """Página intermediária para ações que pedem dados (motivo, status)"""
+        context = {
+            **self.admin_site.each_context(request),
+            "title": titulo,
+            "opts": self.model._meta,
+            "form": form,
+            "projetos": queryset,
+            "acao": request.POST["action"],
+            "selecionados": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "selecionar_todos": request.POST.get("select_across", "0"),
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, "admin/produtos/acao_em_massa.html", context)
+
+    @admin.action(description="Aprovar projetos selecionados")
+    def aprovar(self, request, queryset):
+        self._transicionar(
+            request,
+            queryset.exclude(aprovacao="aprovado"),
+            EventoProjeto.APROVADO,
+            aprovacao="aprovado",
+            data_aprovacao=timezone.now(),
+            motivo_rejeicao=None,
+        )
+
+    @admin.action(description="Rejeitar projetos selecionados")
+    def rejeitar(self, request, queryset):
+        form = MotivoRejeicaoForm(request.POST if "confirmar" in request.POST else None)
+        if not form.is_valid():
+            return self._formulario(request, queryset, form, "Rejeitar projetos")
+        self._transicionar(
+            request,
+            queryset.exclude(aprovacao="rejeitado"),
+            EventoProjeto.REJEITADO,
+            aprovacao="rejeitado",
+            data_aprovacao=timezone.now(),
+            motivo_rejeicao=form.cleaned_data["motivo"],
+        )
+
+    @admin.action(description="Concluir projetos selecionados")
+    def concluir(self, request, queryset):
+        self._transicionar(
+            request,
+            queryset.filter(concluido=False),
+            EventoProjeto.CONCLUIDO,
+            concluido=True,
+            data_conclusao=timezone.now(),
+        )
+
+    @admin.action(description="Reabrir projetos selecionados")
+    def reabrir(self, request, queryset):
+        self._transicionar(
+            request,
+            queryset.filter(concluido=True),
+            EventoProjeto.REABERTO,
+            concluido=False,
+            data_conclusao=None,
+        )
+
+    @admin.action(description="Mover projetos selecionados para outro status")
+    def mover_para_status(self, request, queryset):
+        form = MoverStatusForm(request.POST if "confirmar" in request.POST else None)
+        if not form.is_valid():
+            return self._formulario(request, queryset, form, "Mover projetos de status")
+        status = form.cleaned_data["status"]
+        # Sem posição os cards vão ao topo da coluna até o rebalanceamento
+        self._transicionar(
+            request,
+            queryset.exclude(status=status),
+            EventoProjeto.STATUS,
+            status_id=status.id,
+            posicao="",
+        )
+        posicoes.enfileirar_rebalanceamento(status.id)
+
+    def save_model(self, request, obj, form, change):
+        # Invalida a versão que os clientes do quadro têm em mãos
+        if change:
+            obj.versao = F("versao") + 1
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=["versao"])
+
+    # Exclusão lógica também pelo admin; purgar_projetos remove depois
+    def delete_model(self, request, obj):
+        obj.excluir(usuario=request.user)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            estados = list(queryset.filter(excluido=False).values_list("id", *contadores.CAMPOS))
+            linhas = [(id, status_id) for id, status_id, *_ in estados]
+            agora = timezone.now()
+            Projeto.objects.filter(id__in=[id for id, _ in linhas]).update(
+                excluido=True,
+                data_exclusao=agora,
+                data_atualizacao=agora,
+                versao=F("versao") + 1,
+            )
+            contadores.remover(estado for _, *estado in estados)
+            EventoProjeto.objects.bulk_create(
+                EventoProjeto(
+                    projeto_id=id,
+                    tipo=EventoProjeto.EXCLUIDO,
+                    status_id=status_id,
+                    usuario=request.user,
+                    data=agora,
+                )
+                for id, status_id in linhas
+            )
 
 
 @admin.register(MaterialProjeto)
-class MaterialProjetoAdmin(admin.ModelAdmin):
+class MaterialProjetoAdmin(AdminEscalavel):
+    list_display = ["projeto", "produto", "quantidade", "data_criacao"]
+    list_filter = [
+        filtro_autocomplete("projeto", "projeto"),
+        filtro_autocomplete("produto", "produto"),
+        "data_criacao",
+    ]
+    list_select_related = ["projeto", "produto"]
+    search_fields = ["projeto__nome", "produto__nome"]
+    autocomplete_fields = ["projeto", "produto"]
+
+
+@admin.register(EventoProjeto)
+class EventoProjetoAdmin(AdminEscalavel):
+    list_display = ["projeto_id", "tipo", "status_id", "usuario_id", "data"]
+    list_filter = ["tipo", "data"]
+    search_fields = ["projeto__nome"]
+
+    # Histórico append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProjetoArquivado)
+class ProjetoArquivadoAdmin(AdminEscalavel):
+    list_display = [
+        "nome",
+        "cliente",
+        "status",
+        "aprovacao",
+        "concluido",
+        "data_arquivamento",
+    ]
+    list_filter = ["aprovacao", "concluido", "data_arquivamento"]
+    list_select_related = ["status"]
+    search_fields = ["nome", "cliente"]
+
+
+@admin.register(MaterialProjetoArquivado)
+class MaterialProjetoArquivadoAdmin(AdminEscalavel):
     list_display = ["projeto", "produto", "quantidade", "data_criacao"]
-    list_filter = ["projeto", "produto", "data_criacao"]
+    list_select_related = ["projeto", "produto"]
     search_fields = ["projeto__nome", "produto__nome"]
+
+
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = [
+        "tipo",
+        "status",
+        "prioridade",
+        "tentativas",
+        "trabalhador",
+        "data_criacao",
+        "data_fim",
+    ]
+    list_filter = ["status", "tipo"]
+    readonly_fields = ["resultado", "erro", "data_criacao", "data_inicio", "data_fim"]
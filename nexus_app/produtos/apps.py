@@ -4,3 +4,23 @@ from django.apps import AppConfig
 class ProdutosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'produtos'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from . import aquecimento, consultas_lentas, referencia, tarefas  # noqa: F401 (registra as tarefas da fila)
+
+        connection_created.connect(
+            consultas_lentas.instalar, dispatch_uid="produtos.consultas_lentas"
+        )
+        connection_created.connect(
+            aquecimento.ajustar_sqlite, dispatch_uid="produtos.aquecimento.sqlite"
+        )
+        for modelo in referencia.MODELOS:
+            for nome, sinal in (("save", post_save), ("delete", post_delete)):
+                sinal.connect(
+                    referencia.ao_alterar,
+                    sender=modelo,
+                    dispatch_uid=f"produtos.referencia.{modelo.__name__}.{nome}",
+                )
@@ -0,0 +1,110 @@
+"""
+Aquecimento dos workers antes de atender requisições.
+
+Com o gunicorn em preload (gunicorn.conf.py), ``aquecer`` roda no master
+depois de carregar a aplicação: resolve as URLs, compila os templates e
+carrega os dados de referência, e tudo isso é herdado pelos workers no fork.
+A conexão com o banco não atravessa o fork e é local a cada thread: as
+threads de requisição abrem a sua sob demanda (já com os PRAGMAs de
+SQLITE_PRAGMAS); o worker só confere, ao inicializar, que o banco abre.
+
+``/ready`` responde 200 só depois que todas as etapas rodaram neste processo.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from . import referencia
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = ("produtos/base.html", "produtos/home.html", "produtos/login.html")
+
+_estado = {"pid": os.getpid(), "etapas": {}}
+
+
+def ajustar_sqlite(sender, connection, **kwargs):
+    """Receptor de connection_created: aplica SQLITE_PRAGMAS em cada conexão nova"""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, valor in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+
+
+def _urls():
+    get_resolver().url_patterns
+    reverse("home")
+
+
+def _templates():
+    for nome in TEMPLATES:
+        get_template(nome)
+
+
+def _referencia():
+    for nome in referencia.TABELAS:
+        referencia.obter(nome)
+    referencia.catalogo()
+
+
+def _banco():
+    # Só confere o acesso: a thread que inicializa o worker não atende
+    # requisições, então a conexão não fica aberta
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+# A etapa "banco" é por processo; as outras valem para os filhos do fork
+ETAPAS = (
+    ("urls", _urls),
+    ("templates", _templates),
+    ("referencia", _referencia),
+    ("banco", _banco),
+)
+POR_PROCESSO = ("banco",)
+
+
+def _etapas():
+    if _estado["pid"] != os.getpid():
+        _estado["pid"] = os.getpid()
+        for nome in POR_PROCESSO:
+            _estado["etapas"].pop(nome, None)
+    return _estado["etapas"]
+
+
+def aquecer(etapas=None):
+    """Executa as etapas ainda não feitas neste processo; devolve se ficou pronto"""
+    feitas = _etapas()
+    for nome, etapa in ETAPAS:
+        if nome in feitas or (etapas is not None and nome not in etapas):
+            continue
+        inicio = time.perf_counter()
+        try:
+            etapa()
+        except Exception:
+            # Banco fora do ar no boot não derruba o worker; /ready segue 503
+            logger.exception("Falha no aquecimento (%s)", nome)
+            continue
+        feitas[nome] = round((time.perf_counter() - inicio) * 1000, 1)
+    return pronto()
+
+
+def pronto():
+    feitas = _etapas()
+    return all(nome in feitas for nome, _ in ETAPAS)
+
+
+def estado():
+    """{"pronto": bool, "pid": ..., "etapas": {nome: ms}} para o /ready"""
+    return {"pronto": pronto(), "pid": os.getpid(), "etapas": dict(_etapas())}
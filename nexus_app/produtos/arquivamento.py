@@ -0,0 +1,166 @@
+"""
+Particionamento quente/frio de projetos.
+
+Projetos concluídos ou rejeitados sem alteração há mais de
+ARQUIVAMENTO_IDADE_DIAS saem de Projeto/MaterialProjeto para
+ProjetoArquivado/MaterialProjetoArquivado (mantendo os ids). As consultas de
+concluídos/rejeitados leem as duas tabelas através de ``contar`` e ``listar``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import clientes
+from .models import MaterialProjeto, MaterialProjetoArquivado, Projeto, ProjetoArquivado
+
+CAMPOS_PROJETO = [
+    "id",
+    "nome",
+    "cliente",
+    "cliente_cadastro_id",
+    "data_prazo_entrega",
+    "data_prazo_pagamento",
+    "status_id",
+    "usuario_id",
+    "observacoes",
+    "concluido",
+    "data_conclusao",
+    "aprovacao",
+    "data_aprovacao",
+    "motivo_rejeicao",
+    "versao",
+    "posicao",
+    "data_criacao",
+    "data_atualizacao",
+]
+
+CAMPOS_MATERIAL = [
+    "id",
+    "projeto_id",
+    "produto_id",
+    "quantidade",
+    "observacoes",
+    "data_criacao",
+]
+
+FINALIZADOS = Q(concluido=True) | Q(aprovacao='rejeitado')
+
+
+def idade_padrao():
+    return getattr(settings, "ARQUIVAMENTO_IDADE_DIAS", 180)
+
+
+def candidatos(idade_dias=None):
+    """Projetos finalizados sem alteração há mais de idade_dias"""
+    corte = timezone.now() - timedelta(days=idade_padrao() if idade_dias is None else idade_dias)
+    return Projeto.objects.filter(FINALIZADOS, data_atualizacao__lt=corte)
+
+
+def arquivar(idade_dias=None, lote=500, limite=None):
+    """Move os candidatos para as tabelas de arquivo, um lote por transação"""
+    total = 0
+    ultimo_id = 0
+    while limite is None or total < limite:
+        tamanho = lote if limite is None else min(lote, limite - total)
+        ids = list(
+            candidatos(idade_dias)
+            .filter(id__gt=ultimo_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:tamanho]
+        )
+        if not ids:
+            break
+        total += arquivar_ids(ids)
+        ultimo_id = ids[-1]
+    return total
+
+
+def arquivar_ids(ids):
+    with transaction.atomic():
+        projetos = [
+            ProjetoArquivado(**linha)
+            for linha in Projeto.objects.filter(FINALIZADOS, id__in=ids).values(
+                *CAMPOS_PROJETO
+            )
+        ]
+        ids = [projeto.id for projeto in projetos]
+        materiais = [
+            MaterialProjetoArquivado(**linha)
+            for linha in MaterialProjeto.objects.filter(projeto_id__in=ids).values(
+                *CAMPOS_MATERIAL
+            )
+        ]
+        ProjetoArquivado.objects.bulk_create(projetos)
+        MaterialProjetoArquivado.objects.bulk_create(materiais)
+        MaterialProjeto.objects.filter(projeto_id__in=ids).delete()
+        Projeto.objects.filter(id__in=ids).delete()
+    return len(projetos)
+
+
+def restaurar(projeto_id):
+    """
+    Devolve um projeto arquivado (e seus materiais) à tabela quente. Se outra
+    requisição o restaurou antes (o select_for_update não trava nada no
+    SQLite), devolve o projeto que ela deixou na tabela quente.
+    """
+    try:
+        with transaction.atomic():
+            if Projeto.todos.filter(id=projeto_id).exists():
+                return Projeto.objects.filter(id=projeto_id).first()
+            linha = (
+                ProjetoArquivado.objects.select_for_update()
+                .filter(id=projeto_id)
+                .values(*CAMPOS_PROJETO)
+                .first()
+            )
+            if linha is None:
+                # Em bancos com lock de linha, o vencedor pode ter acabado de apagá-la
+                return Projeto.objects.filter(id=projeto_id).first()
+            materiais = list(
+                MaterialProjetoArquivado.objects.filter(projeto_id=projeto_id).values(
+                    *CAMPOS_MATERIAL
+                )
+            )
+
+            # bulk_create aplica auto_now/auto_now_add; bulk_update regrava as datas originais
+            projeto = Projeto(**linha)
+            Projeto.objects.bulk_create([projeto])
+            projeto.data_criacao = linha["data_criacao"]
+            projeto.data_atualizacao = linha["data_atualizacao"]
+            Projeto.objects.bulk_update([projeto], ["data_criacao", "data_atualizacao"])
+
+            objetos = [MaterialProjeto(**material) for material in materiais]
+            MaterialProjeto.objects.bulk_create(objetos)
+            for objeto, material in zip(objetos, materiais):
+                objeto.data_criacao = material["data_criacao"]
+            MaterialProjeto.objects.bulk_update(objetos, ["data_criacao"])
+
+            ProjetoArquivado.objects.filter(id=projeto_id).delete()
+            # Arquivados antes do cadastro de clientes só têm o texto
+            clientes.vincular(Projeto.objects.filter(id=projeto_id))
+    except IntegrityError:
+        # Perdeu a corrida: o mesmo id já entrou na tabela quente
+        return Projeto.objects.filter(id=projeto_id).first()
+    return projeto
+
+
+def contar(*args, **filtros):
+    """COUNT(*) somando tabela quente e arquivo"""
+    return (
+        Projeto.objects.filter(*args, **filtros).count()
+        + ProjetoArquivado.objects.filter(*args, **filtros).count()
+    )
+
+
+def listar(campos, ordem, *args, limite=None, **filtros):
+    """values() das duas tabelas via UNION ALL, ordenado e opcionalmente limitado"""
+    quentes = Projeto.objects.filter(*args, **filtros).order_by().values(*campos)
+    arquivados = ProjetoArquivado.objects.filter(*args, **filtros).order_by().values(
+        *campos
+    )
+    consulta = quentes.union(arquivados, all=True).order_by(*ordem)
+    return consulta[:limite] if limite else consulta
@@ -0,0 +1,79 @@
+"""
+Calendário de prazos (heatmap de entregas e pagamentos por dia).
+
+Uma única consulta: dois GROUP BY (um por coluna de prazo) unidos por
+UNION ALL, cada um percorrendo só a faixa pedida do índice parcial
+(prazo, aprovacao, concluido) de projetos não excluídos. A separação em
+atrasado / no prazo sai do próprio dia, então não precisa de outra consulta.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Count, F, Value
+from django.utils import timezone
+
+from .models import Projeto
+
+TIPOS = {"entregas": "data_prazo_entrega", "pagamentos": "data_prazo_pagamento"}
+APROVACAO = tuple(codigo for codigo, _ in Projeto.APROVACAO_CHOICES)
+ESTADOS = ("no_prazo", "atrasado", "concluido")
+
+MAX_DIAS = 366
+PADRAO_DIAS = 90
+
+
+def intervalo(inicio=None, fim=None, hoje=None):
+    """(início, fim) validados; padrão: de hoje até PADRAO_DIAS dias à frente"""
+    hoje = hoje or timezone.localdate()
+    inicio = inicio or hoje
+    fim = fim or inicio + timedelta(days=PADRAO_DIAS - 1)
+    if fim < inicio:
+        raise ValueError("data_fim anterior a data_inicio")
+    if (fim - inicio).days + 1 > MAX_DIAS:
+        raise ValueError(f"Intervalo máximo de {MAX_DIAS} dias")
+    return inicio, fim
+
+
+def _consulta(inicio, fim):
+    partes = [
+        Projeto.objects.filter(**{f"{campo}__range": (inicio, fim)})
+        .order_by()
+        .annotate(tipo=Value(tipo), dia=F(campo))
+        .values("tipo", "dia", "aprovacao", "concluido")
+        .annotate(total=Count("id"))
+        for tipo, campo in TIPOS.items()
+    ]
+    return partes[0].union(*partes[1:], all=True)
+
+
+def _vazio():
+    return {
+        "total": 0,
+        "aprovacao": dict.fromkeys(APROVACAO, 0),
+        "estado": dict.fromkeys(ESTADOS, 0),
+    }
+
+
+def prazos(inicio=None, fim=None, hoje=None):
+    """Contagens por dia e tipo de prazo, só dos dias com algum prazo"""
+    hoje = hoje or timezone.localdate()
+    inicio, fim = intervalo(inicio, fim, hoje)
+    dias = {}
+    totais = {tipo: _vazio() for tipo in TIPOS}
+    for linha in _consulta(inicio, fim):
+        if linha["concluido"]:
+            estado = "concluido"
+        else:
+            estado = "atrasado" if linha["dia"] < hoje else "no_prazo"
+        dia = dias.setdefault(linha["dia"].isoformat(), {tipo: _vazio() for tipo in TIPOS})
+        for celula in (dia[linha["tipo"]], totais[linha["tipo"]]):
+            celula["total"] += linha["total"]
+            celula["aprovacao"][linha["aprovacao"]] += linha["total"]
+            celula["estado"][estado] += linha["total"]
+    return {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "hoje": hoje.isoformat(),
+        "dias": dict(sorted(dias.items())),
+        "totais": totais,
+    }
@@ -0,0 +1,176 @@
+"""
+Cadastro de clientes (Cliente) a partir do texto livre de Projeto.cliente.
+
+O texto digitado continua em Projeto.cliente; Projeto.cliente_cadastro aponta
+para o Cliente com a mesma chave (nome sem acentos, maiúsculas, pontuação nem
+espaços repetidos), então "ACME Ltda." e "acme  ltda" caem no mesmo cliente.
+Erros de digitação de verdade são juntados pela ação "mesclar" do admin.
+
+O resumo por cliente soma dois GROUP BY: o da tabela quente, no índice
+(cliente_cadastro, excluido, concluido, aprovacao, data_prazo_entrega), e o do
+arquivo, no índice (cliente_cadastro, aprovacao) de ProjetoArquivado. O
+autocomplete é uma faixa no índice único de Cliente.chave.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+NAO_ALFANUMERICO = re.compile(r"[\W_]+")
+
+# ids por UPDATE em vincular (abaixo do limite de parâmetros do SQLite)
+LOTE = 500
+
+# Mesma definição de projeto ativo do quadro e dos contadores
+ABERTOS = Q(
+    projetos__excluido=False,
+    projetos__concluido=False,
+    projetos__aprovacao__in=("pendente", "aprovado"),
+)
+
+
+def normalizar(nome):
+    """Chave de deduplicação: 'Açaí  Ltda.' -> 'acai ltda'"""
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", nome or "") if not unicodedata.combining(c)
+    )
+    return NAO_ALFANUMERICO.sub(" ", sem_acento.casefold()).strip()
+
+
+def obter_ou_criar(nome):
+    """Cliente com a chave do nome (criado com o nome como digitado); None se vazio"""
+    from .models import Cliente
+
+    chave = normalizar(nome)
+    if not chave:
+        return None
+    cliente, _ = Cliente.objects.get_or_create(chave=chave, defaults={"nome": nome.strip()})
+    return cliente
+
+
+def vincular(projetos=None):
+    """
+    Liga ao Cliente os projetos ainda sem cliente_cadastro (restaurados do
+    arquivo, inseridos com bulk_create). Lê (id, cliente) uma vez e atualiza
+    por id em lotes, já que Projeto.cliente não tem índice.
+    Devolve quantos projetos foram ligados.
+    """
+    from .models import Projeto
+
+    projetos = (projetos if projetos is not None else Projeto.todos.all()).filter(
+        cliente_cadastro__isnull=True
+    )
+    por_texto = defaultdict(list)
+    for id, texto in projetos.order_by().values_list("id", "cliente").iterator():
+        por_texto[texto].append(id)
+    vinculados = 0
+    with transaction.atomic():
+        for texto, ids in por_texto.items():
+            cliente = obter_ou_criar(texto)
+            if cliente is None:
+                continue
+            for inicio in range(0, len(ids), LOTE):
+                vinculados += Projeto.todos.filter(id__in=ids[inicio : inicio + LOTE]).update(
+                    cliente_cadastro=cliente
+                )
+    return vinculados
+
+
+def _prefixo(queryset, termo):
+    # Faixa [chave, chave + U+FFFF) em vez de LIKE: usa o índice em qualquer banco
+    chave = normalizar(termo)
+    if not chave:
+        return queryset
+    return queryset.filter(chave__gte=chave, chave__lt=chave + "\uffff")
+
+
+def autocompletar(termo, limite=10):
+    """[{id, nome}] dos clientes cuja chave começa pelo termo"""
+    from .models import Cliente
+
+    return list(
+        _prefixo(Cliente.objects.order_by("chave"), termo).values("id", "nome")[:limite]
+    )
+
+
+def resumo(termo=None, limite=50, hoje=None):
+    """
+    Por cliente: total de projetos, abertos, atrasados, aprovados, rejeitados
+    e taxa de aprovação (aprovados / decididos). Os arquivados (sempre
+    finalizados) entram no total e na aprovação, por uma segunda consulta
+    agrupada somada aqui.
+    """
+    from .models import Cliente, ProjetoArquivado
+
+    hoje = hoje or timezone.localdate()
+    existentes = Q(projetos__excluido=False)
+    clientes = _prefixo(Cliente.objects.all(), termo or "")
+    linhas = {
+        linha["id"]: linha
+        for linha in clientes.annotate(
+            total=Count("projetos", filter=existentes),
+            abertos=Count("projetos", filter=ABERTOS),
+            atrasados=Count(
+                "projetos", filter=ABERTOS & Q(projetos__data_prazo_entrega__lt=hoje)
+            ),
+            aprovados=Count("projetos", filter=existentes & Q(projetos__aprovacao="aprovado")),
+            rejeitados=Count("projetos", filter=existentes & Q(projetos__aprovacao="rejeitado")),
+        )
+        .order_by()
+        .values("id", "nome", "total", "abertos", "atrasados", "aprovados", "rejeitados")
+    }
+    arquivados = (
+        ProjetoArquivado.objects.filter(cliente_cadastro__in=clientes.values("id"))
+        .order_by()
+        .values("cliente_cadastro")
+        .annotate(
+            total=Count("id"),
+            aprovados=Count("id", filter=Q(aprovacao="aprovado")),
+            rejeitados=Count("id", filter=Q(aprovacao="rejeitado")),
+        )
+    )
+    for arquivo in arquivados:
+        linha = linhas[arquivo["cliente_cadastro"]]
+        for campo in ("total", "aprovados", "rejeitados"):
+            linha[campo] += arquivo[campo]
+
+    resultado = sorted(
+        linhas.values(), key=lambda linha: (-linha["abertos"], -linha["total"], linha["nome"])
+    )
+    for linha in resultado[:limite]:
+        decididos = linha["aprovados"] + linha["rejeitados"]
+        linha["taxa_aprovacao"] = round(linha["aprovados"] / decididos, 4) if decididos else None
+    return resultado[:limite]
+
+
+def mesclar(clientes):
+    """
+    Junta clientes duplicados (erros de digitação): os projetos, inclusive os
+    arquivados, passam para o cliente com mais projetos, com o nome dele, e os
+    demais são apagados.
+    """
+    from .models import Projeto, ProjetoArquivado
+
+    clientes = sorted(
+        clientes, key=lambda c: (-(c.projetos.count() + c.arquivados.count()), c.id)
+    )
+    if len(clientes) < 2:
+        return clientes[0] if clientes else None
+    destino, origens = clientes[0], clientes[1:]
+    with transaction.atomic():
+        Projeto.todos.filter(cliente_cadastro__in=origens).update(
+            cliente_cadastro=destino,
+            cliente=destino.nome,
+            versao=F("versao") + 1,
+            data_atualizacao=timezone.now(),
+        )
+        ProjetoArquivado.objects.filter(cliente_cadastro__in=origens).update(
+            cliente_cadastro=destino, cliente=destino.nome
+        )
+        for origem in origens:
+            origem.delete()
+    return destino
@@ -0,0 +1,160 @@
+"""
+Coalescedor de escritas por processo.
+
+Com SQLite, cada requisição que grava disputa o lock de escrita e paga um
+commit (fsync). Mutações curtas do quadro (mover card, aprovar, rejeitar...)
+são entregues a uma única thread escritora, que junta o que chegar dentro de
+COALESCEDOR_JANELA_MS e grava tudo numa transação; cada operação roda num
+savepoint próprio, então a falha de uma não desfaz as outras. O chamador só
+recebe a resposta depois do commit do lote.
+
+A fila é limitada (COALESCEDOR_FILA_MAX): quando está cheia por mais de
+COALESCEDOR_ESPERA_S, ``executar`` levanta FilaCheia e a view responde 503.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import instrumentacao
+
+logger = logging.getLogger(__name__)
+
+instrumentacao.METRICAS.update(
+    {
+        "nexus_coalescedor_lote": (
+            "histogram",
+            "Operações gravadas por transação do coalescedor",
+            (1, 2, 5, 10, 25, 50, 100, 250),
+        ),
+        "nexus_coalescedor_espera_seconds": (
+            "histogram",
+            "Tempo entre a chegada da operação e o commit do lote",
+            instrumentacao.BUCKETS_DURACAO,
+        ),
+        "nexus_coalescedor_rejeicoes_total": (
+            "counter",
+            "Operações recusadas por fila cheia",
+            None,
+        ),
+    }
+)
+
+
+class FilaCheia(Exception):
+    pass
+
+
+def _config(nome, padrao):
+    return getattr(settings, f"COALESCEDOR_{nome}", padrao)
+
+
+class Coalescedor:
+    def __init__(self):
+        self.fila = queue.Queue(maxsize=_config("FILA_MAX", 1000))
+        self.thread = threading.Thread(
+            target=self._laco, name="coalescedor-escritas", daemon=True
+        )
+        self.thread.start()
+
+    def enviar(self, operacao):
+        """Enfileira a operação e devolve um Future resolvido após o commit"""
+        futuro = Future()
+        try:
+            self.fila.put(
+                (operacao, futuro, time.perf_counter()), timeout=_config("ESPERA_S", 2.0)
+            )
+        except queue.Full:
+            instrumentacao.incrementar("nexus_coalescedor_rejeicoes_total", ())
+            raise FilaCheia("Muitas alterações simultâneas; tente novamente em instantes")
+        return futuro
+
+    def _coletar(self):
+        """Bloqueia pela primeira operação e junta as que chegarem dentro da janela"""
+        lote = [self.fila.get()]
+        limite = time.monotonic() + _config("JANELA_MS", 5) / 1000
+        lote_max = _config("LOTE_MAX", 200)
+        while len(lote) < lote_max:
+            restante = limite - time.monotonic()
+            try:
+                if restante > 0:
+                    item = self.fila.get(timeout=restante)
+                else:
+                    # Janela encerrada: só aproveita o que já está na fila
+                    item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            lote.append(item)
+        return lote
+
+    def _laco(self):
+        while True:
+            lote = self._coletar()
+            close_old_connections()
+            try:
+                resultados = self._gravar(lote)
+            except Exception as e:
+                # Commit do lote falhou: ninguém foi gravado
+                logger.exception("Falha ao gravar lote do coalescedor")
+                resultados = [(False, e)] * len(lote)
+
+            agora = time.perf_counter()
+            instrumentacao.observar("nexus_coalescedor_lote", (), len(lote))
+            for (_, futuro, chegada), (ok, valor) in zip(lote, resultados):
+                instrumentacao.observar(
+                    "nexus_coalescedor_espera_seconds", (), agora - chegada
+                )
+                if ok:
+                    futuro.set_result(valor)
+                else:
+                    futuro.set_exception(valor)
+
+    def _gravar(self, lote):
+        resultados = []
+        with transaction.atomic():
+            for operacao, _, _ in lote:
+                try:
+                    with transaction.atomic():
+                        resultados.append((True, operacao()))
+                except Exception as e:
+                    resultados.append((False, e))
+        return resultados
+
+
+_instancia = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _coalescedor():
+    # Um por processo: após fork (workers do gunicorn) a thread do pai não existe
+    global _instancia, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _instancia = Coalescedor()
+                _pid = os.getpid()
+    return _instancia
+
+
+def ativo():
+    return _config("ATIVO", True)
+
+
+def executar(operacao):
+    """
+    Executa ``operacao()`` (sem argumentos) no próximo lote e devolve seu retorno,
+    propagando a exceção que ela levantar.
+
+    Dentro de uma transação do chamador (ou com COALESCEDOR_ATIVO = False) roda
+    direto, na conexão atual.
+    """
+    if not ativo() or connection.in_atomic_block:
+        return operacao()
+    return _coalescedor().enviar(operacao).result()
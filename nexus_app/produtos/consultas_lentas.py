@@ -0,0 +1,168 @@
+"""
+Log de consultas lentas.
+
+Um execute_wrapper é instalado em toda conexão criada (sinal connection_created).
+Consultas acima de CONSULTAS_LENTAS_LIMIAR_MS são gravadas no logger
+``produtos.consultas_lentas`` (arquivo rotativo, ver LOGGING) e mantidas num
+ranking em memória das TOP_N mais lentas, exibido no admin.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger("produtos.consultas_lentas")
+
+# Nome da view em execução; definido pelo InstrumentacaoMiddleware
+VIEW_ATUAL = ContextVar("view_atual", default=None)
+
+_lock = threading.Lock()
+_ranking = {}
+_planos = {}
+_MAX_PLANOS = 500
+
+_PLACEHOLDERS_REPETIDOS = re.compile(r"%s(?:, %s)+")
+
+
+def limiar_ms():
+    return getattr(settings, "CONSULTAS_LENTAS_LIMIAR_MS", None)
+
+
+def digest(valor):
+    return hashlib.blake2b(valor.encode(), digest_size=6).hexdigest()
+
+
+def normalizar_sql(sql):
+    """Agrupa variações de IN (%s, %s, ...) sob a mesma forma"""
+    return _PLACEHOLDERS_REPETIDOS.sub("%s, ...", sql)
+
+
+def instalar(sender=None, connection=None, **kwargs):
+    """Receptor de connection_created: passa a monitorar a conexão"""
+    if limiar_ms() is None:
+        return
+    if monitorar not in connection.execute_wrappers:
+        # No início da lista: execute_wrapper() remove wrappers com pop()
+        connection.execute_wrappers.insert(0, monitorar)
+
+
+def monitorar(execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        limiar = limiar_ms()
+        if limiar is not None and duracao_ms >= limiar:
+            registrar(sql, params, many, duracao_ms, context["connection"])
+
+
+def plano_de_execucao(conexao, sql, params):
+    """EXPLAIN (QUERY PLAN no SQLite) num cursor próprio, fora dos wrappers"""
+    if conexao.vendor == "sqlite":
+        prefixo = "EXPLAIN QUERY PLAN "
+    elif conexao.vendor in ("postgresql", "mysql"):
+        prefixo = "EXPLAIN "
+    else:
+        return None
+    cursor = conexao.create_cursor()
+    try:
+        cursor.execute(prefixo + sql, params)
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+    if conexao.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(linha[-1] for linha in linhas)
+    return "\n".join(" ".join(str(coluna) for coluna in linha) for linha in linhas)
+
+
+def registrar(sql, params, many, duracao_ms, conexao):
+    sql_normalizado = normalizar_sql(sql)
+    chave = digest(sql_normalizado)
+    view = VIEW_ATUAL.get()
+
+    plano = _planos.get(chave)
+    if (
+        plano is None
+        and not many
+        and getattr(settings, "CONSULTAS_LENTAS_EXPLAIN", True)
+        and sql.lstrip()[:6].upper() in ("SELECT", "WITH")
+    ):
+        try:
+            plano = plano_de_execucao(conexao, sql, params)
+        except Exception as e:
+            plano = f"EXPLAIN falhou: {e}"
+        if len(_planos) >= _MAX_PLANOS:
+            _planos.clear()
+        _planos[chave] = plano
+
+    registro = {
+        "sql": sql_normalizado,
+        "fingerprint": chave,
+        "params": digest(repr(params)),
+        "duracao_ms": round(duracao_ms, 3),
+        "view": view,
+        "plano": plano,
+    }
+    logger.warning(
+        "consulta lenta %.1fms view=%s fingerprint=%s params=%s\n%s\n%s",
+        duracao_ms,
+        view,
+        chave,
+        registro["params"],
+        sql,
+        plano or "",
+    )
+    _atualizar_ranking(registro)
+
+
+def _atualizar_ranking(registro):
+    top_n = getattr(settings, "CONSULTAS_LENTAS_TOP_N", 50)
+    chave = registro["fingerprint"]
+    with _lock:
+        atual = _ranking.get(chave)
+        if atual is None:
+            if len(_ranking) >= top_n:
+                menor = min(_ranking.values(), key=lambda item: item["max_ms"])
+                if menor["max_ms"] >= registro["duracao_ms"]:
+                    return
+                del _ranking[menor["fingerprint"]]
+            atual = _ranking[chave] = {
+                "fingerprint": chave,
+                "sql": registro["sql"],
+                "execucoes": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "views": set(),
+            }
+        atual["execucoes"] += 1
+        atual["total_ms"] += registro["duracao_ms"]
+        if registro["duracao_ms"] >= atual["max_ms"]:
+            atual["max_ms"] = registro["duracao_ms"]
+            atual["params"] = registro["params"]
+        atual["plano"] = registro["plano"]
+        atual["ultima"] = timezone.now()
+        if registro["view"]:
+            atual["views"].add(registro["view"])
+
+
+def ranking():
+    """Consultas lentas deste processo, da mais lenta para a mais rápida"""
+    with _lock:
+        itens = [dict(item, views=sorted(item["views"])) for item in _ranking.values()]
+    for item in itens:
+        item["media_ms"] = round(item["total_ms"] / item["execucoes"], 3)
+    return sorted(itens, key=lambda item: item["max_ms"], reverse=True)
+
+
+def limpar():
+    with _lock:
+        _ranking.clear()
+    _planos.clear()
@@ -0,0 +1,102 @@
+"""
+Contadores desnormalizados por status (StatusProjeto.total_*).
+
+Um projeto conta como ativo na coluna do seu status enquanto não está
+concluído, rejeitado nem excluído; entre os ativos, conta também como
+pendente ou aprovado. Cada escrita que muda status/concluido/aprovacao/
+excluido chama ``ajustar`` com o estado antes e depois, que aplica a
+diferença com F() (no máximo dois UPDATEs). ``reconciliar`` recalcula tudo
+com um GROUP BY e corrige eventuais desvios.
+"""
+
+from collections import Counter
+
+from django.db.models import Count, F, Q
+
+CAMPOS = ("status_id", "concluido", "aprovacao", "excluido")
+
+
+def estado(projeto):
+    """(status_id, concluido, aprovacao, excluido) de um Projeto"""
+    return tuple(getattr(projeto, campo) for campo in CAMPOS)
+
+
+def _contribuicao(estado):
+    """(ativos, pendentes, aprovados) com que um projeto soma na sua coluna"""
+    if estado is None:
+        return (0, 0, 0)
+    _, concluido, aprovacao, excluido = estado
+    if concluido or excluido or aprovacao == "rejeitado":
+        return (0, 0, 0)
+    return (1, int(aprovacao == "pendente"), int(aprovacao == "aprovado"))
+
+
+def ajustar(antes, depois):
+    """Aplica a diferença entre dois estados (None = projeto inexistente)"""
+    ajustar_varios([(antes, depois)])
+
+
+def ajustar_varios(pares):
+    """Como ``ajustar`` para vários projetos, somando tudo antes dos UPDATEs"""
+    deltas = Counter()
+    for antes, depois in pares:
+        for sinal, estado_ in ((-1, antes), (1, depois)):
+            if estado_ is None:
+                continue
+            for i, valor in enumerate(_contribuicao(estado_)):
+                deltas[(estado_[0], i)] += sinal * valor
+    aplicar(deltas)
+
+
+def aplicar(deltas):
+    """deltas: Counter {(status_id, índice do contador): variação}"""
+    from .models import StatusProjeto
+
+    campos = ("total_ativos", "total_pendentes", "total_aprovados")
+    por_status = {}
+    for (status_id, i), valor in deltas.items():
+        if valor:
+            por_status.setdefault(status_id, {})[campos[i]] = F(campos[i]) + valor
+    for status_id, atualizacoes in por_status.items():
+        StatusProjeto.objects.filter(id=status_id).update(**atualizacoes)
+
+
+def remover(estados):
+    """Desconta vários projetos de uma vez (exclusão em massa)"""
+    deltas = Counter()
+    for estado_ in estados:
+        for i, valor in enumerate(_contribuicao(estado_)):
+            deltas[(estado_[0], i)] -= valor
+    aplicar(deltas)
+
+
+def reconciliar(corrigir=True):
+    """Recalcula os contadores; devolve {status_id: (antigos, corretos)} dos divergentes"""
+    from .models import Projeto, StatusProjeto
+
+    ativos = Q(concluido=False) & ~Q(aprovacao="rejeitado")
+    corretos = {
+        linha["status_id"]: (linha["ativos"], linha["pendentes"], linha["aprovados"])
+        for linha in Projeto.objects.filter(ativos)
+        .order_by()
+        .values("status_id")
+        .annotate(
+            ativos=Count("id"),
+            pendentes=Count("id", filter=Q(aprovacao="pendente")),
+            aprovados=Count("id", filter=Q(aprovacao="aprovado")),
+        )
+    }
+    divergentes = {}
+    for status_id, *atuais in StatusProjeto.objects.values_list(
+        "id", "total_ativos", "total_pendentes", "total_aprovados"
+    ):
+        certo = corretos.get(status_id, (0, 0, 0))
+        if tuple(atuais) != certo:
+            divergentes[status_id] = (tuple(atuais), certo)
+            if corrigir:
+                StatusProjeto.objects.filter(id=status_id).update(
+                    total_ativos=certo[0],
+                    total_pendentes=certo[1],
+                    total_aprovados=certo[2],
+                )
+    return divergentes
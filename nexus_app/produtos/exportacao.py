@@ -0,0 +1,155 @@
+"""
+Exportação de projetos com materiais em CSV ou NDJSON, em streaming.
+
+Os projetos são lidos com iterator(chunk_size) + prefetch dos materiais por
+lote, da tabela quente e do arquivo, então a memória fica constante
+independentemente do volume exportado.
+"""
+
+import csv
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import MaterialProjeto, MaterialProjetoArquivado, Projeto, ProjetoArquivado
+
+LOTE = 2000
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+COLUNAS_PROJETO = [
+    "id",
+    "nome",
+    "cliente",
+    "status",
+    "aprovacao",
+    "concluido",
+    "data_criacao",
+    "data_prazo_entrega",
+    "data_prazo_pagamento",
+    "data_aprovacao",
+    "data_conclusao",
+    "observacoes",
+]
+
+COLUNAS_MATERIAL = ["produto_id", "produto_nome", "produto_codigo", "quantidade"]
+
+
+def filtros_do_request(params):
+    """Converte os filtros do dashboard (query string) em kwargs de filter()"""
+    filtros = {}
+    if params.get("data_inicio"):
+        filtros["data_criacao__date__gte"] = datetime.strptime(
+            params["data_inicio"], "%Y-%m-%d"
+        ).date()
+    if params.get("data_fim"):
+        filtros["data_criacao__date__lte"] = datetime.strptime(
+            params["data_fim"], "%Y-%m-%d"
+        ).date()
+    if params.get("status"):
+        filtros["status_id"] = int(params["status"])
+    if params.get("aprovacao"):
+        if params["aprovacao"] not in dict(Projeto.APROVACAO_CHOICES):
+            raise ValueError("Aprovação inválida")
+        filtros["aprovacao"] = params["aprovacao"]
+    if params.get("concluido") in ("true", "1"):
+        filtros["concluido"] = True
+    elif params.get("concluido") in ("false", "0"):
+        filtros["concluido"] = False
+    return filtros
+
+
+def _projetos(filtros):
+    """Projetos (quentes e arquivados) com status e materiais carregados por lote"""
+    for model, material_model in (
+        (Projeto, MaterialProjeto),
+        (ProjetoArquivado, MaterialProjetoArquivado),
+    ):
+        materiais = material_model.objects.select_related("produto").only(
+            "projeto_id",
+            "quantidade",
+            "produto__id",
+            "produto__nome",
+            "produto__codigo",
+        )
+        consulta = (
+            model.objects.filter(**filtros)
+            .select_related("status")
+            .prefetch_related(Prefetch("materiais", queryset=materiais))
+            .order_by("id")
+        )
+        yield from consulta.iterator(chunk_size=LOTE)
+
+
+def _linha_projeto(projeto):
+    return {
+        "id": projeto.id,
+        "nome": projeto.nome,
+        "cliente": projeto.cliente,
+        "status": projeto.status.nome,
+        "aprovacao": projeto.aprovacao,
+        "concluido": projeto.concluido,
+        "data_criacao": projeto.data_criacao,
+        "data_prazo_entrega": projeto.data_prazo_entrega,
+        "data_prazo_pagamento": projeto.data_prazo_pagamento,
+        "data_aprovacao": projeto.data_aprovacao,
+        "data_conclusao": projeto.data_conclusao,
+        "observacoes": projeto.observacoes or "",
+    }
+
+
+def _linha_material(material):
+    return {
+        "produto_id": material.produto.id,
+        "produto_nome": material.produto.nome,
+        "produto_codigo": material.produto.codigo or "",
+        "quantidade": material.quantidade,
+    }
+
+
+class _Eco:
+    """Pseudo-buffer: csv.writer escreve e recebemos a linha de volta"""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_csv(filtros):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUNAS_PROJETO + COLUNAS_MATERIAL)
+    vazio = [""] * len(COLUNAS_MATERIAL)
+    for projeto in _projetos(filtros):
+        base = [_valor_csv(valor) for valor in _linha_projeto(projeto).values()]
+        materiais = projeto.materiais.all()
+        if not materiais:
+            yield escritor.writerow(base + vazio)
+            continue
+        # Uma linha por material; o projeto inteiro sai num único chunk
+        yield "".join(
+            escritor.writerow(base + list(_linha_material(material).values()))
+            for material in materiais
+        )
+
+
+def gerar_ndjson(filtros):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for projeto in _projetos(filtros):
+        linha = _linha_projeto(projeto)
+        linha["materiais"] = [_linha_material(m) for m in projeto.materiais.all()]
+        yield codificador.encode(linha) + "\n"
+
+
+def gerar(formato, filtros):
+    return gerar_csv(filtros) if formato == "csv" else gerar_ndjson(filtros)
@@ -0,0 +1,196 @@
+"""
+Fila de tarefas local, guardada no próprio banco (modelo Tarefa).
+
+Handlers são registrados com ``@registrar("nome")`` e recebem os parâmetros
+da tarefa como kwargs; o retorno (serializável em JSON) vira o resultado.
+A reserva é um UPDATE condicional (status=pendente), então vários
+trabalhadores podem disputar a mesma fila sem SELECT ... FOR UPDATE.
+"""
+
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+# Gravação do desfecho: tentativas diante de "database is locked" e afins
+GRAVAR_TENTATIVAS = 5
+GRAVAR_ESPERA_S = 0.1
+
+# Segundos entre varreduras de tarefas travadas em cada trabalhador
+RECUPERACAO_INTERVALO_S = 60
+
+_handlers = {}
+
+
+class TarefaDesconhecida(Exception):
+    pass
+
+
+def registrar(nome, apenas_staff=True):
+    """Decorator que registra um handler de tarefa"""
+
+    def decorator(funcao):
+        _handlers[nome] = (funcao, apenas_staff)
+        return funcao
+
+    return decorator
+
+
+def handlers():
+    return dict(_handlers)
+
+
+def enfileirar(tipo, parametros=None, prioridade=0, usuario=None, max_tentativas=3):
+    if tipo not in _handlers:
+        raise TarefaDesconhecida(f"Tarefa desconhecida: {tipo}")
+    return Tarefa.objects.create(
+        tipo=tipo,
+        parametros=parametros or {},
+        prioridade=prioridade,
+        usuario=usuario,
+        max_tentativas=max_tentativas,
+    )
+
+
+def reservar(trabalhador, tentativas=5):
+    """Reserva a próxima tarefa pronta (maior prioridade, mais antiga)"""
+    for _ in range(tentativas):
+        candidata = (
+            Tarefa.objects.filter(status=Tarefa.PENDENTE, executar_apos__lte=timezone.now())
+            .order_by("-prioridade", "executar_apos", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if candidata is None:
+            return None
+        reservada = Tarefa.objects.filter(id=candidata, status=Tarefa.PENDENTE).update(
+            status=Tarefa.EXECUTANDO,
+            trabalhador=trabalhador,
+            data_inicio=timezone.now(),
+        )
+        if reservada:
+            return Tarefa.objects.get(id=candidata)
+        # Outro trabalhador levou; tenta a próxima
+    return None
+
+
+def atraso_nova_tentativa(tentativas):
+    """Backoff exponencial: 10s, 20s, 40s... até 1h"""
+    return timedelta(seconds=min(10 * 2 ** (tentativas - 1), 3600))
+
+
+def executar(tarefa):
+    """Roda o handler e grava o desfecho (concluída, nova tentativa ou falha)"""
+    tarefa.tentativas += 1
+    try:
+        handler, _ = _handlers[tarefa.tipo]
+    except KeyError:
+        handler = None
+    try:
+        if handler is None:
+            raise TarefaDesconhecida(f"Tarefa desconhecida: {tarefa.tipo}")
+        resultado = handler(**tarefa.parametros)
+    except Exception as e:
+        logger.exception("Tarefa %s #%s falhou", tarefa.tipo, tarefa.id)
+        campos = {
+            "tentativas": tarefa.tentativas,
+            "erro": "".join(traceback.format_exception_only(type(e), e)).strip(),
+            "data_fim": timezone.now(),
+        }
+        if tarefa.tentativas < tarefa.max_tentativas and handler is not None:
+            campos["status"] = Tarefa.PENDENTE
+            campos["executar_apos"] = timezone.now() + atraso_nova_tentativa(
+                tarefa.tentativas
+            )
+        else:
+            campos["status"] = Tarefa.FALHOU
+    else:
+        campos = {
+            "tentativas": tarefa.tentativas,
+            "status": Tarefa.CONCLUIDA,
+            "resultado": resultado,
+            "erro": None,
+            "data_fim": timezone.now(),
+        }
+    _gravar(tarefa.id, campos)
+    for campo, valor in campos.items():
+        setattr(tarefa, campo, valor)
+    return tarefa
+
+
+def _gravar(tarefa_id, campos):
+    # O handler já rodou: um lock passageiro não pode deixar a tarefa em "executando"
+    for tentativa in range(GRAVAR_TENTATIVAS):
+        try:
+            Tarefa.objects.filter(id=tarefa_id).update(**campos)
+            return
+        except OperationalError:
+            if tentativa == GRAVAR_TENTATIVAS - 1:
+                raise
+            logger.warning("Falha ao gravar a tarefa #%s; tentando de novo", tarefa_id)
+            time.sleep(GRAVAR_ESPERA_S * 2**tentativa)
+
+
+def recuperar_travadas(timeout_segundos):
+    """
+    Devolve à fila tarefas 'executando' há mais tempo que o timeout (trabalhador
+    morreu). A execução perdida conta como tentativa: quem chega a
+    max_tentativas falha, como em ``executar``. Devolve quantas voltaram à fila.
+    """
+    agora = timezone.now()
+    travadas = Tarefa.objects.filter(
+        status=Tarefa.EXECUTANDO, data_inicio__lt=agora - timedelta(seconds=timeout_segundos)
+    )
+    with transaction.atomic():
+        falhas = travadas.filter(tentativas__gte=F("max_tentativas") - 1).update(
+            status=Tarefa.FALHOU,
+            tentativas=F("tentativas") + 1,
+            erro="Trabalhador interrompido durante a execução",
+            data_fim=agora,
+        )
+        devolvidas = travadas.update(
+            status=Tarefa.PENDENTE, trabalhador=None, tentativas=F("tentativas") + 1
+        )
+    if falhas:
+        logger.warning("%s tarefas travadas esgotaram as tentativas", falhas)
+    return devolvidas
+
+
+def processar(trabalhador, parar, intervalo=1.0, timeout=None):
+    """
+    Laço de um trabalhador: reserva, executa e espera quando a fila está vazia.
+    Com ``timeout``, devolve à fila as tarefas travadas a cada
+    RECUPERACAO_INTERVALO_S. Erros de banco não derrubam o trabalhador.
+    """
+    proxima_recuperacao = time.monotonic()
+    while not parar.is_set():
+        close_old_connections()
+        if timeout is not None and time.monotonic() >= proxima_recuperacao:
+            proxima_recuperacao = time.monotonic() + RECUPERACAO_INTERVALO_S
+            try:
+                recuperar_travadas(timeout)
+            except Exception:
+                logger.exception("Erro ao recuperar tarefas travadas")
+        try:
+            tarefa = reservar(trabalhador)
+        except Exception:
+            logger.exception("Erro ao reservar tarefa")
+            tarefa = None
+        if tarefa is None:
+            parar.wait(intervalo)
+            continue
+        try:
+            executar(tarefa)
+        except Exception:
+            # Fica em "executando" até a próxima varredura de travadas
+            logger.exception("Erro ao gravar o desfecho da tarefa #%s", tarefa.id)
+            parar.wait(intervalo)
+    close_old_connections()
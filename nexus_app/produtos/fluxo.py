@@ -0,0 +1,153 @@
+"""
+Métricas de fluxo (lead time, throughput e tempo em cada status) a partir do
+histórico de EventoProjeto.
+"""
+
+import math
+from collections import defaultdict
+from statistics import median
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Coalesce, Lead, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import EventoProjeto, Projeto, ProjetoArquivado, StatusProjeto
+
+JANELAS = {
+    "dia": TruncDay,
+    "semana": TruncWeek,
+    "mes": TruncMonth,
+}
+
+SEGUNDOS_POR_DIA = 86400
+
+
+def _dias(delta):
+    return delta.total_seconds() / SEGUNDOS_POR_DIA
+
+
+def _percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not valores:
+        return None
+    indice = max(math.ceil(p / 100 * len(valores)) - 1, 0)
+    return valores[indice]
+
+
+def _iso(periodo):
+    return periodo.date().isoformat() if hasattr(periodo, "date") else periodo.isoformat()
+
+
+def throughput_e_lead_time(inicio, fim, janela="semana"):
+    """Conclusões por janela e lead time (criação -> conclusão) em dias"""
+    conclusoes = EventoProjeto.objects.filter(
+        tipo=EventoProjeto.CONCLUIDO, data__gte=inicio, data__lt=fim
+    ).annotate(periodo=JANELAS[janela]("data"))
+
+    # Throughput agregado no banco; inclui projetos já excluídos
+    contagens = conclusoes.values("periodo").annotate(total=Count("id")).order_by("periodo")
+
+    # Lead time: criação pelo evento CRIADO, que sobrevive ao arquivamento e à
+    # purga; sem ele, a data da linha em Projeto ou em ProjetoArquivado
+    def _criacao(queryset, campo):
+        return Subquery(queryset.values(campo)[:1])
+
+    criacao = Coalesce(
+        _criacao(
+            EventoProjeto.objects.filter(
+                projeto_id=OuterRef("projeto_id"), tipo=EventoProjeto.CRIADO
+            ).order_by("data"),
+            "data",
+        ),
+        _criacao(Projeto.todos.filter(id=OuterRef("projeto_id")), "data_criacao"),
+        _criacao(ProjetoArquivado.objects.filter(id=OuterRef("projeto_id")), "data_criacao"),
+    )
+    leads_por_periodo = defaultdict(list)
+    for periodo, data, data_criacao in (
+        conclusoes.annotate(criacao=criacao)
+        .values_list("periodo", "data", "criacao")
+        .iterator(chunk_size=2000)
+    ):
+        if data_criacao is not None:
+            leads_por_periodo[periodo].append(_dias(data - data_criacao))
+
+    serie = []
+    todos = []
+    for linha in contagens:
+        leads = sorted(leads_por_periodo.get(linha["periodo"], []))
+        todos.extend(leads)
+        serie.append(
+            {
+                "periodo": _iso(linha["periodo"]),
+                "concluidos": linha["total"],
+                "lead_time_medio_dias": round(sum(leads) / len(leads), 2)
+                if leads
+                else None,
+                "lead_time_p50_dias": round(median(leads), 2) if leads else None,
+            }
+        )
+
+    todos.sort()
+    resumo = {
+        "concluidos": sum(linha["concluidos"] for linha in serie),
+        "medio_dias": round(sum(todos) / len(todos), 2) if todos else None,
+        "p50_dias": round(median(todos), 2) if todos else None,
+        "p85_dias": round(_percentil(todos, 85), 2) if todos else None,
+    }
+    return serie, resumo
+
+
+def tempo_em_status(inicio, fim):
+    """
+    Tempo (dias) que os projetos passaram em cada status dentro do período.
+
+    Cada evento abre um trecho no status registrado, que termina no evento
+    seguinte do mesmo projeto (LEAD) ou em ``fim``. Trechos iniciados por
+    eventos de saída do quadro (conclusão, rejeição) não contam.
+    """
+    agora = min(fim, timezone.now())
+    eventos = (
+        EventoProjeto.objects.filter(data__lt=fim)
+        .annotate(
+            proximo=Window(
+                Lead("data"),
+                partition_by=[F("projeto_id")],
+                order_by=[F("data").asc(), F("id").asc()],
+            )
+        )
+        # Só trechos que se sobrepõem ao período (filtro sobre a janela)
+        .filter(Q(proximo__gt=inicio) | Q(proximo__isnull=True))
+        .values_list("projeto_id", "status_id", "tipo", "data", "proximo")
+    )
+
+    por_projeto_status = defaultdict(float)
+    for projeto_id, status_id, tipo, data, proximo in eventos.iterator(chunk_size=2000):
+        if tipo in EventoProjeto.TIPOS_SAIDA or status_id is None:
+            continue
+        trecho_inicio = max(data, inicio)
+        trecho_fim = min(proximo or agora, agora)
+        if trecho_fim <= trecho_inicio:
+            continue
+        por_projeto_status[(projeto_id, status_id)] += _dias(trecho_fim - trecho_inicio)
+
+    por_status = defaultdict(list)
+    for (_, status_id), dias in por_projeto_status.items():
+        por_status[status_id].append(dias)
+
+    resultado = []
+    for status in StatusProjeto.objects.order_by("ordem"):
+        duracoes = sorted(por_status.get(status.id, []))
+        resultado.append(
+            {
+                "id": status.id,
+                "nome": status.nome,
+                "cor": status.cor,
+                "projetos": len(duracoes),
+                "media_dias": round(sum(duracoes) / len(duracoes), 2)
+                if duracoes
+                else None,
+                "p50_dias": round(median(duracoes), 2) if duracoes else None,
+                "total_dias": round(sum(duracoes), 2),
+            }
+        )
+    return resultado
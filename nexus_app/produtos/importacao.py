@@ -0,0 +1,234 @@
+"""
+Importação em massa do catálogo (Produto/Categoria) a partir de CSV ou JSON
+lines.
+
+As linhas são lidas em streaming e gravadas em lotes: produtos existentes são
+encontrados pelo ``codigo`` (upsert) e categorias são resolvidas pelo nome num
+mapa em memória, criadas sob demanda. Linhas inválidas não interrompem a
+importação; entram no relatório de erros com o número da linha.
+"""
+
+import codecs
+import csv
+import json
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import referencia
+from .models import Categoria, Produto
+
+FORMATOS = ("csv", "jsonl")
+
+CAMPOS_TEXTO = ("nome", "descricao", "unidade", "observacoes")
+CAMPOS_INTEIROS = ("estoque", "estoque_minimo")
+
+VERDADEIROS = {"1", "true", "sim", "s", "yes", "y"}
+FALSOS = {"0", "false", "nao", "não", "n", "no", ""}
+
+MAX_ERROS = 1000
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+def detectar_formato(nome_arquivo):
+    return "jsonl" if nome_arquivo.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def ler_linhas(arquivo, formato):
+    """Gera (número da linha, dict) a partir de um arquivo binário, sem carregá-lo inteiro"""
+    texto = codecs.iterdecode(arquivo, "utf-8-sig")
+    if formato == "csv":
+        leitor = csv.DictReader(texto)
+        for linha in leitor:
+            yield leitor.line_num, linha
+        return
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError as e:
+            yield numero, LinhaInvalida(f"JSON inválido: {e}")
+            continue
+        if not isinstance(dados, dict):
+            yield numero, LinhaInvalida("Cada linha deve ser um objeto JSON")
+            continue
+        yield numero, dados
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in VERDADEIROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise LinhaInvalida(f"Valor booleano inválido: {valor}")
+
+
+def _normalizar(dados):
+    """Valida a linha e devolve (codigo, nome da categoria ou None, campos presentes)"""
+    codigo = str(dados.get("codigo") or "").strip()
+    if not codigo:
+        raise LinhaInvalida("codigo é obrigatório")
+
+    campos = {}
+    for campo in CAMPOS_TEXTO:
+        if campo in dados and dados[campo] is not None:
+            campos[campo] = str(dados[campo]).strip()
+    for campo in CAMPOS_INTEIROS:
+        if campo in dados and dados[campo] not in (None, ""):
+            try:
+                campos[campo] = int(dados[campo])
+            except (TypeError, ValueError):
+                raise LinhaInvalida(f"{campo} deve ser inteiro")
+    if "ativo" in dados and dados["ativo"] is not None:
+        campos["ativo"] = _booleano(dados["ativo"])
+    if "nome" in campos and not campos["nome"]:
+        raise LinhaInvalida("nome não pode ser vazio")
+
+    categoria = dados.get("categoria")
+    categoria = str(categoria).strip() if categoria not in (None, "") else None
+    return codigo, categoria, campos
+
+
+def _atualizar(produtos, campos):
+    """
+    UPDATE ... WHERE id = %s via executemany.
+
+    bulk_update monta um CASE WHEN por campo e linha, e o custo de resolver
+    essas expressões no ORM (~2 ms por produto) dominava a importação.
+    """
+    fields = [Produto._meta.get_field(campo) for campo in campos]
+    atribuicoes = ", ".join(f"{connection.ops.quote_name(f.column)} = %s" for f in fields)
+    tabela = connection.ops.quote_name(Produto._meta.db_table)
+    sql = f"UPDATE {tabela} SET {atribuicoes} WHERE id = %s"
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [
+                [f.get_db_prep_save(getattr(p, f.attname), connection) for f in fields] + [p.id]
+                for p in produtos
+            ],
+        )
+
+
+class Importador:
+    """Acumula linhas válidas e grava um lote por transação"""
+
+    def __init__(self, lote=1000, criar_categorias=True):
+        self.lote = lote
+        self.criar_categorias = criar_categorias
+        self.categorias = {
+            nome.casefold(): id for id, nome in Categoria.objects.values_list("id", "nome")
+        }
+        self.pendentes = {}
+        self.resumo = {
+            "linhas": 0,
+            "criados": 0,
+            "atualizados": 0,
+            "categorias_criadas": 0,
+            "total_erros": 0,
+            "erros": [],
+        }
+
+    def erro(self, numero, mensagem):
+        self.resumo["total_erros"] += 1
+        if len(self.resumo["erros"]) < MAX_ERROS:
+            self.resumo["erros"].append({"linha": numero, "erro": mensagem})
+
+    def adicionar(self, numero, dados):
+        self.resumo["linhas"] += 1
+        if isinstance(dados, Exception):
+            self.erro(numero, str(dados))
+            return
+        try:
+            codigo, categoria, campos = _normalizar(dados)
+        except LinhaInvalida as e:
+            self.erro(numero, str(e))
+            return
+        # Código repetido no mesmo lote: a última linha prevalece sobre as anteriores
+        anterior = self.pendentes.get(codigo)
+        if anterior:
+            campos = {**anterior[2], **campos}
+            categoria = categoria or anterior[1]
+        self.pendentes[codigo] = (numero, categoria, campos)
+        if len(self.pendentes) >= self.lote:
+            self.gravar()
+
+    def _resolver_categorias(self):
+        novas = {
+            categoria.casefold(): categoria
+            for _, categoria, _ in self.pendentes.values()
+            if categoria and categoria.casefold() not in self.categorias
+        }
+        if not novas or not self.criar_categorias:
+            return
+        Categoria.objects.bulk_create([Categoria(nome=nome) for nome in novas.values()])
+        for id, nome in Categoria.objects.filter(nome__in=novas.values()).values_list(
+            "id", "nome"
+        ):
+            self.categorias.setdefault(nome.casefold(), id)
+        self.resumo["categorias_criadas"] += len(novas)
+
+    def gravar(self):
+        if not self.pendentes:
+            return
+        with transaction.atomic():
+            self._resolver_categorias()
+
+            existentes = {}
+            for produto in Produto.objects.filter(codigo__in=self.pendentes.keys()):
+                existentes.setdefault(produto.codigo, []).append(produto)
+
+            novos = []
+            alterados = []
+            campos_alterados = {"data_atualizacao"}
+            agora = timezone.now()
+            for codigo, (numero, categoria, campos) in self.pendentes.items():
+                if categoria:
+                    categoria_id = self.categorias.get(categoria.casefold())
+                    if categoria_id is None:
+                        self.erro(numero, f"Categoria não encontrada: {categoria}")
+                        continue
+                    campos["categoria_id"] = categoria_id
+
+                if codigo in existentes:
+                    for produto in existentes[codigo]:
+                        for campo, valor in campos.items():
+                            setattr(produto, campo, valor)
+                        produto.data_atualizacao = agora
+                        alterados.append(produto)
+                    campos_alterados.update(campos)
+                elif "nome" not in campos:
+                    self.erro(numero, "nome é obrigatório para produtos novos")
+                else:
+                    novos.append(Produto(codigo=codigo, **campos))
+
+            Produto.objects.bulk_create(novos)
+            if alterados:
+                _atualizar(alterados, sorted(campos_alterados))
+        self.resumo["criados"] += len(novos)
+        self.resumo["atualizados"] += len(alterados)
+        self.pendentes = {}
+
+
+def importar(arquivo, formato="csv", lote=1000, criar_categorias=True):
+    """Importa o catálogo de um arquivo binário e devolve o resumo com os erros por linha"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+    importador = Importador(lote=lote, criar_categorias=criar_categorias)
+    try:
+        for numero, dados in ler_linhas(arquivo, formato):
+            importador.adicionar(numero, dados)
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Arquivo corrompido: grava o que já foi lido e reporta onde parou
+        importador.erro(importador.resumo["linhas"] + 1, f"Leitura interrompida: {e}")
+    importador.gravar()
+    # bulk_create/UPDATE direto não disparam post_save
+    referencia.invalidar("produtos", "categorias")
+    return importador.resumo
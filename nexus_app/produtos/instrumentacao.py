@@ -0,0 +1,306 @@
+"""
+Métricas de processo em formato Prometheus.
+
+Cada thread grava em seu próprio shard (dicts simples, sem lock no caminho da
+requisição); a exportação soma os shards. Com METRICAS_DIR configurado, cada
+processo (worker do gunicorn) grava periodicamente seu snapshot em
+``METRICAS_DIR/metricas-<pid>-<início>.json`` e a exportação agrega todos os
+arquivos. Snapshots de processos que terminaram (pid morto, ou reaproveitado
+por outro processo com outro início) são somados em ``metricas-encerrados.json``
+e apagados, então os contadores nunca voltam para trás nem contam em dobro.
+METRICAS_DIR precisa ser local à máquina: a vida dos processos é vista pelo pid.
+"""
+
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_TAMANHO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# nome -> (tipo, descrição, buckets)
+METRICAS = {
+    "nexus_http_requests_total": (
+        "counter",
+        "Requisições por view, método e status HTTP",
+        None,
+    ),
+    "nexus_http_errors_total": (
+        "counter",
+        "Respostas com status 5xx por view",
+        None,
+    ),
+    "nexus_http_request_duration_seconds": (
+        "histogram",
+        "Duração das requisições por view",
+        BUCKETS_DURACAO,
+    ),
+    "nexus_http_response_size_bytes": (
+        "histogram",
+        "Tamanho das respostas por view",
+        BUCKETS_TAMANHO,
+    ),
+    "nexus_db_queries_total": (
+        "counter",
+        "Queries SQL executadas por view",
+        None,
+    ),
+    "nexus_db_query_duration_seconds_total": (
+        "counter",
+        "Tempo gasto em queries SQL por view",
+        None,
+    ),
+}
+
+
+class _Shard:
+    __slots__ = ("contadores", "histogramas")
+
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}
+
+
+ARQUIVO_PROCESSO = re.compile(r"metricas-(\d+)-(\d+)\.json")
+ENCERRADOS = "metricas-encerrados.json"
+
+_shards = []
+_local = threading.local()
+_ultima_gravacao = 0.0
+_processo = {"pid": None, "inicio": None}
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        # list.append é atômico; o registro acontece uma vez por thread
+        _shards.append(shard)
+    return shard
+
+
+def incrementar(nome, labels, valor=1):
+    """Soma valor ao contador nome{labels}; labels é uma tupla de pares"""
+    contadores = _shard().contadores
+    chave = (nome, labels)
+    contadores[chave] = contadores.get(chave, 0) + valor
+
+
+def observar(nome, labels, valor):
+    """Registra uma observação no histograma nome{labels}"""
+    histogramas = _shard().histogramas
+    chave = (nome, labels)
+    buckets = METRICAS[nome][2]
+    serie = histogramas.get(chave)
+    if serie is None:
+        # contagem por bucket (não cumulativa) + [+Inf] + soma
+        serie = histogramas[chave] = [0] * (len(buckets) + 1) + [0.0]
+    serie[bisect_left(buckets, valor)] += 1
+    serie[-1] += valor
+
+
+def snapshot():
+    """Soma os shards de todas as threads deste processo"""
+    contadores = {}
+    histogramas = {}
+    for shard in list(_shards):
+        for chave, valor in shard.contadores.copy().items():
+            contadores[chave] = contadores.get(chave, 0) + valor
+        for chave, serie in shard.histogramas.copy().items():
+            _somar_serie(histogramas, chave, serie)
+    return contadores, histogramas
+
+
+def _somar_serie(histogramas, chave, serie):
+    atual = histogramas.get(chave)
+    if atual is None:
+        histogramas[chave] = list(serie)
+    else:
+        for i, valor in enumerate(serie):
+            atual[i] += valor
+
+
+def _diretorio():
+    return getattr(settings, "METRICAS_DIR", None)
+
+
+def inicio_processo(pid="self"):
+    """Instante de início do processo (ticks desde o boot, de /proc); "0" sem /proc"""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as arquivo:
+            # O nome do processo (2º campo) pode ter espaços: conta depois do ")"
+            return arquivo.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return "0"
+
+
+def _arquivo_processo():
+    # Recalculado depois do fork: o filho herda o módulo do master
+    if _processo["pid"] != os.getpid():
+        _processo["pid"] = os.getpid()
+        _processo["inicio"] = inicio_processo()
+    return f"metricas-{_processo['pid']}-{_processo['inicio']}.json"
+
+
+def _vivo(pid, inicio):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return inicio == "0" or inicio_processo(pid) == inicio
+
+
+def gravar_snapshot(forcar=False):
+    """Grava o snapshot do processo em METRICAS_DIR, no máximo a cada METRICAS_INTERVALO s"""
+    global _ultima_gravacao
+    diretorio = _diretorio()
+    if not diretorio:
+        return
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_gravacao < getattr(
+        settings, "METRICAS_INTERVALO", 1.0
+    ):
+        return
+    _ultima_gravacao = agora
+
+    os.makedirs(diretorio, exist_ok=True)
+    _gravar(os.path.join(diretorio, _arquivo_processo()), *snapshot())
+
+
+def _gravar(caminho, contadores, histogramas):
+    dados = {
+        "contadores": [[n, list(map(list, l)), v] for (n, l), v in contadores.items()],
+        "histogramas": [[n, list(map(list, l)), s] for (n, l), s in histogramas.items()],
+    }
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def _ler(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _somar(contadores, histogramas, dados):
+    for nome, labels, valor in dados["contadores"]:
+        chave = (nome, tuple(map(tuple, labels)))
+        contadores[chave] = contadores.get(chave, 0) + valor
+    for nome, labels, serie in dados["histogramas"]:
+        _somar_serie(histogramas, (nome, tuple(map(tuple, labels))), serie)
+
+
+def _processos(diretorio):
+    """[(caminho, vivo)] dos snapshots por processo"""
+    arquivos = []
+    for nome_arquivo in os.listdir(diretorio):
+        encontrado = ARQUIVO_PROCESSO.fullmatch(nome_arquivo)
+        if encontrado:
+            pid, inicio = encontrado.groups()
+            arquivos.append((os.path.join(diretorio, nome_arquivo), _vivo(int(pid), inicio)))
+    return arquivos
+
+
+def _encerrar(diretorio, mortos):
+    """Soma os snapshots de processos mortos em ENCERRADOS e apaga os arquivos"""
+    contadores = {}
+    histogramas = {}
+    for caminho in [os.path.join(diretorio, ENCERRADOS), *mortos]:
+        dados = _ler(caminho)
+        if dados is not None:
+            _somar(contadores, histogramas, dados)
+    _gravar(os.path.join(diretorio, ENCERRADOS), contadores, histogramas)
+    for morto in mortos:
+        os.remove(morto)
+
+
+def _agregar_processos():
+    """Soma os snapshots de todos os processos gravados em METRICAS_DIR"""
+    contadores = {}
+    histogramas = {}
+    diretorio = _diretorio()
+    # Lock exclusivo: ENCERRADOS e os arquivos dos mortos mudam juntos
+    with open(os.path.join(diretorio, "metricas.lock"), "a") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        arquivos = _processos(diretorio)
+        mortos = [caminho for caminho, vivo in arquivos if not vivo]
+        if mortos:
+            _encerrar(diretorio, mortos)
+        vivos = [caminho for caminho, vivo in arquivos if vivo]
+        for caminho in [os.path.join(diretorio, ENCERRADOS), *vivos]:
+            dados = _ler(caminho)
+            if dados is not None:
+                _somar(contadores, histogramas, dados)
+    return contadores, histogramas
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(labels, extra=()):
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _formatar_numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def exportar():
+    """Texto no formato de exposição do Prometheus (0.0.4)"""
+    if _diretorio():
+        gravar_snapshot(forcar=True)
+        contadores, histogramas = _agregar_processos()
+    else:
+        contadores, histogramas = snapshot()
+
+    linhas = []
+    for nome, (tipo, descricao, buckets) in METRICAS.items():
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        if tipo == "counter":
+            for (serie_nome, labels), valor in sorted(contadores.items()):
+                if serie_nome == nome:
+                    linhas.append(
+                        f"{nome}{_formatar_labels(labels)} {_formatar_numero(valor)}"
+                    )
+            continue
+        for (serie_nome, labels), serie in sorted(histogramas.items()):
+            if serie_nome != nome:
+                continue
+            acumulado = 0
+            for limite, quantidade in zip(buckets + (float("inf"),), serie[:-1]):
+                acumulado += quantidade
+                le = _formatar_labels(labels, [("le", _formatar_numero(limite))])
+                linhas.append(f"{nome}_bucket{le} {acumulado}")
+            linhas.append(
+                f"{nome}_sum{_formatar_labels(labels)} {_formatar_numero(serie[-1])}"
+            )
+            linhas.append(f"{nome}_count{_formatar_labels(labels)} {acumulado}")
+    return "\n".join(linhas) + "\n"
+
+
+def limpar():
+    """Zera as métricas do processo (usado nos testes)"""
+    for shard in list(_shards):
+        shard.contadores.clear()
+        shard.histogramas.clear()
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos import arquivamento
+
+
+class Command(BaseCommand):
+    help = "Move projetos concluídos/rejeitados antigos (e seus materiais) para as tabelas de arquivo"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=None,
+            help="Idade mínima desde a última alteração (padrão: ARQUIVAMENTO_IDADE_DIAS)",
+        )
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--limite", type=int, default=None)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas conta os projetos que seriam arquivados",
+        )
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser pelo menos 1")
+
+        if options["dry_run"]:
+            total = arquivamento.candidatos(options["dias"]).count()
+            self.stdout.write(f"{total} projetos seriam arquivados")
+            return
+
+        total = arquivamento.arquivar(
+            idade_dias=options["dias"],
+            lote=options["lote"],
+            limite=options["limite"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} projetos arquivados"))
@@ -0,0 +1,180 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from produtos.models import Projeto
+
+
+def percentil(valores, p):
+    """Percentil por interpolação linear (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    posicao = (len(valores) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (
+        posicao - inferior
+    )
+
+
+def endpoints_padrao():
+    """Endpoints medidos: nome -> URL"""
+    hoje = timezone.now().date()
+    inicio_mes = hoje.replace(day=1)
+    endpoints = {
+        "home": reverse("home"),
+        "api_metricas_filtradas": reverse("api_metricas_filtradas"),
+        "api_metricas_filtradas_periodo": (
+            f"{reverse('api_metricas_filtradas')}"
+            f"?data_inicio={inicio_mes:%Y-%m-%d}&data_fim={hoje:%Y-%m-%d}"
+        ),
+        "projetos_concluidos_api": reverse("projetos_concluidos_api"),
+        "api_projetos_rejeitados": reverse("api_projetos_rejeitados"),
+        "api_analytics_fluxo": reverse("api_analytics_fluxo"),
+    }
+    projeto_id = Projeto.objects.order_by("-id").values_list("id", flat=True).first()
+    if projeto_id:
+        endpoints["projeto_detail_api"] = reverse(
+            "projeto_detail_api", args=[projeto_id]
+        )
+    return endpoints
+
+
+class ContadorQueries:
+    """execute_wrapper que conta queries sem depender do log de debug (limitado a 9000)"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def medir(client, url, repeticoes, aquecimento):
+    """Executa GETs e devolve latências (ms), queries e bytes da última resposta"""
+    for _ in range(aquecimento):
+        client.get(url)
+
+    latencias = []
+    queries = []
+    tamanho = 0
+    status_code = None
+    for _ in range(repeticoes):
+        contador = ContadorQueries()
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            resposta = client.get(url)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        queries.append(contador.total)
+        status_code = resposta.status_code
+        tamanho = len(resposta.content)
+
+    latencias.sort()
+    return {
+        "url": url,
+        "status_code": status_code,
+        "repeticoes": repeticoes,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "media_ms": round(statistics.fmean(latencias), 3),
+        "min_ms": round(latencias[0], 3),
+        "max_ms": round(latencias[-1], 3),
+        "queries": max(queries),
+        "bytes": tamanho,
+    }
+
+
+class Command(BaseCommand):
+    help = "Mede p50/p95 de latência e nº de queries por endpoint via Django test client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=20)
+        parser.add_argument("--aquecimento", type=int, default=2)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="Mede apenas os endpoints informados (pode repetir)",
+        )
+        parser.add_argument("--usuario", default="benchmark")
+        parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+        parser.add_argument(
+            "--comparar",
+            help="JSON de uma execução anterior para exibir a variação",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeticoes"] < 1:
+            raise CommandError("--repeticoes deve ser pelo menos 1")
+
+        usuario, _ = User.objects.get_or_create(username=options["usuario"])
+        client = Client()
+        client.force_login(usuario)
+
+        endpoints = endpoints_padrao()
+        if options["endpoints"]:
+            desconhecidos = set(options["endpoints"]) - set(endpoints)
+            if desconhecidos:
+                raise CommandError(
+                    f"Endpoints desconhecidos: {', '.join(sorted(desconhecidos))}"
+                )
+            endpoints = {nome: endpoints[nome] for nome in options["endpoints"]}
+
+        resultados = {}
+        for nome, url in endpoints.items():
+            resultados[nome] = medir(
+                client, url, options["repeticoes"], options["aquecimento"]
+            )
+            self.stderr.write(
+                f"{nome}: p50={resultados[nome]['p50_ms']}ms "
+                f"p95={resultados[nome]['p95_ms']}ms "
+                f"queries={resultados[nome]['queries']}"
+            )
+
+        relatorio = {
+            "ambiente": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "banco": connection.vendor,
+                "projetos": Projeto.objects.count(),
+                "data": timezone.now().isoformat(),
+            },
+            "endpoints": resultados,
+        }
+
+        saida = json.dumps(relatorio, indent=2, sort_keys=True, ensure_ascii=False)
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                arquivo.write(saida + "\n")
+        else:
+            self.stdout.write(saida)
+
+        if options["comparar"]:
+            self._comparar(options["comparar"], resultados)
+
+    def _comparar(self, caminho, resultados):
+        with open(caminho, encoding="utf-8") as arquivo:
+            anteriores = json.load(arquivo)["endpoints"]
+        for nome, atual in resultados.items():
+            anterior = anteriores.get(nome)
+            if not anterior:
+                continue
+            variacao = (
+                (atual["p95_ms"] - anterior["p95_ms"]) / anterior["p95_ms"] * 100
+                if anterior["p95_ms"]
+                else 0
+            )
+            self.stderr.write(
+                f"{nome}: p95 {anterior['p95_ms']} -> {atual['p95_ms']}ms "
+                f"({variacao:+.1f}%), queries {anterior['queries']} -> {atual['queries']}"
+            )
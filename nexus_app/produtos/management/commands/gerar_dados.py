@@ -0,0 +1,372 @@
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from produtos import clientes, contadores, posicoes, referencia
+from produtos.models import (
+    Categoria,
+    EventoProjeto,
+    MaterialProjeto,
+    Produto,
+    Projeto,
+    StatusProjeto,
+)
+
+NOMES_STATUS = [
+    ("Orçamento", "#6c757d"),
+    ("Em produção", "#0d6efd"),
+    ("Montagem", "#fd7e14"),
+    ("Instalação", "#6f42c1"),
+    ("Entregue", "#198754"),
+]
+
+UNIDADES = ["UN", "UN", "UN", "M", "M2", "KG", "L", "CX"]
+
+CORES = ["#007bff", "#28a745", "#dc3545", "#ffc107", "#17a2b8", "#6f42c1"]
+
+
+def sorteador_zipf(rng, populacao):
+    """Retorna uma função que sorteia itens com peso 1/posição (poucos dominam)"""
+    acumulado = list(accumulate(1 / (i + 1) for i in range(len(populacao))))
+    total = acumulado[-1]
+
+    def sortear():
+        return populacao[bisect(acumulado, rng.random() * total)]
+
+    return sortear
+
+
+@contextmanager
+def sem_auto_now(model, *campos):
+    """Desliga auto_now/auto_now_add para permitir datas sintéticas no bulk_create"""
+    originais = []
+    for nome in campos:
+        campo = model._meta.get_field(nome)
+        originais.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originais:
+            campo.auto_now = auto_now
+            campo.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Gera dados sintéticos em massa (categorias, produtos, status, projetos, materiais e eventos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categorias", type=int, default=50)
+        parser.add_argument("--produtos", type=int, default=5000)
+        parser.add_argument("--status", type=int, default=len(NOMES_STATUS))
+        parser.add_argument("--projetos", type=int, default=100000)
+        parser.add_argument(
+            "--materiais",
+            type=float,
+            default=4.0,
+            help="Média de materiais por projeto",
+        )
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=730,
+            help="Janela (em dias) para as datas de criação dos projetos",
+        )
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--limpar",
+            action="store_true",
+            help="Apaga os dados existentes antes de gerar",
+        )
+
+    def handle(self, *args, **options):
+        if options["status"] < 1 or options["categorias"] < 1 or options["produtos"] < 1:
+            raise CommandError("É preciso ao menos 1 status, 1 categoria e 1 produto")
+
+        self.rng = random.Random(options["seed"])
+        self.lote = options["lote"]
+        self.agora = timezone.now()
+
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            # Geração descartável: abre mão da durabilidade em troca de velocidade
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous = OFF")
+                cursor.execute("PRAGMA temp_store = MEMORY")
+
+        if options["limpar"]:
+            self._limpar()
+
+        usuario, _ = User.objects.get_or_create(username="sintetico")
+        status_ids = self._gerar_status(options["status"])
+        categoria_ids = self._gerar_categorias(options["categorias"])
+        produto_ids = self._gerar_produtos(options["produtos"], categoria_ids)
+        total_projetos, total_materiais, total_eventos = self._gerar_projetos(
+            options["projetos"],
+            options["materiais"],
+            options["dias"],
+            usuario.id,
+            status_ids,
+            produto_ids,
+        )
+
+        total = (
+            len(status_ids)
+            + len(categoria_ids)
+            + len(produto_ids)
+            + total_projetos
+            + total_materiais
+            + total_eventos
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total} linhas geradas: {len(status_ids)} status, "
+                f"{len(categoria_ids)} categorias, {len(produto_ids)} produtos, "
+                f"{total_projetos} projetos, {total_materiais} materiais, "
+                f"{total_eventos} eventos"
+            )
+        )
+
+    def _limpar(self):
+        with transaction.atomic():
+            EventoProjeto.objects.all().delete()
+            MaterialProjeto.objects.all().delete()
+            Projeto.todos.all().delete()
+            Produto.objects.all().delete()
+            Categoria.objects.all().delete()
+            StatusProjeto.objects.all().delete()
+
+    def _inserir(self, model, objetos):
+        """Insere objetos de um gerador em lotes, cada lote em sua transação"""
+        total = 0
+        lote = []
+        for objeto in objetos:
+            lote.append(objeto)
+            if len(lote) >= self.lote:
+                total += self._gravar_lote(model, lote)
+                lote = []
+        if lote:
+            total += self._gravar_lote(model, lote)
+        return total
+
+    def _gravar_lote(self, model, lote):
+        with transaction.atomic():
+            model.objects.bulk_create(lote, batch_size=self.lote)
+        return len(lote)
+
+    def _novos(self, model, ultimo_id, *campos):
+        """Percorre as linhas com id acima de ultimo_id em páginas, sem cursor aberto durante as escritas"""
+        while True:
+            linhas = list(
+                model.objects.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", *campos)[: self.lote]
+            )
+            if not linhas:
+                return
+            yield from linhas
+            ultimo_id = linhas[-1][0]
+
+    def _gerar_status(self, quantidade):
+        ordem_inicial = StatusProjeto.objects.count()
+        objetos = []
+        for i in range(quantidade):
+            nome, cor = NOMES_STATUS[i % len(NOMES_STATUS)]
+            if i >= len(NOMES_STATUS):
+                nome = f"{nome} {i // len(NOMES_STATUS) + 1}"
+            objetos.append(
+                StatusProjeto(nome=nome, cor=cor, ordem=ordem_inicial + i + 1)
+            )
+        self._inserir(StatusProjeto, objetos)
+        return list(
+            StatusProjeto.objects.order_by("-id").values_list("id", flat=True)[
+                :quantidade
+            ]
+        )[::-1]
+
+    def _gerar_categorias(self, quantidade):
+        inicio = Categoria.objects.count()
+        objetos = (
+            Categoria(nome=f"Categoria {inicio + i + 1}", cor=self.rng.choice(CORES))
+            for i in range(quantidade)
+        )
+        self._inserir(Categoria, objetos)
+        return list(
+            Categoria.objects.order_by("-id").values_list("id", flat=True)[:quantidade]
+        )
+
+    def _gerar_produtos(self, quantidade, categoria_ids):
+        rng = self.rng
+        inicio = Produto.objects.count()
+        # Poucas categorias concentram a maior parte do catálogo
+        sortear_categoria = sorteador_zipf(rng, categoria_ids)
+
+        def produtos():
+            for i in range(quantidade):
+                numero = inicio + i + 1
+                yield Produto(
+                    nome=f"Produto {numero}",
+                    codigo=f"SKU-{numero:07d}",
+                    categoria_id=sortear_categoria(),
+                    estoque=int(rng.expovariate(1 / 50)),
+                    estoque_minimo=rng.choice([0, 5, 5, 10, 20]),
+                    unidade=rng.choice(UNIDADES),
+                    ativo=rng.random() > 0.05,
+                )
+
+        self._inserir(Produto, produtos())
+        return list(
+            Produto.objects.order_by("-id").values_list("id", flat=True)[:quantidade]
+        )
+
+    def _gerar_projetos(
+        self, quantidade, media_materiais, dias, usuario_id, status_ids, produto_ids
+    ):
+        rng = self.rng
+        agora = self.agora
+        nomes_clientes = [f"Cliente {i + 1}" for i in range(max(quantidade // 20, 1))]
+        # Distribuição de Zipf: poucos clientes e produtos respondem pela maioria
+        sortear_cliente = sorteador_zipf(rng, nomes_clientes)
+        sortear_produto = sorteador_zipf(rng, produto_ids)
+        sortear_status = sorteador_zipf(rng, status_ids)
+
+        def projetos():
+            for i in range(quantidade):
+                criacao = agora - timedelta(seconds=rng.randrange(dias * 86400))
+                entrega = (criacao + timedelta(days=rng.randint(7, 90))).date()
+                pagamento = entrega + timedelta(days=rng.choice([0, 15, 30, 60]))
+                sorteio = rng.random()
+                concluido = False
+                data_conclusao = None
+                aprovacao = "pendente"
+                data_aprovacao = None
+                motivo = None
+                if sorteio < 0.70:
+                    concluido = True
+                    aprovacao = "aprovado"
+                    data_aprovacao = criacao + timedelta(days=rng.randint(1, 10))
+                    data_conclusao = min(
+                        data_aprovacao + timedelta(days=rng.randint(5, 90)), agora
+                    )
+                elif sorteio < 0.85:
+                    aprovacao = "rejeitado"
+                    data_aprovacao = criacao + timedelta(days=rng.randint(1, 20))
+                    motivo = "Orçamento acima do esperado"
+                elif sorteio < 0.93:
+                    aprovacao = "aprovado"
+                    data_aprovacao = criacao + timedelta(days=rng.randint(1, 10))
+                if data_aprovacao and data_aprovacao > agora:
+                    data_aprovacao = agora
+                yield Projeto(
+                    nome=f"Projeto {i + 1}",
+                    cliente=sortear_cliente(),
+                    data_prazo_entrega=entrega,
+                    data_prazo_pagamento=pagamento,
+                    status_id=sortear_status(),
+                    usuario_id=usuario_id,
+                    concluido=concluido,
+                    data_conclusao=data_conclusao,
+                    aprovacao=aprovacao,
+                    data_aprovacao=data_aprovacao,
+                    motivo_rejeicao=motivo,
+                    data_criacao=criacao,
+                    data_atualizacao=data_conclusao or data_aprovacao or criacao,
+                )
+
+        ultimo_id = Projeto.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        with sem_auto_now(Projeto, "data_criacao", "data_atualizacao"):
+            total_projetos = self._inserir(Projeto, projetos())
+        # bulk_create não passa pelo save(): ordena as colunas e recalcula os contadores
+        for status_id in status_ids:
+            posicoes.rebalancear(status_id)
+        contadores.reconciliar()
+        clientes.vincular(Projeto.todos.filter(id__gt=ultimo_id))
+        referencia.invalidar(*referencia.TABELAS)
+
+        def materiais():
+            maximo = min(len(produto_ids), int(media_materiais * 3) + 1)
+            for (projeto_id,) in self._novos(Projeto, ultimo_id):
+                quantidade_materiais = min(
+                    int(rng.expovariate(1 / media_materiais)) if media_materiais else 0,
+                    maximo,
+                )
+                escolhidos = set()
+                while len(escolhidos) < quantidade_materiais:
+                    escolhidos.add(sortear_produto())
+                for produto_id in escolhidos:
+                    yield MaterialProjeto(
+                        projeto_id=projeto_id,
+                        produto_id=produto_id,
+                        quantidade=rng.randint(1, 50),
+                    )
+
+        total_materiais = self._inserir(MaterialProjeto, materiais())
+        total_eventos = self._inserir(
+            EventoProjeto, self._eventos(ultimo_id, status_ids)
+        )
+        return total_projetos, total_materiais, total_eventos
+
+    def _eventos(self, ultimo_id, status_ids):
+        """Histórico coerente com o estado final: criação, avanço pelos status, aprovação e conclusão"""
+        linhas = self._novos(
+            Projeto,
+            ultimo_id,
+            "status_id",
+            "usuario_id",
+            "data_criacao",
+            "aprovacao",
+            "data_aprovacao",
+            "data_conclusao",
+        )
+        for (
+            projeto_id,
+            status_id,
+            usuario_id,
+            criacao,
+            aprovacao,
+            data_aprovacao,
+            data_conclusao,
+        ) in linhas:
+            caminho = status_ids[: status_ids.index(status_id) + 1]
+            yield EventoProjeto(
+                projeto_id=projeto_id,
+                tipo=EventoProjeto.CRIADO,
+                status_id=caminho[0],
+                usuario_id=usuario_id,
+                data=criacao,
+            )
+            termino = data_conclusao or data_aprovacao or self.agora
+            passo = (termino - criacao) / len(caminho)
+            for i, passo_status_id in enumerate(caminho[1:], start=1):
+                yield EventoProjeto(
+                    projeto_id=projeto_id,
+                    tipo=EventoProjeto.STATUS,
+                    status_id=passo_status_id,
+                    usuario_id=usuario_id,
+                    data=criacao + passo * i,
+                )
+            if data_aprovacao:
+                yield EventoProjeto(
+                    projeto_id=projeto_id,
+                    tipo=EventoProjeto.APROVADO
+                    if aprovacao == "aprovado"
+                    else EventoProjeto.REJEITADO,
+                    status_id=status_id,
+                    usuario_id=usuario_id,
+                    data=data_aprovacao,
+                )
+            if data_conclusao:
+                yield EventoProjeto(
+                    projeto_id=projeto_id,
+                    tipo=EventoProjeto.CONCLUIDO,
+                    status_id=status_id,
+                    usuario_id=usuario_id,
+                    data=data_conclusao,
+                )
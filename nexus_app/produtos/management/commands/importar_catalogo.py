@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos import importacao
+
+
+class Command(BaseCommand):
+    help = "Importa produtos e categorias de um arquivo CSV ou JSON lines (upsert por código)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do arquivo (use - para stdin)")
+        parser.add_argument(
+            "--formato",
+            choices=importacao.FORMATOS,
+            default=None,
+            help="Padrão: deduzido pela extensão do arquivo",
+        )
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument(
+            "--sem-criar-categorias",
+            action="store_true",
+            help="Rejeita linhas com categoria inexistente em vez de criá-la",
+        )
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser pelo menos 1")
+
+        caminho = options["arquivo"]
+        formato = options["formato"] or importacao.detectar_formato(caminho)
+        try:
+            arquivo = sys.stdin.buffer if caminho == "-" else open(caminho, "rb")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with arquivo:
+            resumo = importacao.importar(
+                arquivo,
+                formato,
+                lote=options["lote"],
+                criar_categorias=not options["sem_criar_categorias"],
+            )
+
+        for erro in resumo["erros"]:
+            self.stderr.write(f"Linha {erro['linha']}: {erro['erro']}")
+        if resumo["total_erros"] > len(resumo["erros"]):
+            self.stderr.write(
+                f"... e mais {resumo['total_erros'] - len(resumo['erros'])} erros"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{resumo['linhas']} linhas: {resumo['criados']} produtos criados, "
+                f"{resumo['atualizados']} atualizados, "
+                f"{resumo['categorias_criadas']} categorias criadas, "
+                f"{resumo['total_erros']} erros"
+            )
+        )
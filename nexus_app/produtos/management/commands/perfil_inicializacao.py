@@ -0,0 +1,125 @@
+import json
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executado num interpretador novo: mede cada fase de um boot "frio" do worker
+SCRIPT = """
+import json, time
+inicio = time.perf_counter()
+import django
+django.setup()
+apps = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+wsgi = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+print(json.dumps({
+    "app_registry_ms": (apps - inicio) * 1000,
+    "wsgi_middleware_ms": (wsgi - apps) * 1000,
+    "urlconf_ms": (urls - wsgi) * 1000,
+}))
+"""
+
+# import time:  <self us> | <cumulativo us> | <indentação><módulo>
+LINHA_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+PACOTES_LOCAIS = ("produtos", "nexus_app")
+
+
+def ler_importtime(saida):
+    """[(módulo, cumulativo em ms, nível de aninhamento)] a partir do -X importtime"""
+    modulos = []
+    for linha in saida.splitlines():
+        encontrado = LINHA_IMPORTTIME.match(linha)
+        if encontrado:
+            _, cumulativo, indentacao, nome = encontrado.groups()
+            modulos.append((nome, int(cumulativo) / 1000, len(indentacao) // 2))
+    return modulos
+
+
+def medir_inicializacao():
+    """Roda o boot num subprocesso e devolve (fases, módulos importados, total em ms)"""
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        cwd=settings.BASE_DIR,
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+    if processo.returncode != 0:
+        raise CommandError(f"Falha ao inicializar o Django:\n{processo.stderr[-2000:]}")
+    fases = json.loads(processo.stdout.strip().splitlines()[-1])
+    return fases, ler_importtime(processo.stderr), total_ms
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o tempo de boot de um worker (imports, app registry, middleware, URLconf) "
+        "e falha se passar do orçamento"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orcamento-ms",
+            type=float,
+            default=getattr(settings, "INICIALIZACAO_ORCAMENTO_MS", None),
+            help="Falha se o boot passar disso (padrão: INICIALIZACAO_ORCAMENTO_MS)",
+        )
+        parser.add_argument("--top", type=int, default=15, help="Pacotes mais lentos exibidos")
+        parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+
+    def handle(self, *args, **options):
+        fases, modulos, total_ms = medir_inicializacao()
+
+        # Custo por pacote: soma dos imports de primeiro nível (o cumulativo já
+        # inclui os submódulos); módulos do projeto aparecem um a um
+        por_pacote = defaultdict(float)
+        locais = {}
+        for nome, cumulativo, nivel in modulos:
+            if nivel == 0:
+                por_pacote[nome.split(".")[0]] += cumulativo
+            if nome.split(".")[0] in PACOTES_LOCAIS:
+                locais[nome] = cumulativo
+        pacotes = sorted(por_pacote.items(), key=lambda item: item[1], reverse=True)
+
+        relatorio = {
+            "total_ms": round(total_ms, 1),
+            "imports_ms": round(sum(por_pacote.values()), 1),
+            "fases_ms": {fase: round(ms, 1) for fase, ms in fases.items()},
+            "pacotes_ms": {nome: round(ms, 1) for nome, ms in pacotes[: options["top"]]},
+            "modulos_locais_ms": {
+                nome: round(ms, 1)
+                for nome, ms in sorted(locais.items(), key=lambda item: item[1], reverse=True)
+            },
+            "orcamento_ms": options["orcamento_ms"],
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        else:
+            self.stdout.write(f"Boot total: {relatorio['total_ms']} ms")
+            for fase, ms in relatorio["fases_ms"].items():
+                self.stdout.write(f"  {fase}: {ms} ms")
+            self.stdout.write(f"Imports ({relatorio['imports_ms']} ms) por pacote:")
+            for nome, ms in relatorio["pacotes_ms"].items():
+                self.stdout.write(f"  {ms:>8.1f} ms  {nome}")
+            self.stdout.write("Módulos do projeto:")
+            for nome, ms in relatorio["modulos_locais_ms"].items():
+                self.stdout.write(f"  {ms:>8.1f} ms  {nome}")
+
+        orcamento = options["orcamento_ms"]
+        if orcamento and total_ms > orcamento:
+            raise CommandError(
+                f"Boot levou {total_ms:.0f} ms, acima do orçamento de {orcamento:.0f} ms"
+            )
+        if orcamento and not options["json"]:
+            self.stdout.write(self.style.SUCCESS(f"Dentro do orçamento ({orcamento:.0f} ms)"))
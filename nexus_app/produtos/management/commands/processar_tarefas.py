@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from produtos import fila
+
+
+def _processo(trabalhador, intervalo, timeout):
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: parar.set())
+    signal.signal(signal.SIGINT, lambda *args: parar.set())
+    fila.processar(trabalhador, parar, intervalo, timeout)
+
+
+class Command(BaseCommand):
+    help = "Processa a fila de tarefas com um pool de threads ou de processos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concorrencia", type=int, default=2)
+        parser.add_argument(
+            "--modo",
+            choices=["threads", "processos"],
+            default="threads",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=1.0,
+            help="Segundos de espera quando a fila está vazia",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=3600,
+            help=(
+                "Tarefas 'executando' há mais que isso voltam para a fila "
+                "(ao iniciar e periodicamente)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["concorrencia"] < 1:
+            raise CommandError("--concorrencia deve ser pelo menos 1")
+
+        recuperadas = fila.recuperar_travadas(options["timeout"])
+        if recuperadas:
+            self.stdout.write(f"{recuperadas} tarefas travadas devolvidas à fila")
+
+        prefixo = f"{socket.gethostname()}:{os.getpid()}"
+        nomes = [f"{prefixo}:{i}" for i in range(options["concorrencia"])]
+        self.stdout.write(
+            f"Processando tarefas ({options['modo']}, concorrência {len(nomes)}): "
+            f"{', '.join(sorted(fila.handlers()))}"
+        )
+
+        if options["modo"] == "processos":
+            self._processos(nomes, options["intervalo"], options["timeout"])
+        else:
+            self._threads(nomes, options["intervalo"], options["timeout"])
+
+    def _threads(self, nomes, intervalo, timeout):
+        parar = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: parar.set())
+        threads = [
+            threading.Thread(
+                target=fila.processar, args=(nome, parar, intervalo, timeout), name=nome
+            )
+            for nome in nomes
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrando após as tarefas em andamento...")
+            parar.set()
+            for thread in threads:
+                thread.join()
+
+    def _processos(self, nomes, intervalo, timeout):
+        # Conexões não podem ser compartilhadas entre processos
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        processos = [
+            contexto.Process(target=_processo, args=(nome, intervalo, timeout), name=nome)
+            for nome in nomes
+        ]
+        for processo in processos:
+            processo.start()
+        # Repassa o SIGTERM (docker stop) para os filhos encerrarem com calma
+        signal.signal(
+            signal.SIGTERM, lambda *args: [processo.terminate() for processo in processos]
+        )
+        try:
+            for processo in processos:
+                processo.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrando após as tarefas em andamento...")
+            for processo in processos:
+                processo.terminate()
+            for processo in processos:
+                processo.join()
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from produtos import purga
+
+
+def dentro_do_horario(hora, inicio, fim):
+    """Janela [inicio, fim) em horas; aceita janelas que cruzam a meia-noite"""
+    if inicio <= fim:
+        return inicio <= hora < fim
+    return hora >= inicio or hora < fim
+
+
+class Command(BaseCommand):
+    help = "Remove de fato os projetos excluídos logicamente, em lotes pequenos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=200)
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0.05,
+            help="Segundos de espera entre lotes",
+        )
+        parser.add_argument(
+            "--carencia",
+            type=int,
+            default=0,
+            help="Só purga projetos excluídos há mais de N minutos",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Fica em execução, purgando a cada --intervalo segundos",
+        )
+        parser.add_argument("--intervalo", type=int, default=300)
+        parser.add_argument(
+            "--ignorar-horario",
+            action="store_true",
+            help="Executa mesmo fora de PURGA_HORARIO",
+        )
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser pelo menos 1")
+
+        while True:
+            self._executar(options)
+            if not options["continuo"]:
+                return
+            time.sleep(options["intervalo"])
+
+    def _executar(self, options):
+        inicio, fim = getattr(settings, "PURGA_HORARIO", (0, 24))
+        hora = timezone.localtime().hour
+        if not options["ignorar_horario"] and not dentro_do_horario(hora, inicio, fim):
+            self.stdout.write(f"Fora da janela de purga ({inicio}h-{fim}h)")
+            return
+
+        projetos, materiais = purga.purgar(
+            lote=options["lote"],
+            pausa=options["pausa"],
+            carencia_minutos=options["carencia"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{projetos} projetos e {materiais} materiais purgados")
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from produtos import contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores por status (ativos, pendentes, aprovados) e corrige desvios"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas mostra os status com contadores divergentes",
+        )
+
+    def handle(self, *args, **options):
+        divergentes = contadores.reconciliar(corrigir=not options["dry_run"])
+        for status_id, (atuais, corretos) in sorted(divergentes.items()):
+            self.stdout.write(
+                f"Status {status_id}: ativos/pendentes/aprovados {atuais} -> {corretos}"
+            )
+        acao = "divergentes" if options["dry_run"] else "corrigidos"
+        self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} status {acao}"))
@@ -0,0 +1,71 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import instrumentacao
+from .consultas_lentas import VIEW_ATUAL
+
+
+class ContadorSQL:
+    """execute_wrapper que acumula quantidade e tempo das queries da requisição"""
+
+    __slots__ = ("queries", "tempo")
+
+    def __init__(self):
+        self.queries = 0
+        self.tempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.queries += 1
+
+
+class InstrumentacaoMiddleware:
+    """Registra duração, queries SQL, tamanho e erros por nome de URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorSQL()
+        token = VIEW_ATUAL.set(None)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(contador))
+                response = self.get_response(request)
+        finally:
+            VIEW_ATUAL.reset(token)
+        duracao = time.perf_counter() - inicio
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "<nao_resolvida>"
+        labels = (("view", view),)
+
+        instrumentacao.incrementar(
+            "nexus_http_requests_total",
+            labels + (("method", request.method), ("status", str(response.status_code))),
+        )
+        if response.status_code >= 500:
+            instrumentacao.incrementar("nexus_http_errors_total", labels)
+        instrumentacao.observar("nexus_http_request_duration_seconds", labels, duracao)
+        if not response.streaming:
+            instrumentacao.observar(
+                "nexus_http_response_size_bytes", labels, len(response.content)
+            )
+        instrumentacao.incrementar("nexus_db_queries_total", labels, contador.queries)
+        instrumentacao.incrementar(
+            "nexus_db_query_duration_seconds_total", labels, contador.tempo
+        )
+        instrumentacao.gravar_snapshot()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Permite ao log de consultas lentas saber qual view disparou a query
+        VIEW_ATUAL.set(request.resolver_match.view_name)
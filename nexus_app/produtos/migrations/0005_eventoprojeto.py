@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0004_projeto_aprovacao_projeto_data_aprovacao_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoProjeto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.PositiveSmallIntegerField(choices=[(1, 'Criado'), (2, 'Mudança de status'), (3, 'Aprovado'), (4, 'Rejeitado'), (5, 'Aprovação resetada'), (6, 'Concluído'), (7, 'Reaberto')])),
+                ('data', models.DateTimeField(default=django.utils.timezone.now)),
+                ('projeto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='eventos', to='produtos.projeto')),
+                ('status', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='produtos.statusprojeto')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento do Projeto',
+                'verbose_name_plural': 'Eventos dos Projetos',
+                'indexes': [models.Index(fields=['projeto', 'data'], name='evento_projeto_data_idx'), models.Index(fields=['tipo', 'data'], name='evento_tipo_data_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+CRIADO = 1
+APROVADO = 3
+REJEITADO = 4
+CONCLUIDO = 6
+LOTE = 2000
+
+
+def backfill(apps, schema_editor):
+    """Reconstrói o histórico possível a partir dos timestamps atuais"""
+    Projeto = apps.get_model("produtos", "Projeto")
+    EventoProjeto = apps.get_model("produtos", "EventoProjeto")
+
+    campos = (
+        "id",
+        "status_id",
+        "usuario_id",
+        "data_criacao",
+        "aprovacao",
+        "data_aprovacao",
+        "concluido",
+        "data_conclusao",
+    )
+    eventos = []
+    for (
+        projeto_id,
+        status_id,
+        usuario_id,
+        data_criacao,
+        aprovacao,
+        data_aprovacao,
+        concluido,
+        data_conclusao,
+    ) in Projeto.objects.order_by("id").values_list(*campos).iterator(chunk_size=LOTE):
+        base = {"projeto_id": projeto_id, "status_id": status_id}
+        eventos.append(
+            EventoProjeto(tipo=CRIADO, data=data_criacao, usuario_id=usuario_id, **base)
+        )
+        if data_aprovacao and aprovacao in ("aprovado", "rejeitado"):
+            tipo = APROVADO if aprovacao == "aprovado" else REJEITADO
+            eventos.append(EventoProjeto(tipo=tipo, data=data_aprovacao, **base))
+        if concluido and data_conclusao:
+            eventos.append(EventoProjeto(tipo=CONCLUIDO, data=data_conclusao, **base))
+        if len(eventos) >= LOTE:
+            EventoProjeto.objects.bulk_create(eventos)
+            eventos = []
+    if eventos:
+        EventoProjeto.objects.bulk_create(eventos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("produtos", "0005_eventoprojeto"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
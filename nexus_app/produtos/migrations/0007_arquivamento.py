@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0006_backfill_eventoprojeto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjetoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=200)),
+                ('cliente', models.CharField(max_length=200)),
+                ('data_prazo_entrega', models.DateField()),
+                ('data_prazo_pagamento', models.DateField()),
+                ('observacoes', models.TextField(blank=True, null=True)),
+                ('concluido', models.BooleanField(default=False)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('aprovacao', models.CharField(choices=[('pendente', 'Pendente'), ('aprovado', 'Aprovado'), ('rejeitado', 'Rejeitado')], default='pendente', max_length=10)),
+                ('data_aprovacao', models.DateTimeField(blank=True, null=True)),
+                ('motivo_rejeicao', models.TextField(blank=True, null=True)),
+                ('data_criacao', models.DateTimeField()),
+                ('data_atualizacao', models.DateTimeField()),
+                ('data_arquivamento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.statusprojeto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Projeto Arquivado',
+                'verbose_name_plural': 'Projetos Arquivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='MaterialProjetoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantidade', models.IntegerField()),
+                ('observacoes', models.TextField(blank=True, null=True)),
+                ('data_criacao', models.DateTimeField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.produto')),
+                ('projeto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='materiais', to='produtos.projetoarquivado')),
+            ],
+            options={
+                'verbose_name': 'Material de Projeto Arquivado',
+                'verbose_name_plural': 'Materiais de Projetos Arquivados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='projetoarquivado',
+            index=models.Index(fields=['concluido', 'data_conclusao'], name='arquivado_concluido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projetoarquivado',
+            index=models.Index(fields=['aprovacao', 'data_aprovacao'], name='arquivado_aprovacao_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0007_arquivamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='data_exclusao',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='projeto',
+            name='excluido',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='eventoprojeto',
+            name='tipo',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Criado'), (2, 'Mudança de status'), (3, 'Aprovado'), (4, 'Rejeitado'), (5, 'Aprovação resetada'), (6, 'Concluído'), (7, 'Reaberto'), (8, 'Excluído')]),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(condition=models.Q(('excluido', True)), fields=['data_exclusao'], name='projeto_excluido_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0009_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='versao',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='projetoarquivado',
+            name='versao',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+from produtos.posicoes import chaves_espacadas
+
+
+def posicoes_iniciais(apps, schema_editor):
+    """Mantém a ordem antiga (mais recentes no topo) em cada coluna do quadro"""
+    Projeto = apps.get_model("produtos", "Projeto")
+    quadro = Projeto.objects.filter(excluido=False, concluido=False).exclude(
+        aprovacao="rejeitado"
+    )
+    for status_id in quadro.order_by().values_list("status_id", flat=True).distinct():
+        ids = list(
+            quadro.filter(status_id=status_id)
+            .order_by("-data_criacao")
+            .values_list("id", flat=True)
+        )
+        for id, chave in zip(ids, chaves_espacadas(len(ids))):
+            Projeto.objects.filter(id=id).update(posicao=chave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0010_projeto_versao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='posicao',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='projetoarquivado',
+            name='posicao',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(fields=['status', 'posicao'], name='projeto_status_posicao_idx'),
+        ),
+        migrations.RunPython(posicoes_iniciais, migrations.RunPython.noop),
+    ]
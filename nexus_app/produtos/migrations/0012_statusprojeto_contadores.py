@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:39
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def preencher_contadores(apps, schema_editor):
+    Projeto = apps.get_model("produtos", "Projeto")
+    StatusProjeto = apps.get_model("produtos", "StatusProjeto")
+    linhas = (
+        Projeto.objects.filter(excluido=False, concluido=False)
+        .exclude(aprovacao="rejeitado")
+        .order_by()
+        .values("status_id")
+        .annotate(
+            ativos=Count("id"),
+            pendentes=Count("id", filter=Q(aprovacao="pendente")),
+            aprovados=Count("id", filter=Q(aprovacao="aprovado")),
+        )
+    )
+    for linha in linhas:
+        StatusProjeto.objects.filter(id=linha["status_id"]).update(
+            total_ativos=linha["ativos"],
+            total_pendentes=linha["pendentes"],
+            total_aprovados=linha["aprovados"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0011_projeto_posicao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statusprojeto',
+            name='total_aprovados',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statusprojeto',
+            name='total_ativos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statusprojeto',
+            name='total_pendentes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0012_statusprojeto_contadores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(condition=models.Q(('excluido', False)), fields=['data_prazo_entrega', 'aprovacao', 'concluido'], name='projeto_prazo_entrega_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(condition=models.Q(('excluido', False)), fields=['data_prazo_pagamento', 'aprovacao', 'concluido'], name='projeto_prazo_pagamento_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:09
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LOTE = 500
+
+
+# Cópia de produtos.clientes.normalizar (a migração não deve mudar se o módulo mudar)
+def normalizar(nome):
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", nome or "") if not unicodedata.combining(c)
+    )
+    return re.sub(r"[\W_]+", " ", sem_acento.casefold()).strip()
+
+
+def preencher_clientes(apps, schema_editor):
+    """Um Cliente por chave; o nome é a grafia mais usada entre as variantes"""
+    Cliente = apps.get_model("produtos", "Cliente")
+    Projeto = apps.get_model("produtos", "Projeto")
+    variantes = defaultdict(Counter)
+    ids = defaultdict(list)
+    # Uma leitura só; os UPDATEs vão por id (Projeto.cliente não tem índice)
+    for id, texto in Projeto.objects.order_by().values_list("id", "cliente").iterator():
+        chave = normalizar(texto)
+        if chave:
+            variantes[chave][texto] += 1
+            ids[chave].append(id)
+    for chave, contagem in variantes.items():
+        nome = min(contagem, key=lambda texto: (-contagem[texto], texto)).strip()
+        cliente = Cliente.objects.create(chave=chave, nome=nome)
+        for inicio in range(0, len(ids[chave]), LOTE):
+            Projeto.objects.filter(id__in=ids[chave][inicio : inicio + LOTE]).update(
+                cliente_cadastro=cliente
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0013_projeto_prazo_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=200)),
+                ('chave', models.CharField(editable=False, max_length=200, unique=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Cliente',
+                'verbose_name_plural': 'Clientes',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='projeto',
+            name='cliente_cadastro',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='projetos', to='produtos.cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(fields=['cliente_cadastro', 'excluido', 'concluido', 'aprovacao', 'data_prazo_entrega'], name='projeto_cliente_resumo_idx'),
+        ),
+        migrations.RunPython(preencher_clientes, migrations.RunPython.noop),
+    ]
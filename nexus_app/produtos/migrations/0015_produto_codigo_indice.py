@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0014_cliente'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='produto',
+            name='codigo',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+    ]
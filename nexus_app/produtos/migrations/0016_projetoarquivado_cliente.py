@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:39
+
+import re
+import unicodedata
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LOTE = 500
+
+
+# Cópia de produtos.clientes.normalizar (a migração não deve mudar se o módulo mudar)
+def normalizar(nome):
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", nome or "") if not unicodedata.combining(c)
+    )
+    return re.sub(r"[\W_]+", " ", sem_acento.casefold()).strip()
+
+
+def preencher_clientes(apps, schema_editor):
+    """Liga os arquivados ao Cliente da mesma chave (criado se só existia no arquivo)"""
+    Cliente = apps.get_model("produtos", "Cliente")
+    ProjetoArquivado = apps.get_model("produtos", "ProjetoArquivado")
+    ids = defaultdict(list)
+    nomes = {}
+    for id, texto in ProjetoArquivado.objects.order_by().values_list("id", "cliente").iterator():
+        chave = normalizar(texto)
+        if chave:
+            ids[chave].append(id)
+            nomes.setdefault(chave, texto.strip())
+    for chave, lista in ids.items():
+        cliente, _ = Cliente.objects.get_or_create(chave=chave, defaults={"nome": nomes[chave]})
+        for inicio in range(0, len(lista), LOTE):
+            ProjetoArquivado.objects.filter(id__in=lista[inicio : inicio + LOTE]).update(
+                cliente_cadastro=cliente
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0015_produto_codigo_indice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projetoarquivado',
+            name='cliente_cadastro',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='arquivados', to='produtos.cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='projetoarquivado',
+            index=models.Index(fields=['cliente_cadastro', 'aprovacao'], name='arquivado_cliente_idx'),
+        ),
+        migrations.RunPython(preencher_clientes, migrations.RunPython.noop),
+    ]
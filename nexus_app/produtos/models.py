@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from . import clientes, contadores, posicoes
 
 
 class Categoria(models.Model):
@@ -18,7 +22,7 @@ class Categoria(models.Model):
 
 class Produto(models.Model):
     nome = models.CharField(max_length=200)
-    codigo = models.CharField(max_length=50, blank=True, null=True)
+    codigo = models.CharField(max_length=50, blank=True, null=True, db_index=True)
     descricao = models.TextField(blank=True)
     # preco = models.DecimalField(max_digits=10, decimal_places=2)
     categoria = models.ForeignKey(
@@ -48,6 +52,11 @@ class StatusProjeto(models.Model):
     ativo = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
 
+    # CONTADORES DESNORMALIZADOS (ver produtos.contadores / reconciliar_contadores)
+    total_ativos = models.IntegerField(default=0, editable=False)
+    total_pendentes = models.IntegerField(default=0, editable=False)
+    total_aprovados = models.IntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.nome
 
@@ -57,6 +66,101 @@ class StatusProjeto(models.Model):
         ordering = ["ordem"]
 
 
+class Cliente(models.Model):
+    nome = models.CharField(max_length=200)
+    # Nome normalizado (ver produtos.clientes.normalizar): deduplica e serve o autocomplete
+    chave = models.CharField(max_length=200, unique=True, editable=False)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.nome
+
+    def clean(self):
+        chave = clientes.normalizar(self.nome)
+        if Cliente.objects.filter(chave=chave).exclude(id=self.id).exists():
+            raise ValidationError({"nome": "Já existe um cliente com esse nome"})
+
+    def save(self, *args, **kwargs):
+        self.chave = clientes.normalizar(self.nome)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Cliente"
+        verbose_name_plural = "Clientes"
+        ordering = ["nome"]
+
+
+class ConflitoVersao(Exception):
+    """O projeto foi alterado por outra requisição desde que foi lido"""
+
+    def __init__(self, projeto_id, versao_esperada):
+        self.projeto_id = projeto_id
+        self.versao_esperada = versao_esperada
+        super().__init__(
+            f"Projeto {projeto_id} foi alterado por outro usuário; recarregue e tente novamente"
+        )
+
+
+# Projetos por UPDATE em transicionar (abaixo do limite de parâmetros do SQLite)
+LOTE_TRANSICAO = 500
+
+
+class ProjetoQuerySet(models.QuerySet):
+    def transicionar(self, evento, usuario=None, **campos):
+        """
+        Aplica a mesma transição a todos os projetos do queryset, em lotes de
+        LOTE_TRANSICAO por id numa única transação: por lote um UPDATE (com
+        versao + 1), contadores ajustados de uma vez e um EventoProjeto por
+        projeto. Devolve quantos projetos mudaram.
+        """
+        total = 0
+        ultimo_id = 0
+        agora = timezone.now()
+        with transaction.atomic():
+            while True:
+                # Avança por id: projetos já transicionados podem sair do filtro
+                estados = list(
+                    self.filter(id__gt=ultimo_id)
+                    .order_by("id")
+                    .values_list("id", *contadores.CAMPOS)[:LOTE_TRANSICAO]
+                )
+                if not estados:
+                    break
+                ids = [id for id, *_ in estados]
+                Projeto.todos.filter(id__in=ids).update(
+                    versao=models.F("versao") + 1, data_atualizacao=agora, **campos
+                )
+                pares = []
+                for _, *antes in estados:
+                    depois = tuple(
+                        campos.get(campo, valor) for campo, valor in zip(contadores.CAMPOS, antes)
+                    )
+                    pares.append((tuple(antes), depois))
+                contadores.ajustar_varios(pares)
+                EventoProjeto.objects.bulk_create(
+                    EventoProjeto(
+                        projeto_id=id,
+                        tipo=evento,
+                        status_id=depois[0],
+                        usuario=usuario,
+                        data=agora,
+                    )
+                    for id, (_, depois) in zip(ids, pares)
+                )
+                total += len(ids)
+                if len(ids) < LOTE_TRANSICAO:
+                    break
+                ultimo_id = ids[-1]
+        return total
+
+
+class ProjetoManager(models.Manager.from_queryset(ProjetoQuerySet)):
+    """Manager padrão: esconde projetos excluídos (soft delete) aguardando a purga"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(excluido=False)
+
+
 class Projeto(models.Model):
     APROVACAO_CHOICES = [
         ('pendente', 'Pendente'),
@@ -66,6 +170,16 @@ class Projeto(models.Model):
     
     nome = models.CharField(max_length=200)
     cliente = models.CharField(max_length=200)
+    # Cliente cadastrado correspondente ao texto acima (mantido pelo save/atualizar);
+    # o índice composto de Meta.indexes cobre as consultas por cliente
+    cliente_cadastro = models.ForeignKey(
+        Cliente,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="projetos",
+        db_index=False,
+    )
     data_prazo_entrega = models.DateField()
     data_prazo_pagamento = models.DateField()
     status = models.ForeignKey(StatusProjeto, on_delete=models.CASCADE)
@@ -79,53 +193,260 @@ class Projeto(models.Model):
     data_aprovacao = models.DateTimeField(blank=True, null=True)
     motivo_rejeicao = models.TextField(blank=True, null=True)
     
+    # EXCLUSÃO LÓGICA (removido de fato pelo comando purgar_projetos)
+    excluido = models.BooleanField(default=False)
+    data_exclusao = models.DateTimeField(blank=True, null=True)
+    
+    # CONCORRÊNCIA OTIMISTA: incrementada a cada alteração
+    versao = models.PositiveIntegerField(default=1)
+    
+    # ORDEM NA COLUNA: índice fracionário (ver produtos.posicoes)
+    posicao = models.CharField(max_length=255, default="", blank=True)
+    
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    objects = ProjetoManager()
+    todos = models.Manager()
+
     def __str__(self):
         return f"{self.nome} - {self.cliente}"
 
-    def marcar_como_concluido(self):
-        """Marca o projeto como concluído"""
-        from django.utils import timezone
+    def save(self, *args, **kwargs):
+        # Card novo entra no topo da coluna
+        if self._state.adding and not self.posicao:
+            self.posicao = posicoes.chave_no_topo(self.status_id)
+        criando = self._state.adding
+        with transaction.atomic():
+            antes = None
+            cliente_antes = None
+            if not criando:
+                linha = (
+                    Projeto.todos.filter(id=self.id)
+                    .values_list(*contadores.CAMPOS, "cliente")
+                    .first()
+                )
+                if linha is not None:
+                    antes, cliente_antes = linha[:-1], linha[-1]
+            campos = kwargs.get("update_fields")
+            if campos is None or "cliente" in campos:
+                if self.cliente_cadastro_id is None or self.cliente != cliente_antes:
+                    self.cliente_cadastro = clientes.obter_ou_criar(self.cliente)
+                if campos is not None:
+                    kwargs["update_fields"] = {*campos, "cliente_cadastro"}
+            super().save(*args, **kwargs)
+            contadores.ajustar(antes, contadores.estado(self))
+            # Toda criação (view, admin, shell) entra no histórico; restauração e
+            # carga em massa usam bulk_create e não passam por aqui
+            if criando:
+                EventoProjeto.objects.create(
+                    projeto=self,
+                    tipo=EventoProjeto.CRIADO,
+                    status_id=self.status_id,
+                    usuario_id=self.usuario_id,
+                )
+        if self.posicao:
+            posicoes.agendar_rebalanceamento(self.status_id, self.posicao)
+
+    def registrar_evento(self, tipo, usuario=None):
+        """Grava a transição no histórico (EventoProjeto)"""
+        return EventoProjeto.objects.create(
+            projeto=self, tipo=tipo, status_id=self.status_id, usuario=usuario
+        )
+
+    def excluir(self, usuario=None):
+        """Exclusão lógica: um UPDATE, sem cascata; a purga remove depois"""
+        with transaction.atomic():
+            agora = timezone.now()
+            antes = Projeto.objects.filter(id=self.id).values_list(*contadores.CAMPOS).first()
+            excluidos = Projeto.objects.filter(id=self.id).update(
+                excluido=True,
+                data_exclusao=agora,
+                data_atualizacao=agora,
+                versao=models.F("versao") + 1,
+            )
+            if excluidos:
+                contadores.remover([antes])
+            self.excluido = True
+            self.data_exclusao = agora
+            self.registrar_evento(EventoProjeto.EXCLUIDO, usuario)
+
+    def atualizar(self, evento=None, usuario=None, versao=None, **campos):
+        """
+        Grava só os campos informados num único UPDATE condicionado à versão.
+
+        ``versao`` é a versão que o cliente viu (padrão: a desta instância).
+        Levanta ConflitoVersao se outra requisição alterou o projeto antes.
+        """
+        esperada = self.versao if versao is None else int(versao)
+        agora = timezone.now()
+        with transaction.atomic():
+            # Dentro da transação: num conflito de versão o cliente novo é desfeito
+            if "cliente" in campos:
+                campos["cliente_cadastro"] = clientes.obter_ou_criar(campos["cliente"])
+            alterados = Projeto.objects.filter(id=self.id, versao=esperada).update(
+                versao=models.F("versao") + 1, data_atualizacao=agora, **campos
+            )
+            if not alterados:
+                raise ConflitoVersao(self.id, esperada)
+            # A versão bateu, então o estado carregado é o que estava no banco
+            antes = contadores.estado(self)
+            for campo, valor in campos.items():
+                setattr(self, campo, valor)
+            contadores.ajustar(antes, contadores.estado(self))
+            self.versao = esperada + 1
+            self.data_atualizacao = agora
+            if evento is not None:
+                self.registrar_evento(evento, usuario)
+
+    def sincronizar_materiais(self, materiais, usuario=None, versao=None):
+        """
+        Deixa a lista de materiais igual a ``materiais`` ([{produto_id,
+        quantidade, observacoes?}]) com o mínimo de escritas: um bulk_create,
+        um bulk_update e um DELETE, na mesma transação que incrementa a versão
+        do projeto. Observações omitidas mantêm o valor atual.
+        Devolve {"criados", "atualizados", "removidos"}.
+        """
+        desejados = {}
+        for material in materiais:
+            produto_id = int(material["produto_id"])
+            quantidade = int(material["quantidade"])
+            if quantidade <= 0:
+                raise ValueError(f"Quantidade inválida para o produto {produto_id}")
+            if produto_id in desejados:
+                raise ValueError(f"Produto {produto_id} repetido na lista de materiais")
+            desejados[produto_id] = (quantidade, material.get("observacoes"))
 
-        self.concluido = True
-        self.data_conclusao = timezone.now()
-        self.save()
+        inexistentes = set(desejados) - set(
+            Produto.objects.filter(id__in=desejados).values_list("id", flat=True)
+        )
+        if inexistentes:
+            raise ValueError(f"Produtos não encontrados: {sorted(inexistentes)}")
 
-    def reabrir_projeto(self):
+        with transaction.atomic():
+            # Versão primeiro: edições concorrentes da lista levantam ConflitoVersao
+            self.atualizar(None, usuario, versao)
+            existentes = {
+                material.produto_id: material
+                for material in MaterialProjeto.objects.filter(projeto_id=self.id).only(
+                    "id", "produto_id", "quantidade", "observacoes"
+                )
+            }
+            novos = []
+            alterados = []
+            for produto_id, (quantidade, observacoes) in desejados.items():
+                material = existentes.get(produto_id)
+                if material is None:
+                    novos.append(
+                        MaterialProjeto(
+                            projeto_id=self.id,
+                            produto_id=produto_id,
+                            quantidade=quantidade,
+                            observacoes=observacoes,
+                        )
+                    )
+                    continue
+                observacoes = material.observacoes if observacoes is None else observacoes
+                if (material.quantidade, material.observacoes) != (quantidade, observacoes):
+                    material.quantidade = quantidade
+                    material.observacoes = observacoes
+                    alterados.append(material)
+            removidos = [
+                material.id
+                for produto_id, material in existentes.items()
+                if produto_id not in desejados
+            ]
+
+            MaterialProjeto.objects.bulk_create(novos)
+            MaterialProjeto.objects.bulk_update(alterados, ["quantidade", "observacoes"])
+            if removidos:
+                MaterialProjeto.objects.filter(id__in=removidos).delete()
+        return {"criados": len(novos), "atualizados": len(alterados), "removidos": len(removidos)}
+
+    def marcar_como_concluido(self, usuario=None, versao=None):
+        """Marca o projeto como concluído"""
+        self.atualizar(
+            EventoProjeto.CONCLUIDO,
+            usuario,
+            versao,
+            concluido=True,
+            data_conclusao=timezone.now(),
+        )
+
+    def reabrir_projeto(self, usuario=None, versao=None):
         """Reabre um projeto concluído"""
-        self.concluido = False
-        self.data_conclusao = None
-        self.save()
+        self.atualizar(
+            EventoProjeto.REABERTO, usuario, versao, concluido=False, data_conclusao=None
+        )
     
-    def aprovar_projeto(self):
+    def aprovar_projeto(self, usuario=None, versao=None):
         """Aprova o projeto"""
-        from django.utils import timezone
-        self.aprovacao = 'aprovado'
-        self.data_aprovacao = timezone.now()
-        self.motivo_rejeicao = None
-        self.save()
+        self.atualizar(
+            EventoProjeto.APROVADO,
+            usuario,
+            versao,
+            aprovacao='aprovado',
+            data_aprovacao=timezone.now(),
+            motivo_rejeicao=None,
+        )
     
-    def rejeitar_projeto(self, motivo=None):
+    def rejeitar_projeto(self, motivo=None, usuario=None, versao=None):
         """Rejeita o projeto"""
-        from django.utils import timezone
-        self.aprovacao = 'rejeitado'
-        self.data_aprovacao = timezone.now()
-        self.motivo_rejeicao = motivo
-        self.save()
+        self.atualizar(
+            EventoProjeto.REJEITADO,
+            usuario,
+            versao,
+            aprovacao='rejeitado',
+            data_aprovacao=timezone.now(),
+            motivo_rejeicao=motivo,
+        )
     
-    def resetar_aprovacao(self):
+    def resetar_aprovacao(self, usuario=None, versao=None):
         """Reseta a aprovação para pendente"""
-        self.aprovacao = 'pendente'
-        self.data_aprovacao = None
-        self.motivo_rejeicao = None
-        self.save()
+        self.atualizar(
+            EventoProjeto.PENDENTE,
+            usuario,
+            versao,
+            aprovacao='pendente',
+            data_aprovacao=None,
+            motivo_rejeicao=None,
+        )
 
     class Meta:
         verbose_name = "Projeto"
         verbose_name_plural = "Projetos"
         ordering = ["-data_criacao"]
+        indexes = [
+            models.Index(fields=["status", "posicao"], name="projeto_status_posicao_idx"),
+            # Fila da purga: índice parcial só com os excluídos
+            models.Index(
+                fields=["data_exclusao"],
+                condition=models.Q(excluido=True),
+                name="projeto_excluido_idx",
+            ),
+            # Calendário de prazos: faixa de datas agrupada sem tocar na tabela
+            models.Index(
+                fields=["data_prazo_entrega", "aprovacao", "concluido"],
+                condition=models.Q(excluido=False),
+                name="projeto_prazo_entrega_idx",
+            ),
+            models.Index(
+                fields=["data_prazo_pagamento", "aprovacao", "concluido"],
+                condition=models.Q(excluido=False),
+                name="projeto_prazo_pagamento_idx",
+            ),
+            # Resumo por cliente: o GROUP BY lê só o índice
+            models.Index(
+                fields=[
+                    "cliente_cadastro",
+                    "excluido",
+                    "concluido",
+                    "aprovacao",
+                    "data_prazo_entrega",
+                ],
+                name="projeto_cliente_resumo_idx",
+            ),
+        ]
 
 
 class MaterialProjeto(models.Model):
@@ -143,4 +464,173 @@ class MaterialProjeto(models.Model):
     class Meta:
         verbose_name = "Material do Projeto"
         verbose_name_plural = "Materiais dos Projetos"
-        unique_together = ["projeto", "produto"]
\ No newline at end of file
+        unique_together = ["projeto", "produto"]
+
+
+class EventoProjeto(models.Model):
+    """Histórico append-only das transições de um projeto"""
+
+    CRIADO = 1
+    STATUS = 2
+    APROVADO = 3
+    REJEITADO = 4
+    PENDENTE = 5
+    CONCLUIDO = 6
+    REABERTO = 7
+    EXCLUIDO = 8
+    TIPO_CHOICES = [
+        (CRIADO, 'Criado'),
+        (STATUS, 'Mudança de status'),
+        (APROVADO, 'Aprovado'),
+        (REJEITADO, 'Rejeitado'),
+        (PENDENTE, 'Aprovação resetada'),
+        (CONCLUIDO, 'Concluído'),
+        (REABERTO, 'Reaberto'),
+        (EXCLUIDO, 'Excluído'),
+    ]
+    # Após estes eventos o projeto sai do quadro
+    TIPOS_SAIDA = (REJEITADO, CONCLUIDO, EXCLUIDO)
+
+    # Sem constraint: o histórico sobrevive à exclusão do projeto
+    projeto = models.ForeignKey(
+        Projeto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="eventos",
+    )
+    tipo = models.PositiveSmallIntegerField(choices=TIPO_CHOICES)
+    # Status do projeto após o evento
+    status = models.ForeignKey(
+        StatusProjeto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    data = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.projeto_id} - {self.get_tipo_display()} ({self.data:%d/%m/%Y %H:%M})"
+
+    class Meta:
+        verbose_name = "Evento do Projeto"
+        verbose_name_plural = "Eventos dos Projetos"
+        indexes = [
+            models.Index(fields=["projeto", "data"], name="evento_projeto_data_idx"),
+            models.Index(fields=["tipo", "data"], name="evento_tipo_data_idx"),
+        ]
+
+
+class ProjetoArquivado(models.Model):
+    """Projeto concluído ou rejeitado movido para fora da tabela quente (mesmo id)"""
+
+    id = models.BigIntegerField(primary_key=True)
+    nome = models.CharField(max_length=200)
+    cliente = models.CharField(max_length=200)
+    cliente_cadastro = models.ForeignKey(
+        Cliente,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="arquivados",
+        db_index=False,
+    )
+    data_prazo_entrega = models.DateField()
+    data_prazo_pagamento = models.DateField()
+    status = models.ForeignKey(StatusProjeto, on_delete=models.CASCADE, related_name="+")
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    observacoes = models.TextField(blank=True, null=True)
+    concluido = models.BooleanField(default=False)
+    data_conclusao = models.DateTimeField(blank=True, null=True)
+    aprovacao = models.CharField(
+        max_length=10, choices=Projeto.APROVACAO_CHOICES, default='pendente'
+    )
+    data_aprovacao = models.DateTimeField(blank=True, null=True)
+    motivo_rejeicao = models.TextField(blank=True, null=True)
+    versao = models.PositiveIntegerField(default=1)
+    posicao = models.CharField(max_length=255, default="", blank=True)
+    data_criacao = models.DateTimeField()
+    data_atualizacao = models.DateTimeField()
+    data_arquivamento = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nome} - {self.cliente}"
+
+    class Meta:
+        verbose_name = "Projeto Arquivado"
+        verbose_name_plural = "Projetos Arquivados"
+        indexes = [
+            models.Index(fields=["concluido", "data_conclusao"], name="arquivado_concluido_idx"),
+            models.Index(fields=["aprovacao", "data_aprovacao"], name="arquivado_aprovacao_idx"),
+            models.Index(fields=["cliente_cadastro", "aprovacao"], name="arquivado_cliente_idx"),
+        ]
+
+
+class MaterialProjetoArquivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    projeto = models.ForeignKey(
+        ProjetoArquivado, on_delete=models.CASCADE, related_name="materiais"
+    )
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name="+")
+    quantidade = models.IntegerField()
+    observacoes = models.TextField(blank=True, null=True)
+    data_criacao = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.projeto.nome} - {self.produto.nome} ({self.quantidade})"
+
+    class Meta:
+        verbose_name = "Material de Projeto Arquivado"
+        verbose_name_plural = "Materiais de Projetos Arquivados"
+
+
+class Tarefa(models.Model):
+    """Job da fila local (processado pelo comando processar_tarefas)"""
+
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDENTE)
+    # Maior prioridade é executada primeiro
+    prioridade = models.SmallIntegerField(default=0)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    executar_apos = models.DateTimeField(default=timezone.now)
+    resultado = models.JSONField(blank=True, null=True)
+    erro = models.TextField(blank=True, null=True)
+    trabalhador = models.CharField(max_length=100, blank=True, null=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(blank=True, null=True)
+    data_fim = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Tarefa"
+        verbose_name_plural = "Tarefas"
+        indexes = [
+            models.Index(
+                fields=["status", "-prioridade", "executar_apos"],
+                name="tarefa_fila_idx",
+            ),
+        ]
@@ -0,0 +1,172 @@
+"""
+Ordem dos cards dentro de cada coluna do Kanban por índice fracionário.
+
+``Projeto.posicao`` é uma string em base 62 comparada lexicograficamente:
+para colocar um card entre dois vizinhos basta gerar uma chave entre as
+chaves deles, então reordenar grava só o card movido. Chaves nunca terminam
+no menor dígito ("0"), o que garante que sempre existe espaço antes delas.
+
+Inserções repetidas no mesmo ponto (ex.: cards novos sempre no topo) fazem as
+chaves crescerem; acima de POSICAO_TAMANHO_MAX caracteres a coluna é
+rebalanceada em segundo plano (tarefa "rebalancear_posicoes") com chaves
+curtas e igualmente espaçadas.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+DIGITOS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITOS)
+
+# UPDATE por id em lotes durante o rebalanceamento
+LOTE_REBALANCEAMENTO = 500
+
+
+def _meio(a, b):
+    """Chave entre a ("" = início) e b (None = fim), com a < b"""
+    if b is not None:
+        # Prefixo comum (a é completado com zeros à direita)
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITOS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _meio(a[n:], b[n:])
+
+    da = DIGITOS.index(a[0]) if a else 0
+    db = DIGITOS.index(b[0]) if b is not None else BASE
+    if db - da > 1:
+        return DIGITOS[(da + db) // 2]
+    # Dígitos consecutivos: b com mais dígitos já serve, senão desce um nível
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITOS[da] + _meio(a[1:], None)
+
+
+def chave_entre(antes=None, depois=None):
+    """Nova chave estritamente entre antes e depois (None = extremidade da coluna)"""
+    antes = antes or ""
+    if depois is not None and not depois:
+        raise ValueError("Não existe chave antes da chave vazia")
+    if depois is not None and antes >= depois:
+        raise ValueError(f"Chaves fora de ordem: {antes!r} >= {depois!r}")
+    return _meio(antes, depois)
+
+
+def chaves_espacadas(quantidade):
+    """quantidade chaves crescentes, curtas e igualmente espaçadas"""
+    tamanho = 1
+    while BASE**tamanho <= quantidade:
+        tamanho += 1
+    tamanho += 1  # folga para inserções entre vizinhos
+    chaves = []
+    for i in range(1, quantidade + 1):
+        valor = i * BASE**tamanho // (quantidade + 1)
+        digitos = []
+        for _ in range(tamanho):
+            valor, resto = divmod(valor, BASE)
+            digitos.append(DIGITOS[resto])
+        chaves.append("".join(reversed(digitos)).rstrip(DIGITOS[0]))
+    return chaves
+
+
+def tamanho_maximo():
+    return getattr(settings, "POSICAO_TAMANHO_MAX", 16)
+
+
+def _quadro(status_id):
+    """Cards visíveis na coluna (concluídos e rejeitados saem do quadro)"""
+    from .models import Projeto
+
+    return Projeto.objects.filter(status_id=status_id, concluido=False).exclude(
+        aprovacao="rejeitado"
+    )
+
+
+def chave_no_topo(status_id):
+    """Chave para um card novo no topo da coluna"""
+    primeira = (
+        _quadro(status_id)
+        .exclude(posicao="")
+        .order_by("posicao")
+        .values_list("posicao", flat=True)
+        .first()
+    )
+    return chave_entre(None, primeira)
+
+
+def chave_entre_vizinhos(status_id, antes_id=None, depois_id=None, excluir_id=None):
+    """
+    Chave para soltar um card entre os cards antes_id e depois_id da coluna
+    (excluir_id é o próprio card, se já estiver nela).
+
+    Vizinhos que não estão mais na coluna (ou com chaves fora de ordem após
+    um movimento concorrente) são ignorados. Se outro card caiu no mesmo vão,
+    a chave encosta no card que de fato está ao lado de antes (ou de depois),
+    então chamadas na mesma transação nunca repetem chave.
+    """
+    ids = [id for id in (antes_id, depois_id) if id]
+    if not ids:
+        return chave_no_topo(status_id)
+    quadro = _quadro(status_id).exclude(posicao="").exclude(id=excluir_id)
+    chaves = dict(quadro.filter(id__in=ids).values_list("id", "posicao"))
+    antes = chaves.get(antes_id)
+    depois = chaves.get(depois_id)
+    if antes is not None and depois is not None and antes >= depois:
+        depois = None
+    if antes is not None:
+        seguinte = (
+            quadro.filter(posicao__gt=antes)
+            .order_by("posicao")
+            .values_list("posicao", flat=True)
+            .first()
+        )
+        if seguinte is not None and (depois is None or seguinte < depois):
+            depois = seguinte
+    elif depois is not None:
+        antes = (
+            quadro.filter(posicao__lt=depois)
+            .order_by("-posicao")
+            .values_list("posicao", flat=True)
+            .first()
+        )
+    return chave_entre(antes, depois)
+
+
+def agendar_rebalanceamento(status_id, chave):
+    """Enfileira o rebalanceamento da coluna quando a chave ficou longa demais"""
+    if len(chave) > tamanho_maximo():
+        enfileirar_rebalanceamento(status_id)
+
+
+def enfileirar_rebalanceamento(status_id):
+    """Enfileira o rebalanceamento da coluna, se ainda não houver um pendente"""
+    from .fila import enfileirar
+    from .models import Tarefa
+
+    pendente = Tarefa.objects.filter(
+        tipo="rebalancear_posicoes",
+        status__in=[Tarefa.PENDENTE, Tarefa.EXECUTANDO],
+        parametros__status_id=status_id,
+    ).exists()
+    if not pendente:
+        enfileirar("rebalancear_posicoes", {"status_id": status_id})
+
+
+def rebalancear(status_id):
+    """Regrava as chaves da coluna, mantendo a ordem atual (cards sem chave vão ao topo)"""
+    from .models import Projeto
+
+    ids = list(
+        _quadro(status_id)
+        .order_by("posicao", "-data_criacao")
+        .values_list("id", flat=True)
+    )
+    chaves = chaves_espacadas(len(ids))
+    for inicio in range(0, len(ids), LOTE_REBALANCEAMENTO):
+        with transaction.atomic():
+            for id, chave in zip(
+                ids[inicio : inicio + LOTE_REBALANCEAMENTO],
+                chaves[inicio : inicio + LOTE_REBALANCEAMENTO],
+            ):
+                Projeto.todos.filter(id=id).update(posicao=chave)
+    return len(ids)
@@ -0,0 +1,54 @@
+"""
+Purga dos projetos excluídos logicamente.
+
+Remove primeiro os MaterialProjeto e depois os Projeto, sempre em lotes
+pequenos e em transações curtas, para não segurar o lock de escrita do SQLite.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MaterialProjeto, Projeto
+
+
+def excluidos(carencia_minutos=0):
+    corte = timezone.now() - timedelta(minutes=carencia_minutos)
+    return Projeto.todos.filter(excluido=True, data_exclusao__lt=corte)
+
+
+def _apagar_em_lotes(consulta_ids, manager, lote, pausa):
+    total = 0
+    while True:
+        ids = list(consulta_ids()[:lote])
+        if not ids:
+            return total
+        with transaction.atomic():
+            _, por_model = manager.filter(id__in=ids).delete()
+        total += por_model.get(manager.model._meta.label, 0)
+        if pausa:
+            # Deixa outros escritores passarem entre os lotes
+            time.sleep(pausa)
+
+
+def purgar(lote=200, pausa=0.0, carencia_minutos=0):
+    """Apaga de fato os projetos excluídos e seus materiais; devolve (projetos, materiais)"""
+    projetos_ids = excluidos(carencia_minutos).values("id")
+
+    materiais = _apagar_em_lotes(
+        lambda: MaterialProjeto.objects.filter(projeto_id__in=projetos_ids)
+        .order_by()
+        .values_list("id", flat=True),
+        MaterialProjeto.objects,
+        lote,
+        pausa,
+    )
+    projetos = _apagar_em_lotes(
+        lambda: excluidos(carencia_minutos).order_by().values_list("id", flat=True),
+        Projeto.todos,
+        lote,
+        pausa,
+    )
+    return projetos, materiais
@@ -0,0 +1,96 @@
+"""
+Snapshot colunar do quadro Kanban (/api/board/).
+
+Em vez de um objeto por card, o JSON traz um array por campo (ids, nomes,
+clientes, prazos, status, aprovação, nº de materiais), na ordem em que os
+cards aparecem nas colunas. Sai de uma única consulta values_list e o corpo
+já codificado fica no cache, chaveado pela versão dos dados: uma consulta
+agregada barata que muda sempre que um card entra, sai ou é alterado.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from . import referencia
+from .models import MaterialProjeto, Projeto
+
+# Rejeitados e concluídos não aparecem no quadro
+APROVACAO = ("pendente", "aprovado")
+
+COLUNAS = ("id", "nome", "cliente", "prazo", "status_id", "aprovacao_codigo", "materiais")
+
+# O corpo é invalidado pela versão; o TTL só limita o lixo acumulado no cache
+TTL = 600
+
+
+def _projetos():
+    return Projeto.objects.filter(concluido=False, aprovacao__in=APROVACAO)
+
+
+def versao():
+    """Carimbo dos dados do quadro (cards, materiais e status)"""
+    projetos = _projetos().aggregate(
+        total=Count("id"), atualizacao=Max("data_atualizacao"), versoes=Sum("versao")
+    )
+    materiais = MaterialProjeto.objects.aggregate(total=Count("id"), ultimo=Max("id"))
+    chave = repr(
+        (
+            sorted(projetos.items()),
+            sorted(materiais.items()),
+            referencia.versao("status"),
+        )
+    )
+    return hashlib.md5(chave.encode()).hexdigest()
+
+
+def montar():
+    """Dict colunar do quadro inteiro"""
+    linhas = list(
+        _projetos()
+        .order_by("posicao", "-data_criacao")
+        .annotate(total_materiais=Count("materiais"))
+        .values_list(
+            "id",
+            "nome",
+            "cliente",
+            "data_prazo_entrega",
+            "status_id",
+            "aprovacao",
+            "total_materiais",
+        )
+    )
+    colunas = [list(coluna) for coluna in zip(*linhas)] or [[] for _ in COLUNAS]
+    ids, nomes, clientes, prazos, status, aprovacao, materiais = colunas
+    codigos = {valor: i for i, valor in enumerate(APROVACAO)}
+    return {
+        "total": len(ids),
+        "status": {
+            s["id"]: {"nome": s["nome"], "cor": s["cor"], "ordem": s["ordem"]}
+            for s in referencia.status_ativos()
+        },
+        "aprovacao": APROVACAO,
+        "colunas": COLUNAS,
+        "id": ids,
+        "nome": nomes,
+        "cliente": clientes,
+        "prazo": [prazo.isoformat() if prazo else None for prazo in prazos],
+        "status_id": status,
+        "aprovacao_codigo": [codigos[valor] for valor in aprovacao],
+        "materiais": materiais,
+    }
+
+
+def corpo(carimbo=None):
+    """(versão, JSON codificado), do cache quando a versão não mudou"""
+    carimbo = carimbo or versao()
+    chave = f"quadro:{carimbo}"
+    dados = cache.get(chave)
+    if dados is None:
+        dados = json.dumps(
+            {"versao": carimbo, **montar()}, separators=(",", ":"), ensure_ascii=False
+        ).encode()
+        cache.set(chave, dados, TTL)
+    return carimbo, dados
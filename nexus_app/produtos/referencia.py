@@ -0,0 +1,143 @@
+"""
+Cache de dados de referência (StatusProjeto, Categoria e Produto ativo).
+
+Cada processo guarda um snapshot imutável (tupla de dicts) por tabela,
+junto com o carimbo de versão com que foi carregado. O carimbo vive no cache
+compartilhado (CACHES["default"]), então um post_save/post_delete em qualquer
+worker troca o carimbo e os outros processos recarregam na próxima leitura.
+Escritas que não disparam sinais (update, bulk_create) chamam ``invalidar``.
+
+Os contadores de StatusProjeto (total_*) mudam a cada transição e ficam fora
+do snapshot; ``status_com_contadores`` os junta com uma consulta só.
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Categoria, Produto, StatusProjeto
+
+CAMPOS_STATUS = ("id", "nome", "cor", "ordem", "ativo")
+CAMPOS_CATEGORIA = ("id", "nome", "cor", "ativo")
+CAMPOS_PRODUTO = ("id", "nome", "codigo", "unidade", "estoque", "categoria_id")
+
+
+def _carregar_status():
+    return StatusProjeto.objects.order_by("ordem", "id").values(*CAMPOS_STATUS)
+
+
+def _carregar_categorias():
+    return Categoria.objects.order_by("nome").values(*CAMPOS_CATEGORIA)
+
+
+def _carregar_produtos():
+    return Produto.objects.filter(ativo=True).order_by("nome").values(*CAMPOS_PRODUTO)
+
+
+TABELAS = {
+    "status": _carregar_status,
+    "categorias": _carregar_categorias,
+    "produtos": _carregar_produtos,
+}
+
+MODELOS = {
+    StatusProjeto: "status",
+    Categoria: "categorias",
+    Produto: "produtos",
+}
+
+_snapshots = {}
+_lock = threading.Lock()
+
+# (carimbos de produtos e categorias, etag, JSON do catálogo já codificado)
+_catalogo = (None, None, None)
+
+
+def _chave(nome):
+    return f"referencia:{nome}:versao"
+
+
+def versao(nome):
+    """Carimbo atual da tabela no cache compartilhado (criado na primeira leitura)"""
+    chave = _chave(nome)
+    atual = cache.get(chave)
+    if atual is None:
+        cache.add(chave, uuid.uuid4().hex, timeout=None)
+        atual = cache.get(chave)
+    return atual
+
+
+def obter(nome):
+    """Snapshot (tupla de dicts) da tabela, recarregado se o carimbo mudou"""
+    carimbo = versao(nome)
+    snapshot = _snapshots.get(nome)
+    if snapshot is not None and snapshot[0] == carimbo:
+        return snapshot[1]
+    # O carimbo foi lido antes da consulta: uma invalidação concorrente força
+    # nova carga na próxima leitura em vez de ser perdida
+    dados = tuple(TABELAS[nome]())
+    with _lock:
+        _snapshots[nome] = (carimbo, dados)
+    return dados
+
+
+def invalidar(*nomes):
+    for nome in nomes:
+        cache.set(_chave(nome), uuid.uuid4().hex, timeout=None)
+        with _lock:
+            _snapshots.pop(nome, None)
+
+
+def ao_alterar(sender, **kwargs):
+    """Receptor de post_save/post_delete (ligado em ProdutosConfig.ready)"""
+    nome = MODELOS[sender]
+    invalidar(nome)
+    # Outro processo pode recarregar antes do commit e guardar o estado antigo
+    # com o carimbo novo; trocar de novo após o commit fecha essa janela
+    transaction.on_commit(lambda: invalidar(nome))
+
+
+def status_ativos():
+    return tuple(status for status in obter("status") if status["ativo"])
+
+
+def categorias_ativas():
+    return tuple(categoria for categoria in obter("categorias") if categoria["ativo"])
+
+
+def status_com_contadores(apenas_ativos=True):
+    """Status do snapshot + contadores atuais (uma consulta pequena)"""
+    contadores = {
+        id: {"total_ativos": ativos, "total_pendentes": pendentes, "total_aprovados": aprovados}
+        for id, ativos, pendentes, aprovados in StatusProjeto.objects.values_list(
+            "id", "total_ativos", "total_pendentes", "total_aprovados"
+        )
+    }
+    vazio = {"total_ativos": 0, "total_pendentes": 0, "total_aprovados": 0}
+    return [
+        {**status, **contadores.get(status["id"], vazio)}
+        for status in obter("status")
+        if status["ativo"] or not apenas_ativos
+    ]
+
+
+def catalogo():
+    """(etag, JSON do catálogo) serializado uma vez por versão de produtos/categorias"""
+    global _catalogo
+    carimbos = (versao("produtos"), versao("categorias"))
+    if _catalogo[0] != carimbos:
+        categorias = {categoria["id"]: categoria["nome"] for categoria in obter("categorias")}
+        produtos = [
+            {**produto, "categoria": categorias.get(produto["categoria_id"])}
+            for produto in obter("produtos")
+        ]
+        corpo = json.dumps(
+            {"produtos": produtos}, separators=(",", ":"), ensure_ascii=False
+        ).encode()
+        etag = hashlib.md5(repr(carimbos).encode()).hexdigest()[:16]
+        _catalogo = (carimbos, etag, corpo)
+    return _catalogo[1], _catalogo[2]
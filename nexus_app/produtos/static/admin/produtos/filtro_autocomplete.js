@@ -0,0 +1,15 @@
+'use strict';
+// Filtros por autocomplete da changelist: selecionar um item recarrega a
+// lista com o parâmetro do filtro (e volta para a primeira página).
+django.jQuery(function($) {
+    $('select[data-parametro]').on('change', function() {
+        const params = new URLSearchParams(window.location.search);
+        params.delete('p');
+        if (this.value) {
+            params.set(this.dataset.parametro, this.value);
+        } else {
+            params.delete(this.dataset.parametro);
+        }
+        window.location.search = params.toString();
+    });
+});
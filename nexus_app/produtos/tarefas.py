@@ -0,0 +1,25 @@
+"""Tarefas disponíveis na fila (ver fila.registrar)"""
+
+from . import arquivamento, contadores, posicoes, purga
+from .fila import registrar
+
+
+@registrar("arquivar_projetos")
+def arquivar_projetos(idade_dias=None, lote=500, limite=None):
+    return {"arquivados": arquivamento.arquivar(idade_dias, lote, limite)}
+
+
+@registrar("purgar_projetos")
+def purgar_projetos(lote=200, pausa=0.05, carencia_minutos=0):
+    projetos, materiais = purga.purgar(lote, pausa, carencia_minutos)
+    return {"projetos": projetos, "materiais": materiais}
+
+
+@registrar("rebalancear_posicoes")
+def rebalancear_posicoes(status_id):
+    return {"projetos": posicoes.rebalancear(status_id)}
+
+
+@registrar("reconciliar_contadores")
+def reconciliar_contadores():
+    return {"corrigidos": len(contadores.reconciliar())}
@@ -1,3 +1,1601 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import admin as produtos_admin
+from . import (
+    aquecimento,
+    arquivamento,
+    calendario,
+    clientes,
+    coalescedor,
+    consultas_lentas,
+    contadores,
+    fila,
+    fluxo,
+    importacao,
+    instrumentacao,
+    posicoes,
+    referencia,
+    voo_unico,
+)
+from . import models
+from .models import (
+    Categoria,
+    Cliente,
+    ConflitoVersao,
+    EventoProjeto,
+    MaterialProjeto,
+    MaterialProjetoArquivado,
+    Produto,
+    Projeto,
+    ProjetoArquivado,
+    StatusProjeto,
+    Tarefa,
+)
+
+PRAZO_ENTREGA = "2030-01-10"
+PRAZO_PAGAMENTO = "2030-02-10"
+
+
+class ProjetoFixtureMixin:
+    """Usuário logado, status Orçamento/Produção e um atalho para criar projetos"""
+
+    superusuario = False
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        if self.superusuario:
+            self.usuario = User.objects.create_superuser("admin", password="x")
+        else:
+            self.usuario = User.objects.create_user("kiko", password="x")
+        self.client.force_login(self.usuario)
+        self.orcamento = StatusProjeto.objects.create(nome="Orçamento", ordem=1)
+        self.producao = StatusProjeto.objects.create(nome="Produção", ordem=2)
+        self.status = self.orcamento
+
+    def criar_projeto(self, **campos):
+        dados = {
+            "nome": "Janela",
+            "cliente": "ACME",
+            "data_prazo_entrega": PRAZO_ENTREGA,
+            "data_prazo_pagamento": PRAZO_PAGAMENTO,
+            "status": self.orcamento,
+            "usuario": self.usuario,
+        }
+        dados.update(campos)
+        return Projeto.objects.create(**dados)
+
+
+class GerarDadosCommandTest(TestCase):
+    def test_gera_quantidades_pedidas(self):
+        call_command(
+            "gerar_dados",
+            categorias=3,
+            produtos=20,
+            status=4,
+            projetos=50,
+            materiais=3,
+            lote=7,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Categoria.objects.count(), 3)
+        self.assertEqual(Produto.objects.count(), 20)
+        self.assertEqual(StatusProjeto.objects.count(), 4)
+        self.assertEqual(Projeto.objects.count(), 50)
+        self.assertTrue(MaterialProjeto.objects.exists())
+        self.assertEqual(
+            EventoProjeto.objects.filter(tipo=EventoProjeto.CRIADO).count(), 50
+        )
+        # Datas de criação sintéticas, não todas iguais ao momento da geração
+        self.assertGreater(
+            Projeto.objects.values("data_criacao__date").distinct().count(), 1
+        )
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_gera_relatorio_json(self):
+        call_command(
+            "gerar_dados",
+            categorias=2,
+            produtos=5,
+            projetos=10,
+            stdout=StringIO(),
+        )
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "bench.json")
+            call_command(
+                "benchmark",
+                repeticoes=2,
+                aquecimento=0,
+                saida=caminho,
+                stderr=StringIO(),
+            )
+            with open(caminho, encoding="utf-8") as arquivo:
+                relatorio = json.load(arquivo)
+
+        home = relatorio["endpoints"]["home"]
+        self.assertEqual(home["status_code"], 200)
+        self.assertGreater(home["queries"], 0)
+        self.assertLessEqual(home["p50_ms"], home["p95_ms"])
+        self.assertIn("api_metricas_filtradas", relatorio["endpoints"])
+
+
+@override_settings(METRICAS_CACHE_TTL=0)
+class MetricasPrometheusTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentacao.limpar()
+        self.admin = User.objects.create_superuser("admin", password="x")
+
+    def test_exige_staff(self):
+        comum = User.objects.create_user("comum", password="x")
+        self.client.force_login(comum)
+        resposta = self.client.get(reverse("metricas_prometheus"))
+        self.assertEqual(resposta.status_code, 302)
+
+    def test_expoe_metricas_por_view(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("api_metricas_filtradas"))
+
+        resposta = self.client.get(reverse("metricas_prometheus"))
+        texto = resposta.content.decode()
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(
+            'nexus_http_requests_total{view="api_metricas_filtradas",method="GET",status="200"} 1',
+            texto,
+        )
+        self.assertIn(
+            'nexus_http_request_duration_seconds_bucket{view="api_metricas_filtradas",le="+Inf"} 1',
+            texto,
+        )
+        self.assertRegex(
+            texto, r'nexus_db_queries_total\{view="api_metricas_filtradas"\} [1-9]'
+        )
+
+    def _snapshot(self, pasta, nome, valor):
+        with open(os.path.join(pasta, nome), "w") as arquivo:
+            json.dump(
+                {
+                    "contadores": [["nexus_http_errors_total", [["view", "home"]], valor]],
+                    "histogramas": [],
+                },
+                arquivo,
+            )
+
+    def test_agrega_processos_pelo_diretorio(self):
+        vivo = f"metricas-{os.getppid()}-{instrumentacao.inicio_processo(os.getppid())}.json"
+        with tempfile.TemporaryDirectory() as pasta, self.settings(METRICAS_DIR=pasta):
+            instrumentacao.incrementar("nexus_http_errors_total", (("view", "home"),), 2)
+            # Snapshot de outro worker, ainda rodando
+            self._snapshot(pasta, vivo, 3)
+            texto = instrumentacao.exportar()
+            self.assertTrue(os.path.exists(os.path.join(pasta, vivo)))
+
+        self.assertIn('nexus_http_errors_total{view="home"} 5', texto)
+
+    def test_processos_encerrados_nao_voltam_nem_dobram(self):
+        with tempfile.TemporaryDirectory() as pasta, self.settings(METRICAS_DIR=pasta):
+            instrumentacao.incrementar("nexus_http_errors_total", (("view", "home"),), 2)
+            # Worker que morreu e pid reaproveitado por um processo mais novo
+            self._snapshot(pasta, "metricas-999999999-1.json", 3)
+            self._snapshot(pasta, f"metricas-{os.getppid()}-1.json", 4)
+
+            for _ in range(2):
+                texto = instrumentacao.exportar()
+                self.assertIn('nexus_http_errors_total{view="home"} 9', texto)
+            self.assertEqual(
+                sorted(nome for nome in os.listdir(pasta) if nome.endswith(".json")),
+                sorted([instrumentacao.ENCERRADOS, instrumentacao._arquivo_processo()]),
+            )
+
+
+@override_settings(METRICAS_CACHE_TTL=0)
+class ConsultasLentasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        consultas_lentas.limpar()
+        self.usuario = User.objects.create_user("ana", password="x")
+        self.client.force_login(self.usuario)
+
+    def test_registra_consulta_com_view_e_plano(self):
+        with self.settings(CONSULTAS_LENTAS_LIMIAR_MS=0), self.assertLogs(
+            "produtos.consultas_lentas", "WARNING"
+        ):
+            self.client.get(reverse("api_metricas_filtradas"))
+
+        ranking = consultas_lentas.ranking()
+        self.assertTrue(ranking)
+        contagem = next(
+            item for item in ranking if 'FROM "produtos_projeto"' in item["sql"]
+        )
+        self.assertEqual(contagem["views"], ["api_metricas_filtradas"])
+        self.assertTrue(contagem["plano"])
+
+    def test_ignora_consultas_abaixo_do_limiar(self):
+        with self.settings(CONSULTAS_LENTAS_LIMIAR_MS=60_000):
+            self.client.get(reverse("api_metricas_filtradas"))
+        self.assertEqual(consultas_lentas.ranking(), [])
+
+    def test_pagina_no_admin(self):
+        admin = User.objects.create_superuser("root", password="x")
+        self.client.force_login(admin)
+        resposta = self.client.get(reverse("consultas_lentas_admin"))
+        self.assertContains(resposta, "Consultas lentas")
+
+
+class EventoProjetoTest(ProjetoFixtureMixin, TestCase):
+    def _criar_projeto(self):
+        resposta = self.client.post(
+            reverse("criar_projeto"),
+            json.dumps(
+                {
+                    "nome": "Cozinha",
+                    "cliente": "ACME",
+                    "data_prazo_entrega": PRAZO_ENTREGA,
+                    "data_prazo_pagamento": PRAZO_PAGAMENTO,
+                    "status_id": self.orcamento.id,
+                }
+            ),
+            content_type="application/json",
+        )
+        return Projeto.objects.get(id=resposta.json()["projeto"]["id"])
+
+    def test_registra_transicoes(self):
+        projeto = self._criar_projeto()
+        self.client.post(
+            reverse("mover_projeto"),
+            json.dumps({"projeto_id": projeto.id, "novo_status_id": self.producao.id}),
+            content_type="application/json",
+        )
+        self.client.post(reverse("aprovar_projeto", args=[projeto.id]))
+        self.client.post(
+            reverse("concluir_projeto"),
+            json.dumps({"projeto_id": projeto.id}),
+            content_type="application/json",
+        )
+        self.client.post(
+            reverse("reabrir_projeto"),
+            json.dumps({"projeto_id": projeto.id}),
+            content_type="application/json",
+        )
+
+        eventos = list(
+            EventoProjeto.objects.filter(projeto=projeto)
+            .order_by("id")
+            .values_list("tipo", "status_id", "usuario_id")
+        )
+        self.assertEqual(
+            eventos,
+            [
+                (EventoProjeto.CRIADO, self.orcamento.id, self.usuario.id),
+                (EventoProjeto.STATUS, self.producao.id, self.usuario.id),
+                (EventoProjeto.APROVADO, self.producao.id, self.usuario.id),
+                (EventoProjeto.CONCLUIDO, self.producao.id, self.usuario.id),
+                (EventoProjeto.REABERTO, self.producao.id, self.usuario.id),
+            ],
+        )
+
+    def test_criacao_fora_da_view_registra_evento(self):
+        # Admin, shell e scripts criam pelo save(), sem passar por criar_projeto
+        projeto = self.criar_projeto()
+        projeto.nome = "Cozinha planejada"
+        projeto.save()
+
+        self.assertEqual(
+            list(
+                EventoProjeto.objects.filter(projeto=projeto).values_list(
+                    "tipo", "status_id", "usuario_id"
+                )
+            ),
+            [(EventoProjeto.CRIADO, self.orcamento.id, self.usuario.id)],
+        )
+
+    def test_mover_para_o_mesmo_status_nao_gera_evento(self):
+        projeto = self._criar_projeto()
+        self.client.post(
+            reverse("mover_projeto"),
+            json.dumps({"projeto_id": projeto.id, "novo_status_id": self.orcamento.id}),
+            content_type="application/json",
+        )
+        self.assertEqual(EventoProjeto.objects.filter(projeto=projeto).count(), 1)
+
+    def test_analytics_fluxo(self):
+        agora = timezone.now()
+        projeto = self._criar_projeto()
+        Projeto.objects.filter(id=projeto.id).update(
+            data_criacao=agora - timedelta(days=10)
+        )
+        EventoProjeto.objects.filter(projeto=projeto).update(
+            data=agora - timedelta(days=10)
+        )
+        EventoProjeto.objects.create(
+            projeto=projeto,
+            tipo=EventoProjeto.STATUS,
+            status=self.producao,
+            data=agora - timedelta(days=4),
+        )
+        EventoProjeto.objects.create(
+            projeto=projeto,
+            tipo=EventoProjeto.CONCLUIDO,
+            status=self.producao,
+            data=agora - timedelta(days=1),
+        )
+
+        dados = self.client.get(
+            reverse("api_analytics_fluxo"), {"janela": "dia"}
+        ).json()
+
+        self.assertTrue(dados["success"])
+        self.assertEqual(dados["lead_time"]["concluidos"], 1)
+        self.assertAlmostEqual(dados["lead_time"]["medio_dias"], 9, places=1)
+        self.assertEqual(sum(p["concluidos"] for p in dados["throughput"]), 1)
+        tempos = {s["id"]: s for s in dados["tempo_em_status"]}
+        self.assertAlmostEqual(tempos[self.orcamento.id]["media_dias"], 6, places=1)
+        self.assertAlmostEqual(tempos[self.producao.id]["media_dias"], 3, places=1)
+
+    def test_janela_invalida(self):
+        dados = self.client.get(reverse("api_analytics_fluxo"), {"janela": "ano"}).json()
+        self.assertFalse(dados["success"])
+
+
+@override_settings(METRICAS_CACHE_TTL=0)
+class ArquivamentoTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.produto = Produto.objects.create(nome="Parafuso")
+
+    def _projeto(self, **campos):
+        projeto = self.criar_projeto(nome="Painel", **campos)
+        MaterialProjeto.objects.create(projeto=projeto, produto=self.produto, quantidade=3)
+        return projeto
+
+    def _envelhecer(self, projeto, dias=365):
+        antigo = timezone.now() - timedelta(days=dias)
+        Projeto.objects.filter(id=projeto.id).update(
+            data_criacao=antigo, data_atualizacao=antigo
+        )
+        EventoProjeto.objects.filter(projeto=projeto, tipo=EventoProjeto.CRIADO).update(
+            data=antigo
+        )
+        return antigo
+
+    def test_arquiva_apenas_finalizados_antigos(self):
+        concluido = self._projeto(concluido=True, data_conclusao=timezone.now())
+        rejeitado = self._projeto(aprovacao="rejeitado")
+        recente = self._projeto(concluido=True)
+        ativo = self._projeto()
+        for projeto in (concluido, rejeitado, ativo):
+            self._envelhecer(projeto)
+
+        call_command("arquivar_projetos", dias=30, lote=1, stdout=StringIO())
+
+        self.assertEqual(
+            set(ProjetoArquivado.objects.values_list("id", flat=True)),
+            {concluido.id, rejeitado.id},
+        )
+        self.assertEqual(
+            set(Projeto.objects.values_list("id", flat=True)), {recente.id, ativo.id}
+        )
+        self.assertEqual(MaterialProjetoArquivado.objects.count(), 2)
+        self.assertEqual(MaterialProjeto.objects.count(), 2)
+
+    def test_apis_leem_quente_e_arquivo(self):
+        arquivado = self._projeto(concluido=True, data_conclusao=timezone.now())
+        self._envelhecer(arquivado)
+        arquivamento.arquivar(idade_dias=30)
+        self._projeto(concluido=True, data_conclusao=timezone.now())
+
+        concluidos = self.client.get(reverse("projetos_concluidos_api")).json()
+        metricas = self.client.get(reverse("api_metricas_filtradas")).json()
+
+        self.assertEqual(len(concluidos["projetos"]), 2)
+        self.assertEqual(metricas["metricas"]["projetos_concluidos"], 2)
+
+    def test_lead_time_sobrevive_ao_arquivamento(self):
+        projeto = self._projeto(concluido=True, data_conclusao=timezone.now())
+        self._envelhecer(projeto, dias=10)
+        projeto.registrar_evento(EventoProjeto.CONCLUIDO)
+        periodo = (timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1))
+
+        _, antes = fluxo.throughput_e_lead_time(*periodo)
+        arquivamento.arquivar_ids([projeto.id])
+        _, depois = fluxo.throughput_e_lead_time(*periodo)
+
+        self.assertAlmostEqual(antes["p50_dias"], 10, places=1)
+        self.assertEqual(depois, antes)
+
+    def test_reabrir_restaura_do_arquivo(self):
+        projeto = self._projeto(concluido=True, data_conclusao=timezone.now())
+        antigo = self._envelhecer(projeto)
+        arquivamento.arquivar(idade_dias=30)
+
+        resposta = self.client.post(
+            reverse("reabrir_projeto"),
+            json.dumps({"projeto_id": projeto.id}),
+            content_type="application/json",
+        )
+
+        self.assertTrue(resposta.json()["success"])
+        restaurado = Projeto.objects.get(id=projeto.id)
+        self.assertFalse(restaurado.concluido)
+        self.assertEqual(restaurado.data_criacao, antigo)
+        self.assertEqual(restaurado.materiais.count(), 1)
+        self.assertFalse(ProjetoArquivado.objects.exists())
+
+    def test_restaurar_duas_vezes(self):
+        projeto = self._projeto(concluido=True)
+        arquivamento.arquivar_ids([projeto.id])
+        linha = ProjetoArquivado.objects.filter(id=projeto.id).values(
+            *arquivamento.CAMPOS_PROJETO
+        ).get()
+
+        self.assertEqual(arquivamento.restaurar(projeto.id).id, projeto.id)
+        self.assertEqual(arquivamento.restaurar(projeto.id).id, projeto.id)
+        self.assertEqual(MaterialProjeto.objects.filter(projeto_id=projeto.id).count(), 1)
+
+        # Corrida: a outra requisição grava depois da nossa verificação e
+        # ainda vemos a linha do arquivo; o INSERT duplicado não vira erro
+        ProjetoArquivado.objects.create(**linha)
+        with mock.patch.object(QuerySet, "exists", return_value=False):
+            self.assertEqual(arquivamento.restaurar(projeto.id).id, projeto.id)
+        self.assertEqual(Projeto.objects.filter(id=projeto.id).count(), 1)
+
+
+@override_settings(METRICAS_CACHE_TTL=0)
+class ExclusaoLogicaTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.produto = Produto.objects.create(nome="Chapa")
+        self.projeto = self.criar_projeto(nome="Balcão")
+        MaterialProjeto.objects.create(
+            projeto=self.projeto, produto=self.produto, quantidade=2
+        )
+
+    def _excluir(self):
+        return self.client.post(
+            reverse("excluir_projeto"),
+            json.dumps({"projeto_id": self.projeto.id}),
+            content_type="application/json",
+        ).json()
+
+    def test_excluir_apenas_marca_o_projeto(self):
+        self.assertTrue(self._excluir()["success"])
+
+        self.assertFalse(Projeto.objects.filter(id=self.projeto.id).exists())
+        self.assertTrue(Projeto.todos.get(id=self.projeto.id).excluido)
+        self.assertEqual(MaterialProjeto.objects.count(), 1)
+        metricas = self.client.get(reverse("api_metricas_filtradas")).json()
+        self.assertEqual(metricas["metricas"]["projetos_ativos"], 0)
+        self.assertFalse(self._excluir()["success"])
+
+    def test_purga_remove_em_lotes(self):
+        self._excluir()
+        call_command(
+            "purgar_projetos", lote=1, pausa=0, ignorar_horario=True, stdout=StringIO()
+        )
+
+        self.assertFalse(Projeto.todos.filter(id=self.projeto.id).exists())
+        self.assertEqual(MaterialProjeto.objects.count(), 0)
+        self.assertTrue(
+            EventoProjeto.objects.filter(
+                projeto_id=self.projeto.id, tipo=EventoProjeto.EXCLUIDO
+            ).exists()
+        )
+
+
+class FilaTarefasTest(TestCase):
+    def setUp(self):
+        self.chamadas = []
+
+        @fila.registrar("teste_ok", apenas_staff=False)
+        def ok(valor=0):
+            self.chamadas.append(valor)
+            return {"dobro": valor * 2}
+
+        @fila.registrar("teste_erro")
+        def erro():
+            raise ValueError("falhou")
+
+        self.addCleanup(fila._handlers.pop, "teste_ok")
+        self.addCleanup(fila._handlers.pop, "teste_erro")
+
+    def test_prioridade_e_resultado(self):
+        baixa = fila.enfileirar("teste_ok", {"valor": 1})
+        alta = fila.enfileirar("teste_ok", {"valor": 2}, prioridade=10)
+
+        fila.executar(fila.reservar("t1"))
+        fila.executar(fila.reservar("t1"))
+
+        self.assertEqual(self.chamadas, [2, 1])
+        alta.refresh_from_db()
+        baixa.refresh_from_db()
+        self.assertEqual(alta.status, Tarefa.CONCLUIDA)
+        self.assertEqual(alta.resultado, {"dobro": 4})
+        self.assertIsNone(fila.reservar("t1"))
+
+    def test_falha_reagenda_ate_esgotar_tentativas(self):
+        tarefa = fila.enfileirar("teste_erro", max_tentativas=2)
+
+        with self.assertLogs("produtos.fila", "ERROR"):
+            fila.executar(fila.reservar("t1"))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.PENDENTE)
+        self.assertGreater(tarefa.executar_apos, timezone.now())
+        self.assertIsNone(fila.reservar("t1"))
+
+        Tarefa.objects.filter(id=tarefa.id).update(executar_apos=timezone.now())
+        with self.assertLogs("produtos.fila", "ERROR"):
+            fila.executar(fila.reservar("t1"))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.FALHOU)
+        self.assertIn("ValueError", tarefa.erro)
+
+    def test_lock_passageiro_ao_gravar_desfecho(self):
+        tarefa = fila.enfileirar("teste_ok", {"valor": 1})
+        reservada = fila.reservar("t1")
+        update = QuerySet.update
+        falhas = [OperationalError("database is locked")]
+
+        def update_instavel(queryset, **campos):
+            if falhas:
+                raise falhas.pop()
+            return update(queryset, **campos)
+
+        with (
+            mock.patch.object(fila, "GRAVAR_ESPERA_S", 0),
+            mock.patch.object(QuerySet, "update", autospec=True, side_effect=update_instavel),
+            self.assertLogs("produtos.fila", "WARNING"),
+        ):
+            fila.executar(reservada)
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.CONCLUIDA)
+
+    def test_trabalhador_sobrevive_a_erro_e_recupera_travadas(self):
+        travada = fila.enfileirar("teste_ok", {"valor": 1})
+        Tarefa.objects.filter(id=travada.id).update(
+            status=Tarefa.EXECUTANDO, data_inicio=timezone.now() - timedelta(hours=2)
+        )
+        fila.enfileirar("teste_ok", {"valor": 2})
+        parar = threading.Event()
+        executar = fila.executar
+        erros = [OperationalError("database is locked")]
+
+        def executar_instavel(tarefa):
+            if erros:
+                raise erros.pop()
+            executar(tarefa)
+            if not Tarefa.objects.exclude(status=Tarefa.CONCLUIDA).exists():
+                parar.set()
+
+        with (
+            mock.patch.object(fila, "executar", side_effect=executar_instavel),
+            mock.patch.object(fila, "RECUPERACAO_INTERVALO_S", 0),
+            self.assertLogs("produtos.fila", "ERROR"),
+        ):
+            fila.processar("t1", parar, intervalo=0, timeout=0)
+
+        self.assertFalse(Tarefa.objects.exclude(status=Tarefa.CONCLUIDA).exists())
+
+    def test_travada_conta_tentativa_ate_falhar(self):
+        tarefa = fila.enfileirar("teste_ok", max_tentativas=2)
+        travar = Tarefa.objects.filter(id=tarefa.id).update
+        antigo = timezone.now() - timedelta(hours=2)
+
+        travar(status=Tarefa.EXECUTANDO, data_inicio=antigo)
+        self.assertEqual(fila.recuperar_travadas(3600), 1)
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.PENDENTE, 1))
+
+        # O trabalhador morre de novo: não volta à fila para sempre
+        travar(status=Tarefa.EXECUTANDO, data_inicio=antigo)
+        with self.assertLogs("produtos.fila", "WARNING"):
+            self.assertEqual(fila.recuperar_travadas(3600), 0)
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.FALHOU, 2))
+        self.assertIn("interrompido", tarefa.erro)
+
+    def test_api_enfileira_e_consulta(self):
+        usuario = User.objects.create_user("eva", password="x")
+        self.client.force_login(usuario)
+
+        negado = self.client.post(
+            reverse("criar_tarefa"),
+            json.dumps({"tipo": "teste_erro"}),
+            content_type="application/json",
+        )
+        self.assertEqual(negado.status_code, 403)
+
+        criada = self.client.post(
+            reverse("criar_tarefa"),
+            json.dumps({"tipo": "teste_ok", "parametros": {"valor": 5}}),
+            content_type="application/json",
+        ).json()
+        tarefa_id = criada["tarefa"]["id"]
+        fila.executar(fila.reservar("t1"))
+
+        dados = self.client.get(reverse("tarefa_detail_api", args=[tarefa_id])).json()
+        self.assertEqual(dados["tarefa"]["status"], Tarefa.CONCLUIDA)
+        self.assertEqual(dados["tarefa"]["resultado"], {"dobro": 10})
+
+
+class ExportacaoTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.produto = Produto.objects.create(nome="Perfil", codigo="P-1")
+        outro = Produto.objects.create(nome="Vidro", codigo="V-1")
+        self.com_materiais = self.criar_projeto()
+        MaterialProjeto.objects.create(
+            projeto=self.com_materiais, produto=self.produto, quantidade=2
+        )
+        MaterialProjeto.objects.create(projeto=self.com_materiais, produto=outro, quantidade=1)
+        self.criar_projeto(nome="Porta", aprovacao="rejeitado")
+
+    def _exportar(self, **params):
+        resposta = self.client.get(reverse("exportar_projetos"), params)
+        self.assertTrue(resposta.streaming)
+        return b"".join(resposta.streaming_content).decode()
+
+    def test_csv_uma_linha_por_material(self):
+        linhas = list(csv.DictReader(StringIO(self._exportar(formato="csv"))))
+
+        self.assertEqual(len(linhas), 3)
+        janela = [linha for linha in linhas if linha["nome"] == "Janela"]
+        self.assertEqual(
+            sorted(linha["produto_nome"] for linha in janela), ["Perfil", "Vidro"]
+        )
+
+    def test_ndjson_com_filtros(self):
+        conteudo = self._exportar(formato="ndjson", aprovacao="pendente")
+        projetos = [json.loads(linha) for linha in conteudo.splitlines()]
+
+        self.assertEqual([p["nome"] for p in projetos], ["Janela"])
+        self.assertEqual(len(projetos[0]["materiais"]), 2)
+
+    def test_formato_invalido(self):
+        resposta = self.client.get(reverse("exportar_projetos"), {"formato": "xml"})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class ImportacaoCatalogoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ferragens = Categoria.objects.create(nome="Ferragens")
+        Produto.objects.create(nome="Dobradiça antiga", codigo="D-1", estoque=3)
+
+    def test_upsert_por_codigo_com_erros_por_linha(self):
+        conteudo = (
+            "codigo,nome,categoria,estoque\n"
+            "D-1,Dobradiça,ferragens,10\n"
+            "P-1,Parafuso,Fixadores,abc\n"
+            "P-2,Prego,Fixadores,50\n"
+            ",Sem código,,\n"
+        ).encode()
+
+        resumo = importacao.importar(BytesIO(conteudo), "csv", lote=2)
+
+        self.assertEqual((resumo["criados"], resumo["atualizados"]), (1, 1))
+        self.assertEqual(resumo["categorias_criadas"], 1)
+        self.assertEqual([erro["linha"] for erro in resumo["erros"]], [3, 5])
+        dobradica = Produto.objects.get(codigo="D-1")
+        self.assertEqual((dobradica.nome, dobradica.estoque), ("Dobradiça", 10))
+        self.assertEqual(dobradica.categoria, self.ferragens)
+        self.assertEqual(Produto.objects.get(codigo="P-2").categoria.nome, "Fixadores")
+
+    def test_endpoint_jsonl(self):
+        self.client.force_login(User.objects.create_user("gil", password="x"))
+        conteudo = "\n".join(
+            [
+                json.dumps({"codigo": "D-1", "ativo": False}),
+                json.dumps({"codigo": "N-1", "nome": "Novo", "categoria": "Ferragens"}),
+                "{quebrado",
+            ]
+        )
+
+        resposta = self.client.post(
+            reverse("importar_catalogo"),
+            conteudo,
+            content_type="application/x-ndjson",
+        ).json()
+
+        self.assertTrue(resposta["success"])
+        self.assertEqual((resposta["criados"], resposta["atualizados"]), (1, 1))
+        self.assertEqual(resposta["erros"][0]["linha"], 3)
+        self.assertFalse(Produto.objects.get(codigo="D-1").ativo)
+
+
+class ConcorrenciaOtimistaTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.projeto = self.criar_projeto()
+
+    def _mover(self, versao):
+        return self.client.post(
+            reverse("mover_projeto"),
+            {"projeto_id": self.projeto.id, "novo_status_id": self.producao.id, "versao": versao},
+            content_type="application/json",
+        )
+
+    def test_transicao_incrementa_versao(self):
+        self.projeto.aprovar_projeto(usuario=self.usuario)
+
+        self.projeto.refresh_from_db()
+        self.assertEqual(self.projeto.versao, 2)
+        self.assertEqual(self.projeto.aprovacao, "aprovado")
+
+    def test_versao_desatualizada_gera_conflito(self):
+        # Outro usuário conclui o projeto depois que o quadro foi carregado
+        Projeto.objects.get(id=self.projeto.id).marcar_como_concluido()
+
+        resposta = self._mover(versao=1)
+
+        self.assertEqual(resposta.status_code, 409)
+        self.assertTrue(resposta.json()["conflito"])
+        self.projeto.refresh_from_db()
+        self.assertEqual(self.projeto.status, self.orcamento)
+        with self.assertRaises(ConflitoVersao):
+            self.projeto.rejeitar_projeto("Caro", versao=1)
+
+    def test_transicoes_nao_leem_a_linha_inteira(self):
+        outro = self.criar_projeto(nome="Porta")
+        with CaptureQueriesContext(connection) as consultas:
+            concluido = self.client.post(
+                reverse("concluir_projeto"),
+                {"projeto_id": self.projeto.id},
+                content_type="application/json",
+            ).json()
+            reaberto = self.client.post(
+                reverse("reabrir_projeto"),
+                {"projeto_id": self.projeto.id},
+                content_type="application/json",
+            ).json()
+            aprovado = self.client.post(reverse("aprovar_projeto", args=[outro.id])).json()
+            resetado = self.client.post(
+                reverse("resetar_aprovacao_projeto", args=[outro.id])
+            ).json()
+            rejeitado = self.client.post(
+                reverse("rejeitar_projeto", args=[outro.id]),
+                {"motivo": "Caro", "versao": 3},
+                content_type="application/json",
+            ).json()
+
+        self.assertEqual((concluido["versao"], reaberto["versao"]), (2, 3))
+        self.assertEqual((aprovado["aprovacao"], resetado["aprovacao"]), ("aprovado", "pendente"))
+        self.assertEqual((rejeitado["versao"], rejeitado["motivo_rejeicao"]), (4, "Caro"))
+        selects = [
+            consulta["sql"]
+            for consulta in consultas
+            if consulta["sql"].startswith("SELECT") and 'FROM "produtos_projeto"' in consulta["sql"]
+        ]
+        self.assertTrue(selects)
+        self.assertFalse([sql for sql in selects if "observacoes" in sql])
+
+    def test_transicao_restaura_do_arquivo(self):
+        self.projeto.marcar_como_concluido()
+        arquivamento.arquivar_ids([self.projeto.id])
+
+        resposta = self.client.post(
+            reverse("reabrir_projeto"),
+            {"projeto_id": self.projeto.id},
+            content_type="application/json",
+        ).json()
+
+        self.assertTrue(resposta["success"])
+        self.assertFalse(Projeto.objects.get(id=self.projeto.id).concluido)
+        self.assertFalse(ProjetoArquivado.objects.filter(id=self.projeto.id).exists())
+
+    def test_mover_com_versao_atual(self):
+        resposta = self._mover(versao=1).json()
+
+        self.assertEqual(resposta["versao"], 2)
+        self.projeto.refresh_from_db()
+        self.assertEqual(self.projeto.status, self.producao)
+
+
+class CoalescedorTest(ProjetoFixtureMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.projetos = [self.criar_projeto(nome=f"Projeto {i}") for i in range(8)]
+        instrumentacao.limpar()
+
+    def _em_threads(self, funcoes):
+        erros = []
+
+        def rodar(funcao):
+            try:
+                funcao()
+            except Exception as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=rodar, args=(f,)) for f in funcoes]
+        for thread in threads:
+            thread.start()
+        return threads, erros
+
+    def test_agrupa_operacoes_concorrentes_num_lote(self):
+        comecou = threading.Event()
+        liberar = threading.Event()
+        # A primeira operação segura a thread escritora enquanto as outras chegam
+        bloqueio, _ = self._em_threads(
+            [lambda: coalescedor.executar(lambda: (comecou.set(), liberar.wait()))]
+        )
+        comecou.wait(5)
+        threads, erros = self._em_threads(
+            [lambda p=p: coalescedor.executar(p.aprovar_projeto) for p in self.projetos]
+        )
+        for _ in range(500):
+            if coalescedor._coalescedor().fila.qsize() == len(self.projetos):
+                break
+            liberar.wait(0.01)
+        liberar.set()
+        for thread in bloqueio + threads:
+            thread.join(5)
+
+        self.assertEqual(erros, [])
+        self.assertEqual(
+            Projeto.objects.filter(aprovacao="aprovado", versao=2).count(), len(self.projetos)
+        )
+        _, histogramas = instrumentacao.snapshot()
+        lotes = histogramas[("nexus_coalescedor_lote", ())]
+        # 1 lote com a operação bloqueante + 1 lote com as 8 aprovações
+        self.assertEqual((sum(lotes[:-1]), lotes[-1]), (2, 1 + len(self.projetos)))
+
+    @override_settings(COALESCEDOR_FILA_MAX=1, COALESCEDOR_ESPERA_S=0.01)
+    def test_fila_cheia_gera_backpressure(self):
+        escritor = coalescedor.Coalescedor()
+        comecou = threading.Event()
+        liberar = threading.Event()
+        escritor.enviar(lambda: (comecou.set(), liberar.wait()))
+        comecou.wait(5)
+        pendente = escritor.enviar(lambda: "ok")
+
+        with self.assertRaises(coalescedor.FilaCheia):
+            escritor.enviar(lambda: "recusada")
+
+        liberar.set()
+        self.assertEqual(pendente.result(5), "ok")
+
+
+class PosicaoCardsTest(ProjetoFixtureMixin, TestCase):
+    def _criar(self, nome, status):
+        return self.criar_projeto(nome=nome, status=status)
+
+    def _coluna(self, status):
+        return list(
+            Projeto.objects.filter(status=status)
+            .order_by("posicao")
+            .values_list("nome", flat=True)
+        )
+
+    def test_chave_entre_vizinhos(self):
+        chaves = [posicoes.chave_entre()]
+        for _ in range(200):
+            chaves.insert(1, posicoes.chave_entre(chaves[0], chaves[1] if len(chaves) > 1 else None))
+        self.assertEqual(chaves, sorted(chaves))
+        self.assertEqual(len(set(chaves)), len(chaves))
+        self.assertFalse(any(chave.endswith("0") for chave in chaves))
+
+    def test_cards_novos_no_topo_e_reordenacao_grava_so_o_card(self):
+        a = self._criar("A", self.orcamento)
+        b = self._criar("B", self.orcamento)
+        c = self._criar("C", self.orcamento)
+        self.assertEqual(self._coluna(self.orcamento), ["C", "B", "A"])
+        posicoes_antes = {p.id: p.posicao for p in (a, b)}
+
+        # Arrasta C para entre B e A
+        self.client.post(
+            reverse("mover_projeto"),
+            {"projeto_id": c.id, "novo_status_id": self.orcamento.id,
+             "antes_id": b.id, "depois_id": a.id},
+            content_type="application/json",
+        )
+
+        self.assertEqual(self._coluna(self.orcamento), ["B", "C", "A"])
+        self.assertEqual(
+            dict(Projeto.objects.filter(id__in=[a.id, b.id]).values_list("id", "posicao")),
+            posicoes_antes,
+        )
+        self.assertFalse(
+            EventoProjeto.objects.filter(projeto=c, tipo=EventoProjeto.STATUS).exists()
+        )
+
+    def test_mover_para_outra_coluna_entre_cards(self):
+        x = self._criar("X", self.producao)
+        y = self._criar("Y", self.producao)
+        a = self._criar("A", self.orcamento)
+
+        self.client.post(
+            reverse("mover_projeto"),
+            {"projeto_id": a.id, "novo_status_id": self.producao.id,
+             "antes_id": y.id, "depois_id": x.id},
+            content_type="application/json",
+        )
+
+        self.assertEqual(self._coluna(self.producao), ["Y", "A", "X"])
+
+    def test_dois_cards_soltos_no_mesmo_vao(self):
+        a = self._criar("A", self.orcamento)
+        b = self._criar("B", self.orcamento)
+        x = self._criar("X", self.producao)
+        y = self._criar("Y", self.producao)
+
+        # Os dois clientes viram o mesmo quadro: B logo acima de A
+        for card in (x, y):
+            self.client.post(
+                reverse("mover_projeto"),
+                {"projeto_id": card.id, "novo_status_id": self.orcamento.id,
+                 "antes_id": b.id, "depois_id": a.id},
+                content_type="application/json",
+            )
+
+        self.assertEqual(self._coluna(self.orcamento), ["B", "Y", "X", "A"])
+        chaves = Projeto.objects.filter(status=self.orcamento).values_list("posicao", flat=True)
+        self.assertEqual(len(set(chaves)), 4)
+
+    @override_settings(POSICAO_TAMANHO_MAX=3)
+    def test_chaves_longas_agendam_rebalanceamento(self):
+        for i in range(20):
+            self._criar(f"P{i}", self.orcamento)
+        ordem = self._coluna(self.orcamento)
+
+        tarefa = Tarefa.objects.get(tipo="rebalancear_posicoes")
+        fila.executar(tarefa)
+
+        self.assertEqual(self._coluna(self.orcamento), ordem)
+        self.assertTrue(
+            all(
+                len(chave) <= 3
+                for chave in Projeto.objects.values_list("posicao", flat=True)
+            )
+        )
+
+
+class ContadoresStatusTest(ProjetoFixtureMixin, TestCase):
+    def _totais(self, status):
+        status.refresh_from_db()
+        return (status.total_ativos, status.total_pendentes, status.total_aprovados)
+
+    def test_transicoes_mantem_contadores_exatos(self):
+        a = self.criar_projeto()
+        b = self.criar_projeto()
+        self.assertEqual(self._totais(self.orcamento), (2, 2, 0))
+
+        self.client.post(
+            reverse("mover_projeto"),
+            {"projeto_id": a.id, "novo_status_id": self.producao.id},
+            content_type="application/json",
+        )
+        self.client.post(reverse("aprovar_projeto", args=[a.id]))
+        self.assertEqual(self._totais(self.producao), (1, 0, 1))
+
+        self.client.post(
+            reverse("concluir_projeto"), {"projeto_id": a.id}, content_type="application/json"
+        )
+        self.client.post(
+            reverse("rejeitar_projeto", args=[b.id]),
+            {"motivo": "Caro"},
+            content_type="application/json",
+        )
+        self.assertEqual(self._totais(self.producao), (0, 0, 0))
+        self.assertEqual(self._totais(self.orcamento), (0, 0, 0))
+
+        self.client.post(reverse("resetar_aprovacao_projeto", args=[b.id]))
+        self.assertEqual(self._totais(self.orcamento), (1, 1, 0))
+        self.client.post(
+            reverse("excluir_projeto"), {"projeto_id": b.id}, content_type="application/json"
+        )
+        self.assertEqual(self._totais(self.orcamento), (0, 0, 0))
+        self.assertEqual(contadores.reconciliar(corrigir=False), {})
+
+    def test_reconciliar_corrige_desvio(self):
+        self.criar_projeto()
+        StatusProjeto.objects.filter(id=self.orcamento.id).update(total_ativos=7)
+
+        saida = StringIO()
+        call_command("reconciliar_contadores", stdout=saida)
+
+        self.assertIn("1 status corrigidos", saida.getvalue())
+        self.assertEqual(self._totais(self.orcamento), (1, 1, 0))
+
+
+class ReferenciaCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # O rollback entre testes não dispara sinais
+        referencia.invalidar(*referencia.TABELAS)
+        self.status = StatusProjeto.objects.create(nome="Orçamento", ordem=1)
+        self.categoria = Categoria.objects.create(nome="Vidros")
+
+    def test_snapshot_reaproveitado_ate_invalidar(self):
+        referencia.obter("status")
+        with self.assertNumQueries(0):
+            status = referencia.obter("status")
+        self.assertEqual([s["nome"] for s in status], ["Orçamento"])
+
+        # post_save troca o carimbo e força nova carga
+        self.status.nome = "Orçamento novo"
+        self.status.save()
+        with self.assertNumQueries(1):
+            status = referencia.obter("status")
+        self.assertEqual(status[0]["nome"], "Orçamento novo")
+
+    def test_importacao_invalida_catalogo(self):
+        self.assertEqual(referencia.obter("produtos"), ())
+        importacao.importar(BytesIO(b"codigo,nome,categoria\nP1,Perfil,Aluminio\n"))
+
+        self.assertEqual([p["codigo"] for p in referencia.obter("produtos")], ["P1"])
+        self.assertEqual(
+            sorted(c["nome"] for c in referencia.categorias_ativas()), ["Aluminio", "Vidros"]
+        )
+
+
+class VooUnicoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_chamadas_simultaneas_compartilham_calculo(self):
+        liberar = threading.Event()
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            liberar.wait(5)
+            return {"total": 42}
+
+        resultados = []
+        threads = [
+            threading.Thread(
+                target=lambda: resultados.append(voo_unico.obter("teste:voo", calcular, ttl=60))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while not chamadas:
+            threading.Event().wait(0.01)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(resultados, [{"total": 42}] * 5)
+
+    def test_resultado_fica_no_cache_pelo_ttl(self):
+        self.assertEqual(voo_unico.obter("teste:voo", lambda: 1, ttl=60), 1)
+        self.assertEqual(voo_unico.obter("teste:voo", lambda: 2, ttl=60), 1)
+        cache.delete("teste:voo")
+        self.assertEqual(voo_unico.obter("teste:voo", lambda: 3, ttl=60), 3)
+
+
+class AdminEscalavelTest(ProjetoFixtureMixin, TestCase):
+    superusuario = True
+
+    def setUp(self):
+        super().setUp()
+        categoria = Categoria.objects.create(nome="Vidros")
+        self.produto = Produto.objects.create(nome="Vidro 8mm", categoria=categoria)
+        self.projetos = [self.criar_projeto(nome=f"Janela {i}") for i in range(3)]
+        for projeto in self.projetos:
+            MaterialProjeto.objects.create(projeto=projeto, produto=self.produto, quantidade=2)
+
+    def test_filtro_autocomplete_nao_lista_todas_as_opcoes(self):
+        url = reverse("admin:produtos_materialprojeto_changelist")
+        resposta = self.client.get(url)
+        self.assertContains(resposta, 'data-parametro="projeto__id__exact"')
+        self.assertNotContains(resposta, "?projeto__id__exact=")
+
+        alvo = self.projetos[1]
+        resposta = self.client.get(url, {"projeto__id__exact": alvo.id})
+        self.assertEqual(resposta.context["cl"].result_count, 1)
+        self.assertContains(resposta, f'<option value="{alvo.id}" selected>{alvo}</option>')
+
+    def test_changelist_sem_consulta_por_linha(self):
+        url = reverse("admin:produtos_materialprojeto_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        outro = Produto.objects.create(nome="Perfil", categoria=self.produto.categoria)
+        MaterialProjeto.objects.create(projeto=self.projetos[0], produto=outro, quantidade=1)
+        with CaptureQueriesContext(connection) as consultas_depois:
+            self.client.get(url)
+        self.assertEqual(len(consultas), len(consultas_depois))
+        self.assertFalse(
+            any("COUNT(*)" in q["sql"] and "LIMIT" not in q["sql"] for q in consultas)
+        )
+
+    def test_paginas_alem_do_limite_continuam_alcancaveis(self):
+        projetos = Projeto.objects.order_by("id")
+        with mock.patch.object(produtos_admin, "LIMITE_CONTAGEM", 1), mock.patch.object(
+            produtos_admin, "PAGINAS_ADIANTE", 0
+        ):
+            # Contagem truncada ainda anuncia a página seguinte
+            self.assertEqual(produtos_admin.PaginadorEstimado(projetos, 1).num_pages, 2)
+            pagina = produtos_admin.PaginadorEstimado(projetos, 1, pagina=2)
+            self.assertEqual(pagina.num_pages, 3)
+            ultima = produtos_admin.PaginadorEstimado(projetos, 1, pagina=3)
+            self.assertEqual(ultima.count, 3)
+            self.assertEqual(list(ultima.page(3)), [self.projetos[2]])
+
+        url = reverse("admin:produtos_projeto_changelist")
+        resposta = self.client.get(url, {"prazo": "depois"})
+        self.assertEqual(resposta.context["cl"].result_count, 3)
+        self.assertNotContains(resposta, "toplinks")
+
+
+class AcoesEmMassaAdminTest(ProjetoFixtureMixin, TestCase):
+    superusuario = True
+
+    def setUp(self):
+        super().setUp()
+        self.projetos = [self.criar_projeto(nome=f"Janela {i}") for i in range(3)]
+        self.url = reverse("admin:produtos_projeto_changelist")
+
+    def _acao(self, acao, **extra):
+        return self.client.post(
+            self.url,
+            {
+                "action": acao,
+                "index": 0,
+                helpers.ACTION_CHECKBOX_NAME: [p.id for p in self.projetos],
+                **extra,
+            },
+        )
+
+    def test_aprovar_e_concluir_em_massa(self):
+        # Um UPDATE e um INSERT para todos, independente de quantos projetos
+        with self.assertNumQueries(11):
+            self._acao("aprovar")
+        self._acao("concluir")
+
+        for projeto in Projeto.objects.all():
+            self.assertEqual(projeto.aprovacao, "aprovado")
+            self.assertTrue(projeto.concluido)
+            self.assertIsNotNone(projeto.data_aprovacao)
+            self.assertIsNotNone(projeto.data_conclusao)
+            self.assertEqual(projeto.versao, 3)
+        self.assertEqual(
+            EventoProjeto.objects.filter(tipo=EventoProjeto.CONCLUIDO).count(), 3
+        )
+        self.assertEqual(contadores.reconciliar(corrigir=False), {})
+
+    def test_selecionar_todos_em_lotes(self):
+        self.criar_projeto(nome="Janela 3", aprovacao="aprovado")
+        with mock.patch.object(models, "LOTE_TRANSICAO", 2):
+            # "Selecionar todos": o queryset é a changelist inteira, sem os já aprovados
+            self._acao("aprovar", select_across="1")
+
+        self.assertEqual(Projeto.objects.filter(aprovacao="aprovado", versao=2).count(), 3)
+        self.assertEqual(EventoProjeto.objects.filter(tipo=EventoProjeto.APROVADO).count(), 3)
+        self.assertEqual(contadores.reconciliar(corrigir=False), {})
+
+    def test_rejeitar_pede_motivo(self):
+        resposta = self._acao("rejeitar")
+        self.assertContains(resposta, "Motivo da rejeição")
+        self.assertFalse(Projeto.objects.filter(aprovacao="rejeitado").exists())
+
+        self._acao("rejeitar", confirmar="1", motivo="Fora do orçamento")
+        self.assertEqual(
+            set(Projeto.objects.values_list("motivo_rejeicao", flat=True)),
+            {"Fora do orçamento"},
+        )
+        self.assertEqual(contadores.reconciliar(corrigir=False), {})
+
+    def test_mover_para_status(self):
+        self._acao("mover_para_status", confirmar="1", status=self.producao.id)
+
+        self.assertEqual(Projeto.objects.filter(status=self.producao).count(), 3)
+        self.producao.refresh_from_db()
+        self.assertEqual(self.producao.total_ativos, 3)
+        self.assertTrue(
+            Tarefa.objects.filter(
+                tipo="rebalancear_posicoes", parametros__status_id=self.producao.id
+            ).exists()
+        )
+
+
+class PerfilInicializacaoTest(TestCase):
+    def test_boot_nao_importa_duckdb(self):
+        saida = StringIO()
+        call_command(
+            "perfil_inicializacao", "--json", "--top", "500", "--orcamento-ms", "60000", stdout=saida
+        )
+        relatorio = json.loads(saida.getvalue())
+
+        self.assertIn("produtos.views", relatorio["modulos_locais_ms"])
+        self.assertIn("urlconf_ms", relatorio["fases_ms"])
+        self.assertNotIn("duckdb", relatorio["pacotes_ms"])
+
+    def test_falha_acima_do_orcamento(self):
+        with self.assertRaisesMessage(CommandError, "acima do orçamento"):
+            call_command("perfil_inicializacao", "--orcamento-ms", "1", stdout=StringIO())
+
+
+class AquecimentoTest(TestCase):
+    def test_ready_so_depois_do_aquecimento(self):
+        aquecimento._estado["etapas"].clear()
+
+        def fora_do_ar():
+            raise OperationalError("unable to open database file")
+
+        etapas = tuple(
+            (nome, fora_do_ar if nome == "banco" else etapa)
+            for nome, etapa in aquecimento.ETAPAS
+        )
+        with mock.patch.object(aquecimento, "ETAPAS", etapas), self.assertLogs(
+            "produtos.aquecimento", "ERROR"
+        ):
+            self.assertFalse(aquecimento.aquecer())
+            resposta = self.client.get(reverse("pronto"))
+        self.assertEqual(resposta.status_code, 503)
+        self.assertFalse(resposta.json()["pronto"])
+
+        # O /ready refaz só a etapa que faltava
+        resposta = self.client.get(reverse("pronto"))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            set(resposta.json()["etapas"]), {"urls", "templates", "referencia", "banco"}
+        )
+
+    def test_banco_conferido_apos_fork(self):
+        aquecimento.aquecer()
+        aquecimento._estado["pid"] = -1  # simula o processo filho
+        self.assertFalse(aquecimento.pronto())
+        self.assertTrue(aquecimento.aquecer(etapas=("banco",)))
+
+
+class QuadroColunarTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        categoria = Categoria.objects.create(nome="Vidros")
+        self.produto = Produto.objects.create(nome="Vidro 8mm", categoria=categoria)
+        self.projetos = [self.criar_projeto(nome=f"Janela {i}") for i in range(3)]
+        MaterialProjeto.objects.create(projeto=self.projetos[0], produto=self.produto, quantidade=2)
+
+    def test_arrays_paralelos_e_etag(self):
+        resposta = self.client.get(reverse("api_board"))
+        dados = resposta.json()
+
+        self.assertEqual(dados["total"], 3)
+        self.assertEqual(len(dados["id"]), len(dados["nome"]))
+        self.assertEqual(dados["prazo"][0], PRAZO_ENTREGA)
+        self.assertEqual(dados["status"][str(self.status.id)]["nome"], "Orçamento")
+        materiais = dict(zip(dados["id"], dados["materiais"]))
+        self.assertEqual(materiais[self.projetos[0].id], 1)
+
+        etag = resposta["ETag"]
+        resposta = self.client.get(reverse("api_board"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        # Mudança no quadro troca a versão
+        self.projetos[1].aprovar_projeto(self.usuario)
+        resposta = self.client.get(reverse("api_board"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        codigos = dict(zip(dados["id"], dados["aprovacao_codigo"]))
+        self.assertEqual(dados["aprovacao"][codigos[self.projetos[1].id]], "aprovado")
+
+
+class SincronizarMateriaisTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        categoria = Categoria.objects.create(nome="Vidros")
+        self.produtos = [
+            Produto.objects.create(nome=f"Produto {i}", categoria=categoria) for i in range(4)
+        ]
+        self.projeto = self.criar_projeto()
+        for produto in self.produtos[:3]:
+            MaterialProjeto.objects.create(
+                projeto=self.projeto, produto=produto, quantidade=1, observacoes="obs"
+            )
+        self.url = reverse("sincronizar_materiais", args=[self.projeto.id])
+
+    def _enviar(self, materiais, versao=1):
+        return self.client.post(
+            self.url, {"materiais": materiais, "versao": versao}, content_type="application/json"
+        ).json()
+
+    def test_aplica_so_a_diferenca(self):
+        iguais = MaterialProjeto.objects.get(projeto=self.projeto, produto=self.produtos[0])
+        resposta = self._enviar(
+            [
+                {"produto_id": self.produtos[0].id, "quantidade": 1},
+                {"produto_id": self.produtos[1].id, "quantidade": 5},
+                {"produto_id": self.produtos[3].id, "quantidade": 2},
+            ]
+        )
+
+        self.assertEqual(
+            (resposta["criados"], resposta["atualizados"], resposta["removidos"]), (1, 1, 1)
+        )
+        self.assertEqual(resposta["versao"], 2)
+        atuais = dict(
+            MaterialProjeto.objects.filter(projeto=self.projeto).values_list(
+                "produto_id", "quantidade"
+            )
+        )
+        self.assertEqual(
+            atuais, {self.produtos[0].id: 1, self.produtos[1].id: 5, self.produtos[3].id: 2}
+        )
+        # Linha sem mudança não foi recriada nem perdeu as observações
+        iguais.refresh_from_db()
+        self.assertEqual(iguais.observacoes, "obs")
+
+    def test_versao_desatualizada_nao_altera(self):
+        self._enviar([], versao=1)
+        resposta = self._enviar([{"produto_id": self.produtos[0].id, "quantidade": 9}], versao=1)
+
+        self.assertTrue(resposta["conflito"])
+        self.assertFalse(MaterialProjeto.objects.filter(projeto=self.projeto).exists())
+
+    def test_produto_repetido_e_rejeitado(self):
+        produto_id = self.produtos[0].id
+        resposta = self._enviar(
+            [{"produto_id": produto_id, "quantidade": 1}, {"produto_id": produto_id, "quantidade": 2}]
+        )
+
+        self.assertFalse(resposta["success"])
+        self.assertEqual(MaterialProjeto.objects.filter(projeto=self.projeto).count(), 3)
+
+
+class CatalogoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        referencia.invalidar(*referencia.TABELAS)
+        self.usuario = User.objects.create_user("kiko", password="x")
+        self.client.force_login(self.usuario)
+        self.categoria = Categoria.objects.create(nome="Vidros")
+        Produto.objects.create(nome="Vidro 8mm", codigo="V8", estoque=3, categoria=self.categoria)
+
+    def test_catalogo_com_etag_e_versao(self):
+        resposta = self.client.get(reverse("api_catalogo"))
+        produto = resposta.json()["produtos"][0]
+        self.assertEqual(
+            (produto["nome"], produto["codigo"], produto["estoque"], produto["categoria"]),
+            ("Vidro 8mm", "V8", 3, "Vidros"),
+        )
+        etag = resposta["ETag"]
+        self.assertEqual(resposta["Cache-Control"], "private, no-cache")
+
+        versionada = self.client.get(reverse("api_catalogo"), {"v": etag.strip('"')})
+        self.assertIn("immutable", versionada["Cache-Control"])
+        self.assertEqual(
+            self.client.get(reverse("api_catalogo"), HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        Produto.objects.create(nome="Perfil", categoria=self.categoria)
+        resposta = self.client.get(reverse("api_catalogo"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()["produtos"]), 2)
+
+    def test_home_nao_carrega_o_catalogo(self):
+        resposta = self.client.get(reverse("home"))
+        etag, _ = referencia.catalogo()
+
+        self.assertNotContains(resposta, "Vidro 8mm")
+        self.assertContains(resposta, f"?v={etag}")
+
+
+@override_settings(ANALITICO_SNAPSHOT_INTERVALO=0)
+class PivotAnaliticoTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        referencia.invalidar(*referencia.TABELAS)
+        super().setUp()
+        vidros = Categoria.objects.create(nome="Vidros")
+        perfis = Categoria.objects.create(nome="Perfis")
+        self.vidro = Produto.objects.create(nome="Vidro 8mm", categoria=vidros)
+        self.perfil = Produto.objects.create(nome="Perfil L", categoria=perfis)
+        self.projetos = [
+            self.criar_projeto(nome=f"Janela {i}", cliente=cliente)
+            for i, cliente in enumerate(["ACME", "ACME", "Beta"])
+        ]
+        self.projetos[0].aprovar_projeto(self.usuario)
+        MaterialProjeto.objects.create(projeto=self.projetos[0], produto=self.vidro, quantidade=2)
+        MaterialProjeto.objects.create(projeto=self.projetos[1], produto=self.vidro, quantidade=5)
+        MaterialProjeto.objects.create(projeto=self.projetos[2], produto=self.perfil, quantidade=7)
+
+    def _pivot(self, **parametros):
+        return self.client.get(reverse("api_analytics_pivot"), parametros)
+
+    def test_projetos_por_cliente_e_status(self):
+        dados = self._pivot(dimensoes="cliente,status", medidas="projetos").json()
+
+        self.assertTrue(dados["success"])
+        self.assertEqual(dados["colunas"], ["cliente", "status", "projetos"])
+        self.assertEqual(dados["linhas"], [["ACME", "Orçamento", 2], ["Beta", "Orçamento", 1]])
+
+    def test_quantidade_por_categoria_pivotada_por_aprovacao(self):
+        dados = self._pivot(
+            fato="materiais", dimensoes="categoria", medidas="quantidade", pivotar="aprovacao"
+        ).json()
+
+        self.assertEqual(dados["colunas"], ["aprovado", "pendente"])
+        linhas = {linha["chave"][0]: linha["valores"]["quantidade"] for linha in dados["linhas"]}
+        self.assertEqual(linhas, {"Perfis": [None, 7], "Vidros": [2, 5]})
+
+        filtrado = self._pivot(
+            fato="materiais", dimensoes="categoria", medidas="quantidade", filtro_cliente="Beta"
+        ).json()
+        self.assertEqual(filtrado["linhas"], [["Perfis", 7]])
+
+    def test_resultado_em_cache_ate_os_dados_mudarem(self):
+        primeiro = self._pivot(dimensoes="cliente").json()
+        self.assertEqual(self._pivot(dimensoes="cliente").json()["versao"], primeiro["versao"])
+
+        self.criar_projeto(nome="Porta", cliente="Gama")
+        segundo = self._pivot(dimensoes="cliente").json()
+        self.assertNotEqual(segundo["versao"], primeiro["versao"])
+        self.assertEqual(segundo["linhas"][-1], ["Gama", 1])
+
+    def test_texto_com_delimitador_e_aspas(self):
+        cliente = 'Vidraçaria "Irmãos", Filial\nSul'
+        self.criar_projeto(nome="Porta", cliente=cliente)
+
+        dados = self._pivot(dimensoes="cliente", medidas="projetos").json()
+
+        self.assertIn([cliente, 1], dados["linhas"])
+
+    def test_dimensao_fora_da_lista(self):
+        resposta = self._pivot(dimensoes="usuario_id; DROP TABLE projetos")
+
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(resposta.json()["success"])
+
+
+class CalendarioPrazosTest(ProjetoFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.hoje = timezone.localdate()
+
+    def _projeto(self, entrega, pagamento, **campos):
+        return self.criar_projeto(
+            data_prazo_entrega=self.hoje + timedelta(days=entrega),
+            data_prazo_pagamento=self.hoje + timedelta(days=pagamento),
+            **campos,
+        )
+
+    def test_contagens_por_dia_em_uma_consulta(self):
+        self._projeto(-2, 5)
+        self._projeto(-2, 5, aprovacao="aprovado")
+        self._projeto(3, 3, concluido=True)
+        self._projeto(3, 40).excluir()
+
+        with self.assertNumQueries(1):
+            dados = calendario.prazos(self.hoje - timedelta(days=7), self.hoje + timedelta(days=30))
+
+        atrasado = dados["dias"][(self.hoje - timedelta(days=2)).isoformat()]
+        self.assertEqual(atrasado["entregas"]["total"], 2)
+        self.assertEqual(atrasado["entregas"]["estado"]["atrasado"], 2)
+        self.assertEqual(atrasado["entregas"]["aprovacao"]["aprovado"], 1)
+        self.assertEqual(atrasado["pagamentos"]["total"], 0)
+
+        dia = dados["dias"][(self.hoje + timedelta(days=3)).isoformat()]
+        self.assertEqual(dia["entregas"]["estado"]["concluido"], 1)
+        self.assertEqual(dia["pagamentos"]["total"], 1)
+        self.assertEqual(dados["totais"]["pagamentos"]["estado"]["no_prazo"], 2)
+        self.assertEqual(dados["totais"]["entregas"]["total"], 3)
+
+    def test_intervalo_limitado_a_um_ano(self):
+        resposta = self.client.get(
+            reverse("api_calendario_prazos"), {"data_inicio": "2030-01-01", "data_fim": "2031-06-01"}
+        )
+        self.assertEqual(resposta.status_code, 400)
+
+        resposta = self.client.get(reverse("api_calendario_prazos"))
+        self.assertTrue(resposta.json()["success"])
+        self.assertEqual(resposta.json()["inicio"], self.hoje.isoformat())
+
+
+class ClienteTest(ProjetoFixtureMixin, TestCase):
+    def _projeto(self, cliente, **campos):
+        return self.criar_projeto(cliente=cliente, **campos)
+
+    def test_variantes_do_nome_caem_no_mesmo_cliente(self):
+        a = self._projeto("Açaí Ltda.")
+        b = self._projeto("  acai   LTDA")
+        c = self._projeto("Beta")
+
+        self.assertEqual(a.cliente_cadastro_id, b.cliente_cadastro_id)
+        self.assertNotEqual(a.cliente_cadastro_id, c.cliente_cadastro_id)
+        self.assertEqual(a.cliente_cadastro.nome, "Açaí Ltda.")
+
+        c.atualizar(cliente="ACAI ltda")
+        c.refresh_from_db()
+        self.assertEqual(c.cliente_cadastro_id, a.cliente_cadastro_id)
+
+    def test_conflito_de_versao_nao_cria_cliente(self):
+        projeto = self._projeto("ACME")
+
+        with self.assertRaises(ConflitoVersao):
+            projeto.atualizar(versao=projeto.versao + 1, cliente="Novo Cliente")
+
+        self.assertFalse(Cliente.objects.filter(chave="novo cliente").exists())
+
+    def test_vincular_projetos_sem_cliente(self):
+        projeto = self._projeto("Gama")
+        Projeto.objects.filter(id=projeto.id).update(cliente_cadastro=None)
+
+        self.assertEqual(clientes.vincular(), 1)
+        projeto.refresh_from_db()
+        self.assertEqual(projeto.cliente_cadastro.chave, "gama")
+
+    def test_resumo_soma_quente_e_arquivo(self):
+        ontem = timezone.localdate() - timedelta(days=1)
+        self._projeto("ACME", data_prazo_entrega=ontem)
+        self._projeto("acme", aprovacao="aprovado")
+        self._projeto("ACME", aprovacao="rejeitado")
+        self._projeto("ACME").excluir()
+        self._projeto("Beta")
+        # O arquivamento não tira o projeto do histórico do cliente
+        arquivado = self._projeto("ACME", aprovacao="aprovado", concluido=True)
+        arquivamento.arquivar_ids([arquivado.id])
+
+        with self.assertNumQueries(2):
+            resumo = clientes.resumo()
+
+        acme = resumo[0]
+        self.assertEqual(acme["nome"], "ACME")
+        self.assertEqual((acme["total"], acme["abertos"], acme["atrasados"]), (4, 2, 1))
+        self.assertEqual((acme["aprovados"], acme["rejeitados"]), (2, 1))
+        self.assertEqual(acme["taxa_aprovacao"], 0.6667)
+        self.assertIsNone(resumo[1]["taxa_aprovacao"])
+
+        dados = self.client.get(reverse("api_clientes_resumo"), {"q": "be"}).json()
+        self.assertEqual([c["nome"] for c in dados["clientes"]], ["Beta"])
+
+    def test_autocomplete_por_prefixo_normalizado(self):
+        self._projeto("Construtora Ávila")
+        self._projeto("Construções Beta")
+        self._projeto("Avenida Sul")
+
+        dados = self.client.get(reverse("api_clientes_autocomplete"), {"q": "constru"}).json()
+        self.assertEqual(len(dados["clientes"]), 2)
+        dados = self.client.get(reverse("api_clientes_autocomplete"), {"q": "AVI"}).json()
+        self.assertEqual(dados["clientes"], [])
+        dados = self.client.get(reverse("api_clientes_autocomplete"), {"q": "ave"}).json()
+        self.assertEqual([c["nome"] for c in dados["clientes"]], ["Avenida Sul"])
+
+    def test_mesclar_clientes(self):
+        a = self._projeto("ACME")
+        self._projeto("ACME")
+        b = self._projeto("AMCE")
+
+        destino = clientes.mesclar([b.cliente_cadastro, a.cliente_cadastro])
+
+        b.refresh_from_db()
+        self.assertEqual(destino.id, a.cliente_cadastro_id)
+        self.assertEqual((b.cliente_cadastro_id, b.cliente), (destino.id, "ACME"))
+        self.assertFalse(Cliente.objects.filter(nome="AMCE").exists())
+
+    def test_mesclar_alcanca_o_arquivo(self):
+        a = self._projeto("Acme Corp")
+        self._projeto("Acme Corp")
+        b = self._projeto("Acmee Corp", concluido=True)
+        arquivamento.arquivar_ids([b.id])
+
+        clientes.mesclar([b.cliente_cadastro, a.cliente_cadastro])
+        arquivamento.restaurar(b.id)
+
+        b = Projeto.objects.get(id=b.id)
+        self.assertEqual((b.cliente, b.cliente_cadastro_id), ("Acme Corp", a.cliente_cadastro_id))
+        self.assertFalse(Cliente.objects.filter(chave="acmee corp").exists())
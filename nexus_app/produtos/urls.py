@@ -19,12 +19,14 @@ urlpatterns = [
     path("api/criar-projeto/", views.criar_projeto, name="criar_projeto"),
     path("api/criar-categoria/", views.criar_categoria, name="criar_categoria"),
     path("api/criar-produto/", views.criar_produto, name="criar_produto"),
+    path("api/importar-catalogo/", views.importar_catalogo, name="importar_catalogo"),
     
     # APIs de projeto
     path("api/mover-projeto/", views.mover_projeto, name="mover_projeto"),
     path("api/excluir-projeto/", views.excluir_projeto, name="excluir_projeto"),
     path("api/editar-projeto/", views.editar_projeto, name="editar_projeto"),
     path("api/projeto/<int:projeto_id>/", views.projeto_detail_api, name="projeto_detail_api"),
+    path("api/projeto/<int:projeto_id>/materiais/", views.sincronizar_materiais, name="sincronizar_materiais"),
     
     # APIs de conclusão
     path("api/concluir-projeto/", views.concluir_projeto, name="concluir_projeto"),
@@ -38,10 +40,28 @@ urlpatterns = [
     
     # APIs para AJAX
     path("api/projetos-rejeitados/", views.api_projetos_rejeitados, name="api_projetos_rejeitados"),
+    path("api/board/", views.api_board, name="api_board"),
+    path("api/catalogo/", views.api_catalogo, name="api_catalogo"),
     
     # Páginas especiais
     path("projetos-rejeitados/", views.projetos_rejeitados, name="projetos_rejeitados"),
 
     #filtros
     path('api/metricas-filtradas/', views.api_metricas_filtradas, name='api_metricas_filtradas'),
+    path('api/analytics/fluxo/', views.api_analytics_fluxo, name='api_analytics_fluxo'),
+    path('api/analytics/pivot/', views.api_analytics_pivot, name='api_analytics_pivot'),
+    path('api/calendario/prazos/', views.api_calendario_prazos, name='api_calendario_prazos'),
+    path('api/clientes/', views.api_clientes_resumo, name='api_clientes_resumo'),
+    path('api/clientes/autocomplete/', views.api_clientes_autocomplete, name='api_clientes_autocomplete'),
+
+    # Exportação
+    path('api/exportar-projetos/', views.exportar_projetos, name='exportar_projetos'),
+
+    # Fila de tarefas
+    path("api/tarefas/", views.criar_tarefa, name="criar_tarefa"),
+    path("api/tarefas/<int:tarefa_id>/", views.tarefa_detail_api, name="tarefa_detail_api"),
+
+    # Observabilidade
+    path("metrics", views.metricas_prometheus, name="metricas_prometheus"),
+    path("ready", views.pronto, name="pronto"),
 ]
\ No newline at end of file
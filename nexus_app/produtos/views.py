@@ -1,5 +1,6 @@
 import json
-import duckdb
+import os
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
@@ -7,14 +8,35 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils import timezone  # Adicionar este import
 from datetime import timedelta  # Adicionar este import
-from .models import Produto, Categoria, StatusProjeto, Projeto, MaterialProjeto
-from django.db import models
+from .models import Produto, Categoria, StatusProjeto, Projeto, MaterialProjeto, EventoProjeto, ProjetoArquivado, Tarefa, ConflitoVersao
+from django.db import models, transaction
 from django.views.decorators.http import require_http_methods
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from . import (
+    analitico,
+    aquecimento,
+    arquivamento,
+    calendario,
+    clientes,
+    coalescedor,
+    consultas_lentas,
+    contadores,
+    exportacao,
+    fila,
+    fluxo,
+    importacao,
+    instrumentacao,
+    posicoes,
+    quadro,
+    referencia,
+    voo_unico,
+)
 
 
 # Views de autenticação
@@ -64,6 +86,46 @@ def logout_view(request):
     return redirect("login")
 
 
+# Colunas que as transições (concluir, reabrir, aprovar...) leem e gravam
+CAMPOS_TRANSICAO = ("id", "versao", "nome", *contadores.CAMPOS)
+
+
+def _projeto_ou_404(projeto_id):
+    """
+    Projeto da tabela quente só com CAMPOS_TRANSICAO, sem o SELECT da linha
+    inteira; se não estiver lá, restaura do arquivo.
+    """
+    projeto = Projeto.objects.only(*CAMPOS_TRANSICAO).filter(id=projeto_id).first()
+    if projeto is None:
+        projeto = arquivamento.restaurar(projeto_id)
+    if projeto is None:
+        raise Http404("Projeto não encontrado")
+    return projeto
+
+
+def _dados_json(request):
+    """Corpo JSON opcional (aprovar/resetar também são chamados sem corpo)"""
+    if request.content_type == "application/json" and request.body:
+        return json.loads(request.body)
+    return {}
+
+
+def _id_ou_none(valor):
+    return int(valor) if valor not in (None, "") else None
+
+
+def _conflito(e, chave="error"):
+    """409: o cliente deve recarregar o projeto e refazer a alteração"""
+    return JsonResponse({"success": False, chave: str(e), "conflito": True}, status=409)
+
+
+def _fila_cheia(e, chave="error"):
+    """503: o coalescedor de escritas está saturado"""
+    response = JsonResponse({"success": False, chave: str(e)}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+
 # Views principais
 @login_required(login_url='/login/')
 def home(request):
@@ -76,16 +138,19 @@ def home(request):
         #usuario=request.user, 
         concluido=False,
         aprovacao__in=['pendente', 'aprovado']  # EXCLUIR REJEITADOS
-    ).order_by('-data_criacao')
+    ).order_by('posicao', '-data_criacao')
     
-    produtos = Produto.objects.filter(ativo=True).order_by('nome')
-    categorias = Categoria.objects.filter(ativo=True).order_by('nome')
-    status_list = StatusProjeto.objects.filter(ativo=True).order_by('ordem')
+    # Dados de referência vêm do cache em memória (dicts), sem consultar o banco;
+    # os produtos dos modais chegam por /api/catalogo/, em cache no navegador
+    catalogo_versao, _ = referencia.catalogo()
+    categorias = referencia.categorias_ativas()
+    todos_status = referencia.status_com_contadores(apenas_ativos=False)
+    status_list = [status for status in todos_status if status["ativo"]]
     
     # Organizar projetos por status
     projetos_por_status = {}
     for status in status_list:
-        projetos_por_status[status.id] = projetos.filter(status=status)
+        projetos_por_status[status["id"]] = projetos.filter(status_id=status["id"])
     
     # ========== MÉTRICAS ==========
     hoje = timezone.now().date()
@@ -93,8 +158,9 @@ def home(request):
     fim_semana = inicio_semana + timedelta(days=6)
     
     # 1. Projetos por status (pegar o primeiro status como exemplo)
-    primeiro_status = status_list.first()
-    projetos_primeiro_status = projetos.filter(status=primeiro_status).count() if primeiro_status else 0
+    # Contagens por coluna vêm dos contadores desnormalizados de StatusProjeto
+    primeiro_status = status_list[0] if status_list else None
+    projetos_primeiro_status = primeiro_status["total_ativos"] if primeiro_status else 0
     
     # 2. Projetos em atraso (prazo de entrega passou)
     projetos_em_atraso = projetos.filter(data_prazo_entrega__lt=hoje).count()
@@ -105,27 +171,27 @@ def home(request):
         data_prazo_entrega__lte=fim_semana
     ).count()
     
-    # 4. Total de projetos concluídos
-    projetos_concluidos = Projeto.objects.filter(
+    # 4. Total de projetos concluídos (tabela quente + arquivo)
+    projetos_concluidos = arquivamento.contar(
         #usuario=request.user, 
-        concluido=True).count()
+        concluido=True)
     
     # 5. PROJETOS REJEITADOS - CONTAR SEPARADAMENTE
-    projetos_rejeitados = Projeto.objects.filter(
+    projetos_rejeitados = arquivamento.contar(
         #usuario=request.user, 
         aprovacao='rejeitado'
-    ).count()
+    )
     
     # 6. Projetos pendentes de aprovação
-    projetos_pendentes = projetos.filter(aprovacao='pendente').count()
+    projetos_pendentes = sum(status["total_pendentes"] for status in todos_status)
     
     # ========== NOVAS MÉTRICAS ==========
     
     # 7. Orçamentos aceitos (aprovados)
-    orcamentos_aceitos = Projeto.objects.filter(
+    orcamentos_aceitos = arquivamento.contar(
         #usuario=request.user,
         aprovacao='aprovado'
-    ).count()
+    )
     
     # 8. Orçamentos rejeitados
     orcamentos_rejeitados = projetos_rejeitados  # Mesmo valor dos rejeitados
@@ -136,17 +202,16 @@ def home(request):
     # Dados dos status para o dropdown
     status_metricas = []
     for status in status_list:
-        count = projetos.filter(status=status).count()
         status_metricas.append({
-            'id': status.id,
-            'nome': status.nome,
-            'cor': status.cor,
-            'count': count
+            'id': status['id'],
+            'nome': status['nome'],
+            'cor': status['cor'],
+            'count': status['total_ativos']
         })
     
     context = {
         'projetos': projetos,
-        'produtos': produtos,
+        'catalogo_versao': catalogo_versao,
         'categorias': categorias,
         'status_list': status_list,
         'projetos_por_status': projetos_por_status,
@@ -191,16 +256,14 @@ def criar_status(request):
             return JsonResponse({"success": False, "error": "Nome é obrigatório"})
 
         # Verificar se já existe um status com esse nome
-        if StatusProjeto.objects.filter(nome=nome).exists():
+        todos_status = referencia.obter("status")
+        if any(status["nome"] == nome for status in todos_status):
             return JsonResponse(
                 {"success": False, "error": "Já existe um status com esse nome"}
             )
 
-        # Determinar a próxima ordem - COM models.Max
-        ultima_ordem = (
-            StatusProjeto.objects.aggregate(max_ordem=models.Max("ordem"))["max_ordem"]
-            or 0
-        )
+        # Determinar a próxima ordem
+        ultima_ordem = max((status["ordem"] for status in todos_status), default=0)
 
         # Criar o status
         status = StatusProjeto.objects.create(
@@ -227,21 +290,51 @@ def criar_status(request):
 @require_POST
 @login_required
 def mover_projeto(request):
-    """API para mover projeto entre status"""
+    """API para mover projeto entre status e/ou reordená-lo na coluna"""
     try:
         data = json.loads(request.body)
         projeto_id = data.get("projeto_id")
         novo_status_id = data.get("novo_status_id")
+        # Vizinhos no destino (card acima e abaixo); sem eles o card vai para o topo
+        antes_id = data.get("antes_id")
+        depois_id = data.get("depois_id")
 
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
+        projeto = get_object_or_404(
+            Projeto.objects.only("id", "versao", "posicao", *contadores.CAMPOS), id=projeto_id,
         #usuario=request.user
         )
         novo_status = get_object_or_404(StatusProjeto, id=novo_status_id)
 
-        projeto.status = novo_status
-        projeto.save()
+        mudou_status = projeto.status_id != novo_status.id
+        if mudou_status or antes_id or depois_id:
+
+            def mover():
+                # Só o card movido é gravado: a chave nova fica entre as dos
+                # vizinhos, lidos na mesma transação da gravação
+                posicao = posicoes.chave_entre_vizinhos(
+                    novo_status.id,
+                    _id_ou_none(antes_id),
+                    _id_ou_none(depois_id),
+                    excluir_id=projeto.id,
+                )
+                projeto.atualizar(
+                    EventoProjeto.STATUS if mudou_status else None,
+                    request.user,
+                    data.get("versao"),
+                    status_id=novo_status.id,
+                    posicao=posicao,
+                )
+
+            coalescedor.executar(mover)
+            posicoes.agendar_rebalanceamento(novo_status.id, projeto.posicao)
 
-        return JsonResponse({"success": True})
+        return JsonResponse(
+            {"success": True, "versao": projeto.versao, "posicao": projeto.posicao}
+        )
+    except ConflitoVersao as e:
+        return _conflito(e)
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
@@ -264,7 +357,8 @@ def excluir_projeto(request):
         #usuario=request.user
         )
         nome_projeto = projeto.nome
-        projeto.delete()
+        # Exclusão lógica: a remoção dos materiais fica para o purgar_projetos
+        projeto.excluir(usuario=request.user)
 
         return JsonResponse(
             {
@@ -311,6 +405,7 @@ def projeto_detail_api(request, projeto_id):
                     ),
                     "status_id": projeto.status.id,
                     "status_nome": projeto.status.nome,
+                    "versao": projeto.versao,
                     "observacoes": projeto.observacoes or "",
                     "data_criacao": projeto.data_criacao.isoformat(),
                     "materiais": materiais,
@@ -353,42 +448,7 @@ class ProdutoDetailView(LoginRequiredMixin, DetailView):
 def analytics_api(request):
     """API para dados de analytics usando DuckDB"""
     try:
-        conn = duckdb.connect(":memory:")
-
-        conn.execute(
-            """
-            CREATE TABLE vendas AS SELECT * FROM VALUES
-            ('2024-01-01', 'Produto A', 100.0, 5),
-            ('2024-01-02', 'Produto B', 150.0, 3),
-            ('2024-01-03', 'Produto A', 100.0, 2),
-            ('2024-01-04', 'Produto C', 200.0, 4)
-            AS t(data, produto, preco, quantidade)
-        """
-        )
-
-        result = conn.execute(
-            """
-            SELECT 
-                produto,
-                SUM(preco * quantidade) as total_vendas,
-                SUM(quantidade) as total_quantidade
-            FROM vendas 
-            GROUP BY produto
-            ORDER BY total_vendas DESC
-        """
-        ).fetchall()
-
-        data = []
-        for row in result:
-            data.append(
-                {
-                    "produto": row[0],
-                    "total_vendas": float(row[1]),
-                    "total_quantidade": int(row[2]),
-                }
-            )
-
-        conn.close()
+        data = analitico.vendas_demo()
         return JsonResponse({"success": True, "data": data})
 
     except Exception as e:
@@ -477,6 +537,36 @@ def criar_produto(request):
         return JsonResponse({"success": False, "error": str(e)})
 
 
+@csrf_exempt
+@require_POST
+@login_required
+def importar_catalogo(request):
+    """API para importar produtos/categorias em massa (CSV ou JSON lines, upsert por código)"""
+    try:
+        arquivo = request.FILES.get("arquivo")
+        if arquivo is not None:
+            formato = request.GET.get("formato") or importacao.detectar_formato(arquivo.name)
+        else:
+            # Corpo cru (text/csv ou application/x-ndjson), lido linha a linha
+            arquivo = request
+            formato = request.GET.get("formato") or (
+                "jsonl" if "json" in request.content_type else "csv"
+            )
+        if formato not in importacao.FORMATOS:
+            return JsonResponse({"success": False, "error": "Formato inválido"}, status=400)
+
+        lote = min(max(int(request.GET.get("lote", 1000)), 1), 5000)
+        resumo = importacao.importar(
+            arquivo,
+            formato,
+            lote=lote,
+            criar_categorias=request.GET.get("criar_categorias", "1") != "0",
+        )
+        return JsonResponse({"success": True, **resumo})
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
 @login_required(login_url="/login/")
 def produto_list(request):
     """Lista de produtos"""
@@ -560,14 +650,16 @@ def criar_projeto(request):
 @login_required(login_url='/login/')
 def projetos_rejeitados(request):
     """Lista projetos rejeitados"""
-    projetos_rejeitados = Projeto.objects.filter(
+    projetos_rejeitados = arquivamento.listar(
+        ['id', 'nome', 'cliente', 'observacoes', 'data_aprovacao', 'motivo_rejeicao', 'status__nome', 'status__cor'],
+        ['-data_aprovacao'],
         #usuario=request.user,
         aprovacao='rejeitado'
-    ).order_by('-data_aprovacao')
+    )
     
     context = {
         'projetos_rejeitados': projetos_rejeitados,
-        'total_rejeitados': projetos_rejeitados.count(),
+        'total_rejeitados': arquivamento.contar(aprovacao='rejeitado'),
     }
     
     return render(request, 'produtos/projetos_rejeitados.html', context)
@@ -577,8 +669,10 @@ def projetos_rejeitados(request):
 def projeto_detail_api(request, projeto_id):
     """API para buscar detalhes de um projeto"""
     try:
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
+        # Projetos arquivados continuam consultáveis
+        projeto = (
+            Projeto.objects.filter(id=projeto_id).first()
+            or get_object_or_404(ProjetoArquivado, id=projeto_id)
         )
 
         # Buscar materiais
@@ -607,6 +701,7 @@ def projeto_detail_api(request, projeto_id):
                     ),
                     "status_id": projeto.status.id,
                     "status_nome": projeto.status.nome,
+                    "versao": projeto.versao,
                     "observacoes": projeto.observacoes,
                     "data_criacao": projeto.data_criacao.isoformat(),
                     "materiais": materiais,
@@ -631,7 +726,8 @@ def editar_projeto(request):
                 {"success": False, "error": "ID do projeto é obrigatório"}
             )
 
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
+        projeto = get_object_or_404(
+            Projeto.objects.only("id", "versao", *contadores.CAMPOS), id=projeto_id,
         #usuario=request.user
         )
 
@@ -652,25 +748,63 @@ def editar_projeto(request):
                 }
             )
 
-        # Atualizar campos
-        projeto.nome = nome
-        projeto.cliente = cliente
-        projeto.data_prazo_entrega = data_prazo_entrega
-        projeto.data_prazo_pagamento = data_prazo_pagamento
-        projeto.observacoes = data.get("observacoes", "")
-
-        # Atualizar status
-        projeto.status = get_object_or_404(StatusProjeto, id=status_id)
+        status = get_object_or_404(StatusProjeto, id=status_id)
 
-        projeto.save()
+        campos = {
+            "nome": nome,
+            "cliente": cliente,
+            "data_prazo_entrega": data_prazo_entrega,
+            "data_prazo_pagamento": data_prazo_pagamento,
+            "observacoes": data.get("observacoes", ""),
+            "status_id": status.id,
+        }
+        mudou_status = status.id != projeto.status_id
+        if mudou_status:
+            # Mudou de coluna: entra no topo da nova
+            campos["posicao"] = posicoes.chave_no_topo(status.id)
+
+        # Um UPDATE só com os campos editáveis, condicionado à versão lida pelo cliente
+        projeto.atualizar(
+            EventoProjeto.STATUS if mudou_status else None,
+            request.user,
+            data.get("versao"),
+            **campos,
+        )
 
         return JsonResponse(
             {
                 "success": True,
                 "message": f'Projeto "{projeto.nome}" atualizado com sucesso!',
+                "versao": projeto.versao,
             }
         )
 
+    except ConflitoVersao as e:
+        return _conflito(e)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@csrf_exempt
+@require_POST
+@login_required
+def sincronizar_materiais(request, projeto_id):
+    """API para substituir a lista de materiais do projeto (aplica só a diferença)"""
+    try:
+        data = json.loads(request.body)
+        materiais = data.get("materiais")
+        if not isinstance(materiais, list):
+            return JsonResponse({"success": False, "error": "Lista de materiais é obrigatória"})
+
+        projeto = get_object_or_404(
+            Projeto.objects.only("id", "versao", *contadores.CAMPOS), id=projeto_id
+        )
+        resumo = projeto.sincronizar_materiais(materiais, request.user, data.get("versao"))
+
+        return JsonResponse({"success": True, "versao": projeto.versao, **resumo})
+
+    except ConflitoVersao as e:
+        return _conflito(e)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
@@ -689,18 +823,25 @@ def concluir_projeto(request):
                 {"success": False, "error": "ID do projeto é obrigatório"}
             )
 
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
+        projeto = _projeto_ou_404(projeto_id)
+        coalescedor.executar(
+            lambda: projeto.marcar_como_concluido(
+                usuario=request.user, versao=data.get("versao")
+            )
         )
-        projeto.marcar_como_concluido()
 
         return JsonResponse(
             {
                 "success": True,
                 "message": f'Projeto "{projeto.nome}" marcado como concluído!',
+                "versao": projeto.versao,
             }
         )
 
+    except ConflitoVersao as e:
+        return _conflito(e)
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
@@ -719,18 +860,23 @@ def reabrir_projeto(request):
                 {"success": False, "error": "ID do projeto é obrigatório"}
             )
 
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
+        projeto = _projeto_ou_404(projeto_id)
+        coalescedor.executar(
+            lambda: projeto.reabrir_projeto(usuario=request.user, versao=data.get("versao"))
         )
-        projeto.reabrir_projeto()
 
         return JsonResponse(
             {
                 "success": True,
                 "message": f'Projeto "{projeto.nome}" reaberto com sucesso!',
+                "versao": projeto.versao,
             }
         )
 
+    except ConflitoVersao as e:
+        return _conflito(e)
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
@@ -739,24 +885,26 @@ def reabrir_projeto(request):
 def projetos_concluidos_api(request):
     """API para listar projetos concluídos"""
     try:
-        projetos = Projeto.objects.filter(
+        projetos = arquivamento.listar(
+            ["id", "nome", "cliente", "status__nome", "data_conclusao", "observacoes"],
+            ["-data_conclusao"],
             #usuario=request.user, 
-            concluido=True).order_by("-data_conclusao")
+            concluido=True)
 
         projetos_data = []
         for projeto in projetos:
             projetos_data.append(
                 {
-                    "id": projeto.id,
-                    "nome": projeto.nome,
-                    "cliente": projeto.cliente,
-                    "status_nome": projeto.status.nome,
+                    "id": projeto["id"],
+                    "nome": projeto["nome"],
+                    "cliente": projeto["cliente"],
+                    "status_nome": projeto["status__nome"],
                     "data_conclusao": (
-                        projeto.data_conclusao.isoformat()
-                        if projeto.data_conclusao
+                        projeto["data_conclusao"].isoformat()
+                        if projeto["data_conclusao"]
                         else None
                     ),
-                    "observacoes": projeto.observacoes or "",
+                    "observacoes": projeto["observacoes"] or "",
                 }
             )
 
@@ -770,18 +918,24 @@ def projetos_concluidos_api(request):
 def aprovar_projeto(request, projeto_id):
     """Aprova um projeto"""
     try:
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
+        projeto = _projeto_ou_404(projeto_id)
+        data = _dados_json(request)
+        coalescedor.executar(
+            lambda: projeto.aprovar_projeto(usuario=request.user, versao=data.get('versao'))
         )
-        projeto.aprovar_projeto()
         
         return JsonResponse({
             'success': True,
             'message': 'Projeto aprovado com sucesso!',
             'aprovacao': projeto.aprovacao,
-            'data_aprovacao': projeto.data_aprovacao.strftime('%d/%m/%Y %H:%M') if projeto.data_aprovacao else None
+            'data_aprovacao': projeto.data_aprovacao.strftime('%d/%m/%Y %H:%M') if projeto.data_aprovacao else None,
+            'versao': projeto.versao
         })
         
+    except ConflitoVersao as e:
+        return _conflito(e, 'message')
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e, 'message')
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -795,23 +949,30 @@ def rejeitar_projeto(request, projeto_id):
     try:
         import json
         
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
-        )
+        projeto = _projeto_ou_404(projeto_id)
         
         # Pegar motivo do corpo da requisição
         data = json.loads(request.body) if request.body else {}
         motivo = data.get('motivo', 'Projeto rejeitado')
         
-        projeto.rejeitar_projeto(motivo)
+        coalescedor.executar(
+            lambda: projeto.rejeitar_projeto(
+                motivo, usuario=request.user, versao=data.get('versao')
+            )
+        )
         
         return JsonResponse({
             'success': True,
             'message': 'Projeto rejeitado com sucesso!',
             'aprovacao': projeto.aprovacao,
-            'motivo_rejeicao': projeto.motivo_rejeicao
+            'motivo_rejeicao': projeto.motivo_rejeicao,
+            'versao': projeto.versao
         })
         
+    except ConflitoVersao as e:
+        return _conflito(e, 'message')
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e, 'message')
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -823,17 +984,23 @@ def rejeitar_projeto(request, projeto_id):
 def resetar_aprovacao_projeto(request, projeto_id):
     """Reseta aprovação de um projeto para pendente"""
     try:
-        projeto = get_object_or_404(Projeto, id=projeto_id, 
-        #usuario=request.user
+        projeto = _projeto_ou_404(projeto_id)
+        data = _dados_json(request)
+        coalescedor.executar(
+            lambda: projeto.resetar_aprovacao(usuario=request.user, versao=data.get('versao'))
         )
-        projeto.resetar_aprovacao()
         
         return JsonResponse({
             'success': True,
             'message': 'Projeto reaberto com sucesso!',
-            'aprovacao': projeto.aprovacao
+            'aprovacao': projeto.aprovacao,
+            'versao': projeto.versao
         })
         
+    except ConflitoVersao as e:
+        return _conflito(e, 'message')
+    except coalescedor.FilaCheia as e:
+        return _fila_cheia(e, 'message')
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -844,21 +1011,23 @@ def resetar_aprovacao_projeto(request, projeto_id):
 def projetos_rejeitados_api(request):
     """API para listar projetos rejeitados"""
     try:
-        projetos = Projeto.objects.filter(
+        projetos = arquivamento.listar(
+            ['id', 'nome', 'cliente', 'status__nome', 'data_aprovacao', 'motivo_rejeicao', 'observacoes'],
+            ['-data_aprovacao'],
             #usuario=request.user, 
             aprovacao='rejeitado'
-        ).order_by('-data_aprovacao')
+        )
         
         projetos_data = []
         for projeto in projetos:
             projetos_data.append({
-                'id': projeto.id,
-                'nome': projeto.nome,
-                'cliente': projeto.cliente,
-                'status_nome': projeto.status.nome,
-                'data_aprovacao': projeto.data_aprovacao.isoformat() if projeto.data_aprovacao else None,
-                'motivo_rejeicao': projeto.motivo_rejeicao or 'Sem motivo especificado',
-                'observacoes': projeto.observacoes or ''
+                'id': projeto['id'],
+                'nome': projeto['nome'],
+                'cliente': projeto['cliente'],
+                'status_nome': projeto['status__nome'],
+                'data_aprovacao': projeto['data_aprovacao'].isoformat() if projeto['data_aprovacao'] else None,
+                'motivo_rejeicao': projeto['motivo_rejeicao'] or 'Sem motivo especificado',
+                'observacoes': projeto['observacoes'] or ''
             })
         
         return JsonResponse({
@@ -875,21 +1044,25 @@ def projetos_rejeitados_api(request):
 def api_projetos_rejeitados(request):
     """API para carregar projetos rejeitados via AJAX"""
     try:
-        projetos_rejeitados = Projeto.objects.filter(
+        projetos_rejeitados = arquivamento.listar(
+            ['id', 'nome', 'cliente', 'data_aprovacao', 'motivo_rejeicao', 'status__nome', 'status__cor'],
+            ['-data_aprovacao'],
+            limite=6,  # Limitar a 6 projetos
             #usuario=request.user,
             aprovacao='rejeitado'
-        ).order_by('-data_aprovacao')[:6]  # Limitar a 6 projetos
+        )
         
         projetos_data = []
         for projeto in projetos_rejeitados:
+            motivo = projeto['motivo_rejeicao']
             projetos_data.append({
-                'id': projeto.id,
-                'nome': projeto.nome,
-                'cliente': projeto.cliente,
-                'data_aprovacao': projeto.data_aprovacao.strftime('%d/%m/%Y %H:%M') if projeto.data_aprovacao else 'Não informado',
-                'motivo_rejeicao': projeto.motivo_rejeicao[:100] + '...' if projeto.motivo_rejeicao and len(projeto.motivo_rejeicao) > 100 else projeto.motivo_rejeicao or 'Sem motivo informado',
-                'status_nome': projeto.status.nome,
-                'status_cor': projeto.status.cor,
+                'id': projeto['id'],
+                'nome': projeto['nome'],
+                'cliente': projeto['cliente'],
+                'data_aprovacao': projeto['data_aprovacao'].strftime('%d/%m/%Y %H:%M') if projeto['data_aprovacao'] else 'Não informado',
+                'motivo_rejeicao': motivo[:100] + '...' if motivo and len(motivo) > 100 else motivo or 'Sem motivo informado',
+                'status_nome': projeto['status__nome'],
+                'status_cor': projeto['status__cor'],
             })
         
         return JsonResponse({
@@ -907,13 +1080,259 @@ def api_projetos_rejeitados(request):
         })
     
 
+def _calcular_metricas(data_inicio, data_fim):
+    """Métricas do dashboard para o período (datas opcionais)"""
+    from django.utils import timezone
+    from datetime import timedelta
+    
+    # Base query - projetos do usuário
+    filtros_data = {}
+    
+    # Aplicar filtros de data se fornecidos
+    if data_inicio:
+        filtros_data['data_criacao__date__gte'] = data_inicio
+    
+    if data_fim:
+        filtros_data['data_criacao__date__lte'] = data_fim
+    
+    projetos_base = Projeto.objects.filter(
+        #usuario=request.user
+        **filtros_data)
+    
+    # Projetos ativos (não concluídos e não rejeitados)
+    projetos_ativos = projetos_base.filter(
+        concluido=False,
+        aprovacao__in=['pendente', 'aprovado']
+    )
+    
+    # ========== CALCULAR MÉTRICAS ==========
+    
+    hoje = timezone.now().date()
+    
+    # Se há filtro de data, ajustar o "hoje" para o período
+    if data_fim:
+        hoje = min(hoje, data_fim)
+    
+    # 1. Projetos em atraso
+    projetos_em_atraso = projetos_ativos.filter(data_prazo_entrega__lt=hoje).count()
+    
+    # 2. Projetos da semana (dentro do período filtrado)
+    if data_inicio and data_fim:
+        # Se há filtro, contar projetos com prazo dentro do período
+        projetos_semana = projetos_ativos.filter(
+            data_prazo_entrega__gte=data_inicio,
+            data_prazo_entrega__lte=data_fim
+        ).count()
+        periodo_texto = f"{data_inicio.strftime('%d/%m')} a {data_fim.strftime('%d/%m')}"
+    else:
+        # Semana atual
+        inicio_semana = hoje - timedelta(days=hoje.weekday())
+        fim_semana = inicio_semana + timedelta(days=6)
+        projetos_semana = projetos_ativos.filter(
+            data_prazo_entrega__gte=inicio_semana,
+            data_prazo_entrega__lte=fim_semana
+        ).count()
+        periodo_texto = f"{inicio_semana.strftime('%d/%m')} a {fim_semana.strftime('%d/%m')}"
+    
+    # 3. Projetos concluídos (tabela quente + arquivo)
+    projetos_concluidos = arquivamento.contar(concluido=True, **filtros_data)
+    
+    # 4. Orçamentos aceitos
+    orcamentos_aceitos = arquivamento.contar(aprovacao='aprovado', **filtros_data)
+    
+    # 5. Orçamentos rejeitados
+    orcamentos_rejeitados = arquivamento.contar(aprovacao='rejeitado', **filtros_data)
+    
+    # 6/7. Pendentes e ativos por status: sem filtro de data vêm dos
+    # contadores de StatusProjeto; com filtro, de um único GROUP BY
+    status_list = referencia.status_ativos()
+    if filtros_data:
+        por_status = {
+            linha['status_id']: (linha['ativos'], linha['pendentes'])
+            for linha in projetos_ativos.order_by().values('status_id').annotate(
+                ativos=models.Count('id'),
+                pendentes=models.Count('id', filter=models.Q(aprovacao='pendente')),
+            )
+        }
+        total_ativos = sum(ativos for ativos, _ in por_status.values())
+        projetos_pendentes = sum(pendentes for _, pendentes in por_status.values())
+    else:
+        por_status = {
+            id: (ativos, pendentes)
+            for id, ativos, pendentes in StatusProjeto.objects.values_list(
+                'id', 'total_ativos', 'total_pendentes'
+            )
+        }
+        total_ativos = sum(ativos for ativos, _ in por_status.values())
+        projetos_pendentes = sum(pendentes for _, pendentes in por_status.values())
+    
+    status_metricas = []
+    for status in status_list:
+        status_metricas.append({
+            'id': status['id'],
+            'nome': status['nome'],
+            'cor': status['cor'],
+            'count': por_status.get(status['id'], (0, 0))[0]
+        })
+    
+    # Calcular percentuais
+    total_orcamentos = orcamentos_aceitos + orcamentos_rejeitados
+    percentual_aceitos = round((orcamentos_aceitos / total_orcamentos * 100) if total_orcamentos > 0 else 0)
+    percentual_rejeitados = round((orcamentos_rejeitados / total_orcamentos * 100) if total_orcamentos > 0 else 0)
+    
+    return {
+        'projetos_ativos': total_ativos,
+        'projetos_em_atraso': projetos_em_atraso,
+        'projetos_semana': projetos_semana,
+        'projetos_concluidos': projetos_concluidos,
+        'orcamentos_aceitos': orcamentos_aceitos,
+        'orcamentos_rejeitados': orcamentos_rejeitados,
+        'projetos_pendentes': projetos_pendentes,
+        'status_metricas': status_metricas,
+        'percentual_aceitos': percentual_aceitos,
+        'percentual_rejeitados': percentual_rejeitados,
+        'total_orcamentos': total_orcamentos,
+        'periodo_texto': periodo_texto,
+    }
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_catalogo(request):
+    """Catálogo de produtos ativos para os modais, com ETag pela versão do catálogo"""
+    try:
+        etag, corpo = referencia.catalogo()
+        if request.headers.get("If-None-Match") == f'"{etag}"':
+            resposta = HttpResponse(status=304)
+        else:
+            resposta = HttpResponse(corpo, content_type="application/json")
+        resposta["ETag"] = f'"{etag}"'
+        # URL versionada (?v=<etag>, como a home gera) pode ficar no navegador;
+        # sem versão, o navegador revalida pelo ETag
+        if request.GET.get("v") == etag:
+            resposta["Cache-Control"] = "private, max-age=31536000, immutable"
+        else:
+            resposta["Cache-Control"] = "private, no-cache"
+        return resposta
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_board(request):
+    """Quadro ativo inteiro em JSON colunar (arrays paralelos), com ETag pela versão dos dados"""
+    try:
+        carimbo = quadro.versao()
+        etag = f'"{carimbo}"'
+        if request.headers.get("If-None-Match") == etag:
+            resposta = HttpResponse(status=304)
+        else:
+            _, corpo = quadro.corpo(carimbo)
+            resposta = HttpResponse(corpo, content_type="application/json")
+        resposta["ETag"] = etag
+        resposta["Cache-Control"] = "private, no-cache"
+        return resposta
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_clientes_autocomplete(request):
+    """Clientes cujo nome começa pelo termo (?q=), pelo índice da chave normalizada"""
+    try:
+        limite = min(int(request.GET.get('limite', 10)), 50)
+        return JsonResponse({
+            'success': True,
+            'clientes': clientes.autocompletar(request.GET.get('q', ''), limite),
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_clientes_resumo(request):
+    """Projetos abertos, atrasados e taxa de aprovação por cliente (uma consulta agrupada)"""
+    try:
+        limite = min(int(request.GET.get('limite', 50)), 500)
+        return JsonResponse({
+            'success': True,
+            'clientes': clientes.resumo(request.GET.get('q'), limite),
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_calendario_prazos(request):
+    """Heatmap de prazos de entrega e pagamento por dia (uma consulta agrupada)"""
+    try:
+        from datetime import datetime
+
+        datas = {}
+        for parametro, nome in (('data_inicio', 'inicio'), ('data_fim', 'fim')):
+            if request.GET.get(parametro):
+                datas[nome] = datetime.strptime(request.GET[parametro], '%Y-%m-%d').date()
+        dados = calendario.prazos(**datas)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse({'success': True, **dados})
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_analytics_pivot(request):
+    """Recortes ad hoc (dimensões × medidas × filtros) sobre o snapshot DuckDB"""
+    try:
+        from datetime import datetime
+
+        def _lista(nome):
+            return [valor for valor in request.GET.get(nome, '').split(',') if valor]
+
+        datas = {}
+        for nome in ('data_inicio', 'data_fim'):
+            if request.GET.get(nome):
+                datas[nome] = datetime.strptime(request.GET[nome], '%Y-%m-%d').date()
+
+        # ?filtro_status=Em andamento,Revisão -> {"status": [...]}
+        filtros = {
+            nome[len('filtro_'):]: request.GET.getlist(nome)
+            for nome in request.GET
+            if nome.startswith('filtro_')
+        }
+        filtros = {
+            nome: [v for valor in valores for v in valor.split(',') if v]
+            for nome, valores in filtros.items()
+        }
+
+        resultado = analitico.pivot(
+            request.GET.get('fato', 'projetos'),
+            _lista('dimensoes'),
+            _lista('medidas'),
+            filtros=filtros,
+            pivotar=request.GET.get('pivotar') or None,
+            limite=request.GET.get('limite') or None,
+            **datas,
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse({'success': True, **resultado})
+
+
 @login_required(login_url='/login/')
 @require_http_methods(["GET"])
 def api_metricas_filtradas(request):
     """API para calcular métricas com filtro de data"""
     try:
         from django.utils import timezone
-        from datetime import datetime, timedelta
+        from datetime import datetime
         
         # Pegar parâmetros de data
         data_inicio_str = request.GET.get('data_inicio')
@@ -929,99 +1348,16 @@ def api_metricas_filtradas(request):
         if data_fim_str:
             data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
         
-        # Base query - projetos do usuário
-        projetos_base = Projeto.objects.filter(
-            #usuario=request.user
-            )
-        
-        # Aplicar filtros de data se fornecidos
-        if data_inicio:
-            projetos_base = projetos_base.filter(data_criacao__date__gte=data_inicio)
-        
-        if data_fim:
-            projetos_base = projetos_base.filter(data_criacao__date__lte=data_fim)
-        
-        # Projetos ativos (não concluídos e não rejeitados)
-        projetos_ativos = projetos_base.filter(
-            concluido=False,
-            aprovacao__in=['pendente', 'aprovado']
+        # Requisições idênticas simultâneas compartilham um único cálculo, e o
+        # resultado fica alguns segundos no cache para os próximos chamadores
+        chave = f"metricas:{data_inicio or ''}:{data_fim or ''}:{timezone.now().date()}"
+        metricas = voo_unico.obter(
+            chave, lambda: _calcular_metricas(data_inicio, data_fim)
         )
         
-        # ========== CALCULAR MÉTRICAS ==========
-        
-        hoje = timezone.now().date()
-        
-        # Se há filtro de data, ajustar o "hoje" para o período
-        if data_fim:
-            hoje = min(hoje, data_fim)
-        
-        # 1. Projetos em atraso
-        projetos_em_atraso = projetos_ativos.filter(data_prazo_entrega__lt=hoje).count()
-        
-        # 2. Projetos da semana (dentro do período filtrado)
-        if data_inicio and data_fim:
-            # Se há filtro, contar projetos com prazo dentro do período
-            projetos_semana = projetos_ativos.filter(
-                data_prazo_entrega__gte=data_inicio,
-                data_prazo_entrega__lte=data_fim
-            ).count()
-            periodo_texto = f"{data_inicio.strftime('%d/%m')} a {data_fim.strftime('%d/%m')}"
-        else:
-            # Semana atual
-            inicio_semana = hoje - timedelta(days=hoje.weekday())
-            fim_semana = inicio_semana + timedelta(days=6)
-            projetos_semana = projetos_ativos.filter(
-                data_prazo_entrega__gte=inicio_semana,
-                data_prazo_entrega__lte=fim_semana
-            ).count()
-            periodo_texto = f"{inicio_semana.strftime('%d/%m')} a {fim_semana.strftime('%d/%m')}"
-        
-        # 3. Projetos concluídos
-        projetos_concluidos = projetos_base.filter(concluido=True).count()
-        
-        # 4. Orçamentos aceitos
-        orcamentos_aceitos = projetos_base.filter(aprovacao='aprovado').count()
-        
-        # 5. Orçamentos rejeitados
-        orcamentos_rejeitados = projetos_base.filter(aprovacao='rejeitado').count()
-        
-        # 6. Projetos pendentes
-        projetos_pendentes = projetos_ativos.filter(aprovacao='pendente').count()
-        
-        # 7. Status breakdown
-        status_list = StatusProjeto.objects.filter(ativo=True).order_by('ordem')
-        status_metricas = []
-        
-        for status in status_list:
-            count = projetos_ativos.filter(status=status).count()
-            status_metricas.append({
-                'id': status.id,
-                'nome': status.nome,
-                'cor': status.cor,
-                'count': count
-            })
-        
-        # Calcular percentuais
-        total_orcamentos = orcamentos_aceitos + orcamentos_rejeitados
-        percentual_aceitos = round((orcamentos_aceitos / total_orcamentos * 100) if total_orcamentos > 0 else 0)
-        percentual_rejeitados = round((orcamentos_rejeitados / total_orcamentos * 100) if total_orcamentos > 0 else 0)
-        
         return JsonResponse({
             'success': True,
-            'metricas': {
-                'projetos_ativos': projetos_ativos.count(),
-                'projetos_em_atraso': projetos_em_atraso,
-                'projetos_semana': projetos_semana,
-                'projetos_concluidos': projetos_concluidos,
-                'orcamentos_aceitos': orcamentos_aceitos,
-                'orcamentos_rejeitados': orcamentos_rejeitados,
-                'projetos_pendentes': projetos_pendentes,
-                'status_metricas': status_metricas,
-                'percentual_aceitos': percentual_aceitos,
-                'percentual_rejeitados': percentual_rejeitados,
-                'total_orcamentos': total_orcamentos,
-                'periodo_texto': periodo_texto,
-            },
+            'metricas': metricas,
             'filtros': {
                 'data_inicio': data_inicio_str,
                 'data_fim': data_fim_str,
@@ -1032,4 +1368,170 @@ def api_metricas_filtradas(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        })
\ No newline at end of file
+        })
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def api_analytics_fluxo(request):
+    """API de lead time, throughput e tempo em status a partir do histórico"""
+    try:
+        from datetime import datetime
+
+        janela = request.GET.get('janela', 'semana')
+        if janela not in fluxo.JANELAS:
+            return JsonResponse({
+                'success': False,
+                'error': f"Janela inválida. Use: {', '.join(fluxo.JANELAS)}"
+            })
+
+        hoje = timezone.localdate()
+        data_fim = (
+            datetime.strptime(request.GET['data_fim'], '%Y-%m-%d').date()
+            if request.GET.get('data_fim') else hoje
+        )
+        data_inicio = (
+            datetime.strptime(request.GET['data_inicio'], '%Y-%m-%d').date()
+            if request.GET.get('data_inicio') else data_fim - timedelta(days=90)
+        )
+
+        # Intervalo semiaberto [início, fim + 1 dia) no fuso atual
+        tz = timezone.get_current_timezone()
+        inicio = datetime.combine(data_inicio, datetime.min.time(), tzinfo=tz)
+        fim = datetime.combine(data_fim + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+
+        throughput, lead_time = fluxo.throughput_e_lead_time(inicio, fim, janela)
+
+        return JsonResponse({
+            'success': True,
+            'janela': janela,
+            'throughput': throughput,
+            'lead_time': lead_time,
+            'tempo_em_status': fluxo.tempo_em_status(inicio, fim),
+            'filtros': {
+                'data_inicio': data_inicio.isoformat(),
+                'data_fim': data_fim.isoformat(),
+            }
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["GET"])
+def exportar_projetos(request):
+    """Exporta projetos e materiais (CSV ou NDJSON) em streaming, com os filtros do dashboard"""
+    try:
+        formato = request.GET.get('formato', 'csv')
+        if formato not in exportacao.FORMATOS:
+            return JsonResponse({'success': False, 'error': 'Formato inválido'}, status=400)
+        filtros = exportacao.filtros_do_request(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        exportacao.gerar(formato, filtros),
+        content_type=exportacao.FORMATOS[formato],
+    )
+    nome_arquivo = f"projetos_{timezone.localdate():%Y%m%d}.{formato}"
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+def _tarefa_json(tarefa):
+    return {
+        "id": tarefa.id,
+        "tipo": tarefa.tipo,
+        "status": tarefa.status,
+        "prioridade": tarefa.prioridade,
+        "tentativas": tarefa.tentativas,
+        "max_tentativas": tarefa.max_tentativas,
+        "resultado": tarefa.resultado,
+        "erro": tarefa.erro,
+        "data_criacao": tarefa.data_criacao.isoformat(),
+        "data_inicio": tarefa.data_inicio.isoformat() if tarefa.data_inicio else None,
+        "data_fim": tarefa.data_fim.isoformat() if tarefa.data_fim else None,
+    }
+
+
+@csrf_exempt
+@require_POST
+@login_required
+def criar_tarefa(request):
+    """API para enfileirar uma tarefa pesada"""
+    try:
+        data = json.loads(request.body)
+        tipo = data.get("tipo")
+
+        handler = fila.handlers().get(tipo)
+        if handler is None:
+            return JsonResponse({"success": False, "error": "Tipo de tarefa inválido"})
+        if handler[1] and not request.user.is_staff:
+            return JsonResponse(
+                {"success": False, "error": "Permissão negada"}, status=403
+            )
+
+        tarefa = fila.enfileirar(
+            tipo,
+            data.get("parametros", {}),
+            prioridade=int(data.get("prioridade", 0)),
+            usuario=request.user,
+        )
+
+        return JsonResponse({"success": True, "tarefa": _tarefa_json(tarefa)})
+
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@login_required
+def tarefa_detail_api(request, tarefa_id):
+    """API para acompanhar o status de uma tarefa"""
+    try:
+        filtros = {} if request.user.is_staff else {"usuario": request.user}
+        tarefa = get_object_or_404(Tarefa, id=tarefa_id, **filtros)
+        return JsonResponse({"success": True, "tarefa": _tarefa_json(tarefa)})
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def metricas_prometheus(request):
+    """Métricas de latência, queries e erros por view no formato Prometheus"""
+    return HttpResponse(
+        instrumentacao.exportar(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@require_http_methods(["GET"])
+def pronto(request):
+    """Readiness: 200 só depois do aquecimento do worker (sem login, para o balanceador)"""
+    # Etapas que falharam no boot (banco fora do ar) são tentadas de novo aqui
+    if not aquecimento.pronto():
+        aquecimento.aquecer()
+    estado = aquecimento.estado()
+    return JsonResponse(estado, status=200 if estado["pronto"] else 503)
+
+
+def consultas_lentas_admin(request):
+    """Ranking em memória das consultas lentas (servido via admin.site.admin_view)"""
+    if request.method == "POST":
+        consultas_lentas.limpar()
+        messages.success(request, "Ranking de consultas lentas limpo.")
+        return redirect("consultas_lentas_admin")
+
+    context = {
+        **admin.site.each_context(request),
+        "title": "Consultas lentas",
+        "consultas": consultas_lentas.ranking(),
+        "limiar_ms": consultas_lentas.limiar_ms(),
+        "top_n": getattr(settings, "CONSULTAS_LENTAS_TOP_N", 50),
+        "pid": os.getpid(),
+    }
+    return render(request, "admin/produtos/consultas_lentas.html", context)
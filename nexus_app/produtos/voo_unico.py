@@ -0,0 +1,88 @@
+"""
+Single-flight para cálculos caros (métricas do dashboard).
+
+Requisições idênticas que chegam juntas no mesmo processo esperam o cálculo
+que já está em andamento em vez de repeti-lo. O resultado fica no cache
+compartilhado por alguns segundos (METRICAS_CACHE_TTL), atendendo os próximos
+chamadores de qualquer worker sem tocar no banco.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import instrumentacao
+
+instrumentacao.METRICAS.update(
+    {
+        "nexus_voo_unico_total": (
+            "counter",
+            "Chamadas ao single-flight por origem do resultado (cache, compartilhado, calculado)",
+            None,
+        ),
+    }
+)
+
+
+class _Voo:
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+_voos = {}
+_lock = threading.Lock()
+
+
+def ttl_padrao():
+    return getattr(settings, "METRICAS_CACHE_TTL", 5)
+
+
+def _contar(chave, origem):
+    prefixo = chave.split(":", 1)[0]
+    instrumentacao.incrementar(
+        "nexus_voo_unico_total", (("chave", prefixo), ("origem", origem))
+    )
+
+
+def obter(chave, calcular, ttl=None):
+    """
+    Resultado de ``calcular()`` para a chave: do cache, de um cálculo em
+    andamento no processo ou calculado agora (e guardado por ttl segundos).
+    Exceções do cálculo são repassadas a todos que esperavam por ele.
+    """
+    ttl = ttl_padrao() if ttl is None else ttl
+    if ttl:
+        resultado = cache.get(chave)
+        if resultado is not None:
+            _contar(chave, "cache")
+            return resultado
+
+    with _lock:
+        voo = _voos.get(chave)
+        lider = voo is None
+        if lider:
+            voo = _voos[chave] = _Voo()
+
+    if not lider:
+        voo.pronto.wait()
+        _contar(chave, "compartilhado")
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+
+    try:
+        voo.resultado = calcular()
+        if ttl:
+            cache.set(chave, voo.resultado, ttl)
+    except Exception as e:
+        voo.erro = e
+        raise
+    finally:
+        with _lock:
+            del _voos[chave]
+        voo.pronto.set()
+        _contar(chave, "calculado")
+    return voo.resultado